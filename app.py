@@ -4,6 +4,7 @@ Streamlit web application for Python Documentation Assistant.
 This is the main entry point for the RAG-based documentation assistant.
 """
 
+import hashlib
 import os
 import time
 from pathlib import Path
@@ -14,6 +15,7 @@ from dotenv import load_dotenv
 
 from src.chain import RAGChain
 from src.retriever import Retriever
+from src.semantic_cache import SemanticCache
 from src.vector_store import VectorStore
 from src.embeddings import EmbeddingGenerator
 
@@ -43,19 +45,6 @@ st.markdown("""
         width: 100%;
         border-radius: 5px;
     }
-    .chat-message {
-        padding: 1rem;
-        border-radius: 0.5rem;
-        margin-bottom: 1rem;
-        display: flex;
-        align-items: flex-start;
-    }
-    .user-message {
-        background-color: #e3f2fd;
-    }
-    .assistant-message {
-        background-color: #f5f5f5;
-    }
     .source-card {
         background-color: #f9f9f9;
         padding: 0.5rem;
@@ -66,6 +55,17 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Sample questions shown in the sidebar
+SAMPLE_QUESTIONS = (
+    "Explain Python decorators with an example",
+    "What are Python data types?",
+    "How do I handle exceptions in Python?",
+    "What is the difference between a tuple and a list?",
+    "How do I read and write files in Python?",
+    "Explain list comprehensions with examples",
+    "What are Python modules and how do I use them?"
+)
+
 
 @st.cache_resource
 def initialize_components():
@@ -80,10 +80,13 @@ def initialize_components():
         # Initialize components
         vector_store = VectorStore()
         # Create embedding generator with API key to ensure consistency
-        api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("VERTEX_API_KEY")
         embedding_generator = EmbeddingGenerator(api_key=api_key, use_gemini=True)
         retriever = Retriever(vector_store, embedding_generator=embedding_generator)
-        chain = RAGChain(retriever, api_key=api_key)
+        # Page the index into RAM once per process instead of on the first
+        # query; the quantized snapshot is only read outside HNSW mode
+        vector_store.prewarm(build_snapshot=retriever.search_mode != "hnsw")
+        # Rephrased repeat questions are answered from the query cache
+        chain = RAGChain(retriever, api_key=api_key, semantic_cache=SemanticCache())
         
         return vector_store, retriever, chain
     except Exception as e:
@@ -91,6 +94,104 @@ def initialize_components():
         return None, None, None
 
 
+@st.cache_data(ttl=60)
+def _cached_collection_stats() -> Dict:
+    """Collection statistics, refreshed at most once a minute."""
+    vector_store = initialize_components()[0]
+    return vector_store.get_collection_stats() if vector_store else {}
+
+
+@st.cache_data
+def _header_html() -> str:
+    """Return the static page header HTML (built once per process)."""
+    return """
+    <div class="main-header">
+        <h1>🐍 Python Documentation Assistant</h1>
+        <p style="font-size: 1.2em; margin-top: 0.5rem;">
+            AI-powered assistant using RAG and Prompt Engineering
+        </p>
+        <p style="font-size: 0.9em; opacity: 0.9;">
+            Ask questions about Python programming and get answers based on official documentation
+        </p>
+    </div>
+    """
+
+
+@st.cache_data
+def _footer_html() -> str:
+    """Return the static page footer HTML (built once per process)."""
+    return """
+    <div style="text-align: center; padding: 2rem; color: #666;">
+        <p>
+            <strong>Python Documentation Assistant</strong> v1.0.0<br>
+            Built with Streamlit, LangChain, and Google Gemini<br>
+            <a href="https://github.com/Venkata-Nikhil-Amirisetty/Prompt-Final-Project" target="_blank">GitHub Repository</a> | 
+            <a href="https://docs.python.org" target="_blank">Python Documentation</a>
+        </p>
+    </div>
+    """
+
+
+@st.cache_data
+def _source_card(index: int, title: str, url: str, score: float, preview: str = "") -> str:
+    """Return the HTML card for one source (memoized per source)."""
+    preview_html = f"""
+        <details>
+            <summary>Preview</summary>
+            <p style="font-size: 0.8em; color: #666;">{preview}</p>
+        </details>""" if preview else ""
+    return f"""
+    <div class="source-card">
+        <strong>Source {index}:</strong> {title}<br>
+        <small>URL: <a href="{url}" target="_blank">{url}</a></small><br>
+        <small>Relevance Score: {score:.2f}</small>{preview_html}
+    </div>
+    """
+
+
+def display_sources(sources: List[Dict], show_preview: bool = False):
+    """Display retrieved sources inside a collapsible expander."""
+    with st.expander("📎 Sources", expanded=False):
+        for i, source in enumerate(sources, 1):
+            st.markdown(
+                _source_card(
+                    i,
+                    source.get('title', 'Untitled'),
+                    source.get('source_url', 'N/A'),
+                    source.get('score', 0),
+                    source.get('text', '') if show_preview else ""
+                ),
+                unsafe_allow_html=True
+            )
+
+
+# st.fragment (Streamlit >= 1.37) isolates each message's elements so they
+# can be reconciled independently; older versions just call the function
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
+
+@_fragment
+def render_message(message: Dict, show_sources: bool):
+    """Render one chat history entry with its sources and timing."""
+    display_chat_message(message["role"], message["content"])
+    
+    if message["role"] != "assistant":
+        return
+    
+    # Show sources if available
+    if "sources" in message and show_sources:
+        display_sources(message.get("sources", []))
+    
+    # Show response time
+    if "response_time" in message:
+        st.caption(f"⏱️ Response time: {message['response_time']:.2f}s")
+
+
+def _stable_key(prefix: str, text: str) -> str:
+    """Build a widget key that is stable across processes (unlike hash())."""
+    return f"{prefix}_{hashlib.md5(text.encode('utf-8')).hexdigest()[:8]}"
+
+
 def initialize_session_state():
     """Initialize Streamlit session state."""
     if 'messages' not in st.session_state:
@@ -111,23 +212,30 @@ def display_chat_message(role: str, content: str):
             st.markdown(content)
 
 
+def render_statistics(container, vector_store):
+    """Fill the sidebar statistics panel from the current session state."""
+    with container:
+        if vector_store:
+            stats = _cached_collection_stats()
+            st.metric("Documents Indexed", stats.get('document_count', 0))
+        
+        if st.session_state.response_times:
+            avg_time = sum(st.session_state.response_times) / len(st.session_state.response_times)
+            st.metric("Avg Response Time", f"{avg_time:.2f}s")
+        
+        st.metric("Total Queries", st.session_state.total_queries)
+
+
 def main():
     """Main application function."""
     # Initialize session state
     initialize_session_state()
     
+    # Initialize components (cached across reruns)
+    vector_store, retriever, chain = initialize_components()
+    
     # Header
-    st.markdown("""
-    <div class="main-header">
-        <h1>🐍 Python Documentation Assistant</h1>
-        <p style="font-size: 1.2em; margin-top: 0.5rem;">
-            AI-powered assistant using RAG and Prompt Engineering
-        </p>
-        <p style="font-size: 0.9em; opacity: 0.9;">
-            Ask questions about Python programming and get answers based on official documentation
-        </p>
-    </div>
-    """, unsafe_allow_html=True)
+    st.markdown(_header_html(), unsafe_allow_html=True)
     
     # Sidebar
     with st.sidebar:
@@ -150,33 +258,14 @@ def main():
         """)
         
         st.header("💡 Sample Questions")
-        sample_questions = [
-            "Explain Python decorators with an example",
-            "What are Python data types?",
-            "How do I handle exceptions in Python?",
-            "What is the difference between a tuple and a list?",
-            "How do I read and write files in Python?",
-            "Explain list comprehensions with examples",
-            "What are Python modules and how do I use them?"
-        ]
-        
-        for question in sample_questions:
-            if st.button(question, key=f"sample_{hash(question)}", use_container_width=True):
+        for question in SAMPLE_QUESTIONS:
+            if st.button(question, key=_stable_key("sample", question), use_container_width=True):
                 st.session_state.user_input = question
         
-        # Statistics
+        # Statistics are filled in at the end of the run, after any new
+        # answer has updated them
         st.header("📊 Statistics")
-        vector_store, retriever, chain = initialize_components()
-        
-        if vector_store:
-            stats = vector_store.get_collection_stats()
-            st.metric("Documents Indexed", stats.get('document_count', 0))
-        
-        if st.session_state.response_times:
-            avg_time = sum(st.session_state.response_times) / len(st.session_state.response_times)
-            st.metric("Avg Response Time", f"{avg_time:.2f}s")
-        
-        st.metric("Total Queries", st.session_state.total_queries)
+        stats_panel = st.container()
         
         # Settings
         st.header("⚙️ Settings")
@@ -212,10 +301,8 @@ def main():
         if st.button("🔄 Rebuild Index", use_container_width=True):
             st.info("To rebuild the index, run: python setup.py")
     
-    # Initialize components
-    vector_store, retriever, chain = initialize_components()
-    
     if not chain:
+        render_statistics(stats_panel, vector_store)
         st.warning("⚠️ Please configure GOOGLE_API_KEY or VERTEX_API_KEY in .env file to use the assistant.")
         st.stop()
     
@@ -228,23 +315,7 @@ def main():
     
     # Display chat history
     for message in st.session_state.messages:
-        display_chat_message(message["role"], message["content"])
-        
-        # Show sources if available
-        if message["role"] == "assistant" and "sources" in message and show_sources:
-            with st.expander("📎 Sources", expanded=False):
-                for i, source in enumerate(message.get("sources", []), 1):
-                    st.markdown(f"""
-                    <div class="source-card">
-                        <strong>Source {i}:</strong> {source.get('title', 'Untitled')}<br>
-                        <small>URL: {source.get('source_url', 'N/A')}</small><br>
-                        <small>Relevance: {source.get('score', 0):.2f}</small>
-                    </div>
-                    """, unsafe_allow_html=True)
-        
-        # Show response time
-        if message["role"] == "assistant" and "response_time" in message:
-            st.caption(f"⏱️ Response time: {message['response_time']:.2f}s")
+        render_message(message, show_sources)
     
     # User input
     user_input = st.chat_input("Ask a question about Python...")
@@ -260,12 +331,27 @@ def main():
         st.session_state.messages.append({"role": "user", "content": user_input})
         display_chat_message("user", user_input)
         
-        # Generate response
+        # Generate response, rendering tokens as they arrive
         with st.spinner("🤔 Thinking..."):
             try:
-                result = chain.invoke(user_input, top_k=num_sources)
+                result = {}
+                streamed = []
+                
+                def answer_stream():
+                    for item in chain.invoke_stream(user_input, top_k=num_sources):
+                        if isinstance(item, dict):
+                            result.update(item)
+                        else:
+                            streamed.append(item)
+                            yield item
+                
+                with st.chat_message("assistant", avatar="🐍"):
+                    st.write_stream(answer_stream())
+                    answer = result.get('answer') or 'No response generated.'
+                    if not streamed:
+                        # Errors arrive as a result dict without any text chunks
+                        st.markdown(answer)
                 
-                answer = result.get('answer', 'No response generated.')
                 sources = result.get('sources', [])
                 response_time = result.get('response_time', 0)
                 
@@ -281,30 +367,15 @@ def main():
                 st.session_state.response_times.append(response_time)
                 st.session_state.total_queries += 1
                 
-                # Display response
-                display_chat_message("assistant", answer)
-                
                 # Show sources
                 if show_sources and sources:
-                    with st.expander("📎 Sources", expanded=False):
-                        for i, source in enumerate(sources, 1):
-                            st.markdown(f"""
-                            <div class="source-card">
-                                <strong>Source {i}:</strong> {source.get('title', 'Untitled')}<br>
-                                <small>URL: <a href="{source.get('source_url', '#')}" target="_blank">{source.get('source_url', 'N/A')}</a></small><br>
-                                <small>Relevance Score: {source.get('score', 0):.2f}</small>
-                                <details>
-                                    <summary>Preview</summary>
-                                    <p style="font-size: 0.8em; color: #666;">{source.get('text', '')}</p>
-                                </details>
-                            </div>
-                            """, unsafe_allow_html=True)
+                    display_sources(sources, show_preview=True)
                 
                 # Show response time
                 st.caption(f"⏱️ Response time: {response_time:.2f}s")
                 
                 # Copy button
-                st.button("📋 Copy Response", key=f"copy_{len(st.session_state.messages)}")
+                st.button("📋 Copy Response", key=_stable_key(f"copy_{len(st.session_state.messages)}", answer))
                 
             except Exception as e:
                 error_msg = f"❌ Error: {str(e)}"
@@ -313,21 +384,12 @@ def main():
                     "role": "assistant",
                     "content": error_msg
                 })
-        
-        st.rerun()
+    
+    render_statistics(stats_panel, vector_store)
     
     # Footer
     st.markdown("---")
-    st.markdown("""
-    <div style="text-align: center; padding: 2rem; color: #666;">
-        <p>
-            <strong>Python Documentation Assistant</strong> v1.0.0<br>
-            Built with Streamlit, LangChain, and Google Gemini<br>
-            <a href="https://github.com/Venkata-Nikhil-Amirisetty/Prompt-Final-Project" target="_blank">GitHub Repository</a> | 
-            <a href="https://docs.python.org" target="_blank">Python Documentation</a>
-        </p>
-    </div>
-    """, unsafe_allow_html=True)
+    st.markdown(_footer_html(), unsafe_allow_html=True)
 
 
 if __name__ == "__main__":
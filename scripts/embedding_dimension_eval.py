@@ -0,0 +1,170 @@
+"""
+Embedding dimensionality evaluation script.
+
+This script measures how much retrieval recall is lost when Matryoshka
+embeddings are truncated to fewer dimensions, using the benchmark queries
+and the indexed collection. Recall@k is measured against exact top-k
+search over the full-size vectors.
+"""
+
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List
+
+import numpy as np
+from dotenv import load_dotenv
+
+from scripts.performance_benchmark import BENCHMARK_QUERIES
+from src.serialization import write_json
+from src.vector_math import normalize_rows, truncate_embeddings
+
+if TYPE_CHECKING:
+    from src.vector_store import VectorStore
+
+# Load environment
+load_dotenv()
+
+# Candidate dimensionalities to evaluate (largest first)
+CANDIDATE_DIMS = [768, 512, 256, 128]
+
+# Minimum acceptable recall@k against full-dimension ground truth
+RECALL_TARGET = 0.9
+
+# Documents fetched per collection.get() call
+FETCH_BATCH_SIZE = 1000
+
+
+def _load_collection_embeddings(vector_store: 'VectorStore') -> np.ndarray:
+    """Fetch every stored embedding from the collection in batches."""
+    embeddings = []
+    offset = 0
+    while True:
+        batch = vector_store.collection.get(
+            limit=FETCH_BATCH_SIZE,
+            offset=offset,
+            include=["embeddings"]
+        )
+        if not batch['ids']:
+            break
+        embeddings.extend(batch['embeddings'])
+        offset += len(batch['ids'])
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+def _top_k(doc_vectors: np.ndarray, query_vectors: np.ndarray, k: int) -> np.ndarray:
+    """Exact top-k document indices per query by cosine similarity."""
+    scores = query_vectors @ doc_vectors.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def evaluate_dimensions(
+    queries: List[str] = BENCHMARK_QUERIES,
+    dims: List[int] = CANDIDATE_DIMS,
+    k: int = 5,
+    recall_target: float = RECALL_TARGET,
+    output_file: str = "outputs/embedding_dimension_eval.json"
+) -> Dict:
+    """
+    Measure recall@k of truncated embeddings against full-size vectors.
+    
+    Args:
+        queries: Evaluation queries
+        dims: Candidate dimensionalities
+        k: Number of results compared per query
+        recall_target: Minimum recall@k to accept a dimensionality (it
+            and every larger candidate must reach it)
+        output_file: Path to save evaluation results
+    
+    Returns:
+        Dictionary with per-dimension recall and the recommended size
+    """
+    # Heavy imports (chromadb, embedding models) are deferred so the
+    # module stays cheap to import
+    from src.retriever import Retriever
+    from src.vector_store import VectorStore
+    
+    print("=" * 60)
+    print("Embedding Dimension Evaluation")
+    print("=" * 60)
+    print()
+    
+    print("Loading collection embeddings...")
+    vector_store = VectorStore()
+    doc_vectors = _load_collection_embeddings(vector_store)
+    if len(doc_vectors) == 0:
+        raise ValueError("Vector store is empty. Run setup.py first.")
+    
+    full_dim = doc_vectors.shape[1]
+    print(f"Loaded {len(doc_vectors)} vectors ({full_dim} dims)")
+    
+    # Query vectors come from the same model that built the index
+    retriever = Retriever(vector_store)
+    query_embeddings = [e for e in retriever.embed_queries(queries) if e is not None]
+    query_vectors = np.asarray(query_embeddings, dtype=np.float32)
+    
+    ground_truth = _top_k(normalize_rows(doc_vectors), normalize_rows(query_vectors), k)
+    
+    results = []
+    # Only a size whose larger sizes all met the target is recommended, so
+    # a non-monotonic recall curve cannot skip past a failing size
+    recommended = full_dim
+    larger_passed = True
+    for dim in sorted({d for d in dims if d <= full_dim}, reverse=True):
+        start_time = time.perf_counter()
+        predicted = _top_k(
+            truncate_embeddings(doc_vectors, dim),
+            truncate_embeddings(query_vectors, dim),
+            k
+        )
+        search_time = time.perf_counter() - start_time
+        
+        recall = float(np.mean([
+            len(set(truth) & set(pred)) / k
+            for truth, pred in zip(ground_truth, predicted)
+        ]))
+        results.append({
+            'dimensions': dim,
+            f'recall_at_{k}': recall,
+            'search_time': search_time,
+            'bytes_per_vector': dim * 4
+        })
+        print(f"  {dim:>5} dims: recall@{k} = {recall:.3f} ({search_time * 1000:.1f} ms)")
+        
+        if recall < recall_target:
+            larger_passed = False
+        elif larger_passed:
+            recommended = dim
+    
+    report = {
+        'evaluation_metadata': {
+            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'num_documents': len(doc_vectors),
+            'num_queries': len(query_vectors),
+            'full_dimensions': full_dim,
+            'k': k,
+            'recall_target': recall_target
+        },
+        'results': results,
+        'recommended_dimensions': recommended
+    }
+    
+    output_path = Path(output_file)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    write_json(output_path, report)
+    
+    print()
+    print(f"Recommended dimensionality: {recommended} (recall@{k} >= {recall_target})")
+    print(f"Full report saved to: {output_path}")
+    
+    return report
+
+
+if __name__ == "__main__":
+    try:
+        report = evaluate_dimensions()
+        print("\n✅ Evaluation completed successfully")
+    except Exception as e:
+        print(f"\n❌ Error during evaluation: {e}")
+        import traceback
+        traceback.print_exc()
+        exit(1)
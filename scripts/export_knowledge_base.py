@@ -1,106 +1,114 @@
 """
 Script to export the knowledge base to a portable format.
 
-This script exports the ChromaDB collection to JSON format for
-easy sharing and submission.
+This script exports the ChromaDB collection to NDJSON format (one
+document per line) for easy sharing and submission.
 """
 
-import json
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict
 
-from src.vector_store import VectorStore
+from src.serialization import dumps, write_json
+
+# Documents fetched from ChromaDB per batch
+EXPORT_BATCH_SIZE = 1000
 
 
 def export_knowledge_base(
-    output_file: str = "outputs/knowledge_base_export.json",
-    collection_name: str = "python_docs"
+    output_file: str = "outputs/knowledge_base_export.jsonl",
+    collection_name: str = "python_docs",
+    batch_size: int = EXPORT_BATCH_SIZE
 ) -> Dict:
     """
-    Export the knowledge base to JSON format.
+    Export the knowledge base to NDJSON format.
+    
+    Documents are streamed from ChromaDB in batches and written one JSON
+    object per line, so memory use stays constant regardless of collection
+    size. Collection metadata and statistics go to a sidecar
+    ``<output>.header.json`` file.
     
     Args:
-        output_file: Path to output JSON file
+        output_file: Path to output NDJSON file
         collection_name: Name of the collection to export
+        batch_size: Number of documents fetched per collection.get() call
         
     Returns:
-        Dictionary containing exported data
+        Dictionary containing the export header
     """
+    # Deferred so importing this module doesn't load chromadb
+    from src.vector_store import VectorStore
+    
     print("Loading vector store...")
     vector_store = VectorStore(collection_name=collection_name)
     
-    if not vector_store.check_if_indexed():
+    # Get collection stats
+    stats = vector_store.get_collection_stats()
+    total_docs = stats.get('document_count', 0)
+    
+    if total_docs == 0:
         print("❌ Vector store is empty. Nothing to export.")
         return {}
     
     print("Retrieving all documents...")
     
-    # Get collection stats
-    stats = vector_store.get_collection_stats()
-    total_docs = stats.get('document_count', 0)
-    
     print(f"Found {total_docs} documents")
     
-    # Get all documents (in batches if needed)
-    all_documents = []
-    batch_size = 100
+    output_path = Path(output_file)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    header_path = output_path.with_suffix('.header.json')
     
-    # ChromaDB doesn't have a direct "get all" method, so we'll use search
-    # with a dummy query to get all documents
-    try:
-        # Get sample to understand structure
-        samples = vector_store.get_sample_documents(n=min(10, total_docs))
-        
-        # For full export, we'd need to iterate or use ChromaDB's get method
-        # This is a simplified version that exports what we can access
-        results = vector_store.collection.get()
-        
-        if results and 'ids' in results:
-            ids = results.get('ids', [])
-            documents = results.get('documents', [])
-            metadatas = results.get('metadatas', [])
-            
-            for i in range(len(ids)):
-                all_documents.append({
-                    'id': ids[i],
-                    'text': documents[i] if i < len(documents) else '',
-                    'metadata': metadatas[i] if i < len(metadatas) else {}
-                })
-    except Exception as e:
-        print(f"Warning: Could not retrieve all documents directly: {e}")
-        print("Exporting sample documents instead...")
-        all_documents = vector_store.get_sample_documents(n=100)
+    # Stream documents to disk in batches
+    print(f"Saving to {output_path}...")
+    exported = 0
+    with open(output_path, 'wb') as f:
+        try:
+            while True:
+                batch = vector_store.collection.get(
+                    limit=batch_size,
+                    offset=exported,
+                    include=["documents", "metadatas"]
+                )
+                ids = batch.get('ids', [])
+                if not ids:
+                    break
+                
+                documents = batch.get('documents') or []
+                metadatas = batch.get('metadatas') or []
+                for i, doc_id in enumerate(ids):
+                    f.write(dumps({
+                        'id': doc_id,
+                        'text': documents[i] if i < len(documents) else '',
+                        'metadata': metadatas[i] if i < len(metadatas) else {}
+                    }) + b"\n")
+                exported += len(ids)
+        except Exception as e:
+            print(f"Warning: Export stopped after {exported} documents: {e}")
     
-    # Create export data structure
-    export_data = {
+    # Write collection metadata to sidecar header
+    header = {
         'collection_name': collection_name,
-        'total_documents': len(all_documents),
+        'total_documents': exported,
         'export_metadata': {
-            'format_version': '1.0',
-            'export_tool': 'export_knowledge_base.py'
+            'format_version': '2.0',
+            'format': 'ndjson',
+            'export_tool': 'export_knowledge_base.py',
+            'documents_file': output_path.name
         },
-        'statistics': stats,
-        'documents': all_documents
+        'statistics': stats
     }
+    write_json(header_path, header)
     
-    # Save to file
-    output_path = Path(output_file)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    
-    print(f"Saving to {output_path}...")
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(export_data, f, indent=2, ensure_ascii=False)
-    
-    print(f"✅ Exported {len(all_documents)} documents to {output_path}")
+    print(f"✅ Exported {exported} documents to {output_path}")
     
     # Generate summary
     print("\nExport Summary:")
     print(f"  Collection: {collection_name}")
-    print(f"  Documents: {len(all_documents)}")
+    print(f"  Documents: {exported}")
     print(f"  Output file: {output_path}")
+    print(f"  Header file: {header_path}")
     print(f"  File size: {output_path.stat().st_size / 1024:.2f} KB")
     
-    return export_data
+    return header
 
 
 if __name__ == "__main__":
@@ -110,7 +118,7 @@ if __name__ == "__main__":
     print()
     
     try:
-        export_data = export_knowledge_base()
+        export_header = export_knowledge_base()
         print("\n✅ Export completed successfully")
     except Exception as e:
         print(f"\n❌ Error during export: {e}")
@@ -5,16 +5,13 @@ This script runs predefined queries through the RAG system and saves
 the outputs as JSON files for documentation purposes.
 """
 
-import json
 import os
 from pathlib import Path
 from typing import Dict, List
 
 from dotenv import load_dotenv
 
-from src.chain import RAGChain
-from src.retriever import Retriever
-from src.vector_store import VectorStore
+from src.serialization import write_json
 
 # Load environment
 load_dotenv()
@@ -28,21 +25,38 @@ SAMPLE_QUERIES = [
     "What is the difference between a tuple and a list?"
 ]
 
+# Maximum number of queries in flight at once
+SAMPLE_CONCURRENCY = 4
+
+# Two-stage in-memory search: truncated-prefix first pass + full-vector rerank
+SAMPLE_SEARCH_MODE = "truncated"
+
 
 def generate_sample_outputs(
     queries: List[str] = SAMPLE_QUERIES,
-    output_dir: str = "examples/sample_outputs"
+    output_dir: str = "examples/sample_outputs",
+    concurrency: int = SAMPLE_CONCURRENCY
 ) -> List[Dict]:
     """
     Generate sample outputs for given queries.
     
+    Queries run concurrently (bounded by ``concurrency``); outputs are
+    still written and numbered in input order.
+    
     Args:
         queries: List of query strings
         output_dir: Directory to save outputs
+        concurrency: Maximum number of queries in flight at once
         
     Returns:
         List of result dictionaries
     """
+    # Heavy imports (chromadb, langchain, Gemini SDK) are deferred so the
+    # module stays cheap to import
+    from src.chain import RAGChain
+    from src.retriever import Retriever
+    from src.vector_store import VectorStore
+    
     # Create output directory
     Path(output_dir).mkdir(parents=True, exist_ok=True)
     
@@ -53,18 +67,23 @@ def generate_sample_outputs(
         raise ValueError("GOOGLE_API_KEY or VERTEX_API_KEY not found in environment")
     
     vector_store = VectorStore()
-    retriever = Retriever(vector_store)
+    retriever = Retriever(vector_store, search_mode=SAMPLE_SEARCH_MODE)
     chain = RAGChain(retriever, api_key=api_key)
+    vector_store.prewarm()
     
     results = []
     
-    print(f"Generating outputs for {len(queries)} queries...")
+    print(f"Generating outputs for {len(queries)} queries (concurrency={concurrency})...")
+    
+    # One batched embedding call, then bounded-concurrency generation
+    outcomes = chain.batch_invoke(queries, concurrency=concurrency)
     
-    for i, query in enumerate(queries, 1):
+    for i, (query, result) in enumerate(zip(queries, outcomes), 1):
         print(f"\n[{i}/{len(queries)}] Processing: {query}")
         
         try:
-            result = chain.invoke(query)
+            if 'error' in result:
+                raise RuntimeError(result['error'])
             
             # Save individual file
             filename = f"query_{i:02d}_{query[:30].replace(' ', '_').replace('?', '')}.json"
@@ -78,8 +97,7 @@ def generate_sample_outputs(
                 'num_sources': result.get('num_sources', 0)
             }
             
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(output_data, f, indent=2, ensure_ascii=False)
+            write_json(filepath, output_data)
             
             print(f"  ✓ Saved to {filepath}")
             print(f"  Response time: {result.get('response_time', 0):.2f}s")
@@ -96,8 +114,7 @@ def generate_sample_outputs(
     
     # Save combined results
     combined_file = Path(output_dir) / "all_outputs.json"
-    with open(combined_file, 'w', encoding='utf-8') as f:
-        json.dump(results, f, indent=2, ensure_ascii=False)
+    write_json(combined_file, results)
     
     print(f"\n✓ Combined results saved to {combined_file}")
     
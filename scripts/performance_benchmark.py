@@ -14,10 +14,6 @@ from typing import Dict, List
 
 from dotenv import load_dotenv
 
-from src.chain import RAGChain
-from src.retriever import Retriever
-from src.vector_store import VectorStore
-
 # Load environment
 load_dotenv()
 
@@ -45,21 +41,38 @@ BENCHMARK_QUERIES = [
     "Explain Python scope and namespaces"
 ]
 
+# Maximum number of queries in flight at once
+BENCHMARK_CONCURRENCY = 8
+
+# Two-stage in-memory search: truncated-prefix first pass + full-vector rerank
+BENCHMARK_SEARCH_MODE = "truncated"
+
 
 def run_benchmark(
     queries: List[str] = BENCHMARK_QUERIES,
-    output_file: str = "outputs/performance_benchmark.json"
+    output_file: str = "outputs/performance_benchmark.json",
+    concurrency: int = BENCHMARK_CONCURRENCY
 ) -> Dict:
     """
     Run performance benchmark tests.
     
+    Queries are dispatched concurrently (bounded by ``concurrency``) since
+    each one spends most of its time waiting on the Gemini API.
+    
     Args:
         queries: List of test queries
         output_file: Path to save benchmark results
+        concurrency: Maximum number of queries in flight at once
         
     Returns:
         Dictionary with benchmark results
     """
+    # Heavy imports (chromadb, langchain, Gemini SDK) are deferred so the
+    # module stays cheap to import
+    from src.chain import RAGChain
+    from src.retriever import Retriever
+    from src.vector_store import VectorStore
+    
     print("=" * 60)
     print("Performance Benchmark")
     print("=" * 60)
@@ -72,10 +85,14 @@ def run_benchmark(
         raise ValueError("GOOGLE_API_KEY or VERTEX_API_KEY not found in environment")
     
     vector_store = VectorStore()
-    retriever = Retriever(vector_store)
+    retriever = Retriever(vector_store, search_mode=BENCHMARK_SEARCH_MODE)
     chain = RAGChain(retriever, api_key=api_key)
     
-    print(f"Running {len(queries)} test queries...\n")
+    # Load vectors into RAM up front so cold reads don't land in the timings
+    print("Prewarming vector store...")
+    vector_store.prewarm()
+    
+    print(f"Running {len(queries)} test queries (concurrency={concurrency})...\n")
     
     results = []
     response_times = []
@@ -86,60 +103,54 @@ def run_benchmark(
     successful_queries = 0
     failed_queries = 0
     
-    for i, query in enumerate(queries, 1):
+    wall_start = time.time()
+    # One batched embedding call, then bounded-concurrency generation
+    outcomes = chain.batch_invoke(queries, concurrency=concurrency)
+    wall_time = time.time() - wall_start
+    
+    for i, (query, result) in enumerate(zip(queries, outcomes), 1):
         print(f"[{i}/{len(queries)}] {query[:50]}...", end=" ", flush=True)
         
-        start_time = time.time()
+        elapsed = result.get('response_time', 0.0)
+        response_times.append(elapsed)
         
-        try:
-            result = chain.invoke(query)
+        if 'error' not in result:
+            successful_queries += 1
+            num_sources_list.append(result.get('num_sources', 0))
             
-            elapsed = time.time() - start_time
-            response_times.append(elapsed)
+            # Stage timings measured inside RAGChain
+            retrieval_times.append(result.get('retrieval_time', 0.0))
+            generation_times.append(result.get('generation_time', 0.0))
             
-            if 'error' not in result:
-                successful_queries += 1
-                num_sources_list.append(result.get('num_sources', 0))
-                
-                # Estimate retrieval time (rough approximation)
-                # In a real system, we'd measure this separately
-                retrieval_times.append(elapsed * 0.3)  # Assume 30% is retrieval
-                generation_times.append(elapsed * 0.7)  # Assume 70% is generation
-                
-                results.append({
-                    'query': query,
-                    'success': True,
-                    'response_time': elapsed,
-                    'num_sources': result.get('num_sources', 0),
-                    'answer_length': len(result.get('answer', ''))
-                })
-                print(f"✓ ({elapsed:.2f}s)")
-            else:
-                failed_queries += 1
-                results.append({
-                    'query': query,
-                    'success': False,
-                    'error': result.get('error', 'Unknown error')
-                })
-                print(f"✗ Failed")
-                
-        except Exception as e:
+            results.append({
+                'query': query,
+                'success': True,
+                'response_time': elapsed,
+                'retrieval_time': result.get('retrieval_time', 0.0),
+                'generation_time': result.get('generation_time', 0.0),
+                'num_sources': result.get('num_sources', 0),
+                'answer_length': len(result.get('answer', ''))
+            })
+            print(f"✓ ({elapsed:.2f}s)")
+        else:
             failed_queries += 1
-            elapsed = time.time() - start_time
             results.append({
                 'query': query,
                 'success': False,
-                'error': str(e),
+                'error': result.get('error', 'Unknown error'),
                 'response_time': elapsed
             })
-            print(f"✗ Error: {str(e)[:30]}")
+            print(f"✗ Failed")
     
     # Calculate statistics
     stats = {
         'total_queries': len(queries),
         'successful': successful_queries,
         'failed': failed_queries,
-        'success_rate': successful_queries / len(queries) * 100 if queries else 0
+        'success_rate': successful_queries / len(queries) * 100 if queries else 0,
+        'concurrency': concurrency,
+        'wall_time': wall_time,
+        'throughput_qps': len(queries) / wall_time if wall_time > 0 else 0
     }
     
     if response_times:
@@ -197,6 +208,7 @@ def run_benchmark(
     print(f"Successful: {stats['successful']}")
     print(f"Failed: {stats['failed']}")
     print(f"Success Rate: {stats['success_rate']:.1f}%")
+    print(f"Wall Time: {stats['wall_time']:.2f}s ({stats['throughput_qps']:.2f} queries/s)")
     print()
     
     if 'response_time' in stats:
@@ -209,6 +221,12 @@ def run_benchmark(
         print(f"  Std Dev: {rt['stdev']:.2f}s")
         print()
     
+    if 'retrieval_time' in stats and 'generation_time' in stats:
+        print("Stage Timings (mean / median):")
+        print(f"  Retrieval: {stats['retrieval_time']['mean']:.3f}s / {stats['retrieval_time']['median']:.3f}s")
+        print(f"  Generation: {stats['generation_time']['mean']:.3f}s / {stats['generation_time']['median']:.3f}s")
+        print()
+    
     if 'sources' in stats:
         src = stats['sources']
         print("Sources per Query:")
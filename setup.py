@@ -10,10 +10,13 @@ This script initializes the project by:
 6. Running basic tests
 """
 
+import itertools
 import os
+import queue
 import sys
+import threading
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Dict, Iterable, Optional
 
 from dotenv import load_dotenv
 
@@ -21,11 +24,18 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Import project modules
-from src.scraper import scrape_python_docs, load_scraped_data
-from src.chunker import chunk_documents
-from src.embeddings import EmbeddingGenerator
+from src.scraper import PAGE_CACHE_TTL, iter_scraped_data, scrape_python_docs, scraped_data_path
+from src.chunker import deduplicate_chunks, iter_chunk_documents
+from src.embeddings import BATCH_SIZE as EMBEDDING_BATCH_SIZE, EmbeddingGenerator
+from src.semantic_cache import SemanticCache
 from src.vector_store import VectorStore
 
+# Chunks embedded and indexed per step while building the vector store
+INGEST_BATCH_SIZE = 500
+
+# Scraped pages buffered between the scraper and the indexer
+PIPELINE_QUEUE_SIZE = 64
+
 
 def check_env_file() -> bool:
     """Check if .env file exists and has GOOGLE_API_KEY or VERTEX_API_KEY."""
@@ -60,26 +70,39 @@ def create_directories():
     print("✅ Created necessary directories")
 
 
-def scrape_documentation(max_pages: int = 100, force: bool = False, include_advanced: bool = True) -> bool:
+def scrape_documentation(
+    max_pages: int = 100,
+    force: bool = False,
+    include_advanced: bool = True,
+    on_page: Optional[Callable[[Dict], None]] = None,
+    max_age: Optional[float] = PAGE_CACHE_TTL
+) -> bool:
     """
     Scrape Python documentation.
     
     Args:
         max_pages: Maximum number of pages to scrape
         force: Force re-scraping even if data exists
-        
+        include_advanced: Whether to also scrape the library and language references
+        on_page: Called with each page as soon as it is scraped
+        max_age: Seconds a saved page is reused without a request; a
+            forced or confirmed re-scrape revalidates every page instead
+    
     Returns:
         True if successful
     """
-    data_dir = Path("data")
-    all_docs_file = data_dir / "all_docs.json"
-    
-    if all_docs_file.exists() and not force:
+    if scraped_data_path("data") is not None and not force:
         print("📚 Found existing scraped data")
         response = input("   Re-scrape documentation? (y/N): ").strip().lower()
         if response != 'y':
             print("✅ Using existing scraped data")
             return True
+        force = True
+    
+    if force:
+        # A re-scrape should pick up upstream changes, so saved pages are
+        # only kept when the server answers 304 Not Modified
+        max_age = 0
     
     print(f"🕷️  Scraping Python documentation (max {max_pages} pages)...")
     if include_advanced:
@@ -88,12 +111,21 @@ def scrape_documentation(max_pages: int = 100, force: bool = False, include_adva
         print("     • Language Reference (decorators, generators, etc.)")
         print("     • Advanced topics")
     try:
-        docs = scrape_python_docs(max_pages=max_pages, include_advanced=include_advanced)
+        docs = scrape_python_docs(
+            max_pages=max_pages,
+            include_advanced=include_advanced,
+            on_page=on_page,
+            max_age=max_age
+        )
         print(f"✅ Successfully scraped {len(docs)} pages")
         print(f"   Breakdown:")
-        tutorial_count = sum(1 for d in docs if 'tutorial' in d.get('url', '').lower())
-        library_count = sum(1 for d in docs if 'library' in d.get('url', '').lower())
-        reference_count = sum(1 for d in docs if 'reference' in d.get('url', '').lower())
+        # Tally every category in one pass over the URLs
+        tutorial_count = library_count = reference_count = 0
+        for d in docs:
+            url = d.get('url', '').lower()
+            tutorial_count += 'tutorial' in url
+            library_count += 'library' in url
+            reference_count += 'reference' in url
         print(f"     • Tutorial: {tutorial_count} pages")
         print(f"     • Library: {library_count} pages")
         print(f"     • Reference: {reference_count} pages")
@@ -103,75 +135,149 @@ def scrape_documentation(max_pages: int = 100, force: bool = False, include_adva
         return False
 
 
-def build_vector_store(force: bool = False) -> bool:
+def build_vector_store(force: bool = False, docs: Optional[Iterable[Dict]] = None) -> bool:
     """
     Build vector store from scraped documentation.
     
     Args:
         force: Force rebuild even if index exists
-        
+        docs: Documents to index (e.g. pages arriving from a running
+            scrape); read from the scraped data on disk when omitted
+    
     Returns:
         True if successful
     """
-    # Load scraped data
+    # Stream scraped data; documents are read as chunking consumes them
     print("📖 Loading scraped documentation...")
-    docs = load_scraped_data()
+    docs = iter(docs) if docs is not None else iter_scraped_data()
+    first_doc = next(docs, None)
     
-    if not docs:
+    if first_doc is None:
         print("❌ No scraped documentation found. Please run scraper first.")
         return False
     
-    print(f"✅ Loaded {len(docs)} documents")
+    docs = itertools.chain([first_doc], docs)
     
     # Check if vector store already exists
     vector_store = VectorStore()
-    if vector_store.check_if_indexed() and not force:
-        print("📊 Vector store already exists")
-        response = input("   Rebuild vector store? (y/N): ").strip().lower()
-        if response != 'y':
-            stats = vector_store.get_collection_stats()
-            print(f"✅ Using existing vector store ({stats.get('document_count', 0)} documents)")
-            return True
-        else:
-            print("🗑️  Clearing existing vector store...")
-            vector_store.clear_collection()
-    
-    # Chunk documents
-    print("✂️  Chunking documents...")
-    chunks = chunk_documents(docs)
-    print(f"✅ Created {len(chunks)} chunks")
+    # One count() round trip answers both "is it indexed?" and "how big?"
+    existing_count = vector_store.get_collection_stats().get('document_count', 0)
+    if existing_count > 0:
+        if not force:
+            print("📊 Vector store already exists")
+            response = input("   Rebuild vector store? (y/N): ").strip().lower()
+            if response != 'y':
+                print(f"✅ Using existing vector store ({existing_count} documents)")
+                return True
+        print("🗑️  Clearing existing vector store...")
+        vector_store.clear_collection()
     
-    # Generate embeddings
-    print("🔢 Generating embeddings (this may take a while)...")
     # Use Gemini embeddings if API key is available, otherwise use local model
     api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("VERTEX_API_KEY")
     embedding_generator = EmbeddingGenerator(api_key=api_key)
     
-    try:
-        chunks_with_embeddings = embedding_generator.generate_embeddings(
-            chunks,
-            show_progress=True
-        )
-        print(f"✅ Generated embeddings for {len(chunks_with_embeddings)} chunks")
-    except Exception as e:
-        print(f"❌ Error generating embeddings: {e}")
-        return False
+    # Chunk, embed and index in bounded batches so only INGEST_BATCH_SIZE
+    # chunks (and their embeddings) are held in memory at a time
+    print("✂️  Chunking and embedding documents (this may take a while)...")
+    document_count = 0
+    total_chunks = 0
+    added_count = 0
+    # Content key -> metadata of the first copy; repeated boilerplate is
+    # dropped before it costs an embedding call
+    seen_chunks = {}
+    batch = []
+    
+    def flush_batch() -> int:
+        # Index each embedding batch as it completes, while the following
+        # batches are still being embedded
+        added = 0
+        ready = []
+        for idx, embedding in embedding_generator.generate_embeddings_iter(batch, show_progress=False):
+            batch[idx]['embedding'] = embedding
+            ready.append(batch[idx])
+            if len(ready) >= EMBEDDING_BATCH_SIZE:
+                added += vector_store.add_documents(ready)
+                ready = []
+        if ready:
+            added += vector_store.add_documents(ready)
+        print(f"   Indexed {total_chunks} chunks so far...")
+        batch.clear()
+        return added
     
-    # Add to vector store
-    print("💾 Adding documents to vector store...")
     try:
-        added_count = vector_store.add_documents(chunks_with_embeddings)
-        print(f"✅ Added {added_count} documents to vector store")
-        
-        # Display stats
-        stats = vector_store.get_collection_stats()
-        print(f"📊 Vector store statistics:")
-        print(f"   - Documents: {stats.get('document_count', 0)}")
+        for doc_chunks in iter_chunk_documents(docs):
+            document_count += 1
+            batch.extend(deduplicate_chunks(doc_chunks, seen_chunks))
+            total_chunks += len(doc_chunks)
+            if len(batch) >= INGEST_BATCH_SIZE:
+                added_count += flush_batch()
         
-        return True
+        if batch:
+            added_count += flush_batch()
     except Exception as e:
-        print(f"❌ Error adding to vector store: {e}")
+        print(f"❌ Error building vector store: {e}")
         return False
+    
+    print(f"✅ Chunked {document_count} documents")
+    print(f"✅ Created {total_chunks} chunks ({total_chunks - len(seen_chunks)} duplicates skipped)")
+    print(f"✅ Added {added_count} documents to vector store")
+    
+    # Cached answers were generated from the previous index
+    SemanticCache().clear()
+    
+    # Display stats
+    stats = vector_store.get_collection_stats()
+    print(f"📊 Vector store statistics:")
+    print(f"   - Documents: {stats.get('document_count', 0)}")
+    
+    return True
+
+
+def scrape_and_build_vector_store(max_pages: int = 100) -> bool:
+    """
+    Scrape documentation and index it, overlapping the two when both run.
+    
+    When fresh pages are scraped, a background thread runs the scraper
+    and hands each page to the indexer through a bounded queue, so
+    chunking and embedding proceed while later pages are still being
+    downloaded. With existing scraped data, only the index is built.
+    
+    Args:
+        max_pages: Maximum number of tutorial pages to scrape
+    
+    Returns:
+        True if both steps succeeded
+    """
+    if scraped_data_path("data") is not None:
+        print("📚 Found existing scraped data")
+        response = input("   Re-scrape documentation? (y/N): ").strip().lower()
+        if response != 'y':
+            print("✅ Using existing scraped data")
+            return build_vector_store()
+    
+    # New pages replace the old data, so the index is rebuilt from them
+    pages = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    done = object()
+    scrape_result = []
+    
+    def produce():
+        try:
+            scrape_result.append(scrape_documentation(max_pages=max_pages, force=True, on_page=pages.put))
+        finally:
+            pages.put(done)
+    
+    scraper_thread = threading.Thread(target=produce, daemon=True)
+    scraper_thread.start()
+    
+    page_stream = iter(pages.get, done)
+    built = build_vector_store(force=True, docs=page_stream)
+    
+    # Keep draining if indexing stopped early so the scraper can finish
+    for _ in page_stream:
+        pass
+    scraper_thread.join()
+    
+    return bool(scrape_result and scrape_result[0]) and built
 
 
 def run_basic_tests() -> bool:
@@ -181,12 +287,12 @@ def run_basic_tests() -> bool:
     try:
         # Test vector store
         vector_store = VectorStore()
-        if not vector_store.check_if_indexed():
+        document_count = vector_store.get_collection_stats().get('document_count', 0)
+        if document_count == 0:
             print("❌ Vector store is empty")
             return False
         
-        stats = vector_store.get_collection_stats()
-        print(f"✅ Vector store test passed ({stats.get('document_count', 0)} documents)")
+        print(f"✅ Vector store test passed ({document_count} documents)")
         
         # Test retriever
         from src.retriever import Retriever
@@ -207,7 +313,7 @@ def run_basic_tests() -> bool:
             print("✅ Chain initialization test passed")
         
         return True
-        
+    
     except Exception as e:
         print(f"❌ Test failed: {e}")
         return False
@@ -228,8 +334,8 @@ def generate_setup_report():
         f.write(f"  API Key Configured: {'Yes' if (os.getenv('GOOGLE_API_KEY') or os.getenv('VERTEX_API_KEY')) else 'No'}\n\n")
         
         # Data
-        docs = load_scraped_data()
-        f.write(f"Scraped Documents: {len(docs)}\n\n")
+        doc_count = sum(1 for _ in iter_scraped_data())
+        f.write(f"Scraped Documents: {doc_count}\n\n")
         
         # Vector Store
         vector_store = VectorStore()
@@ -260,17 +366,10 @@ def main():
     create_directories()
     print()
     
-    # Step 3: Scrape documentation
-    print("Step 3: Scraping documentation...")
-    if not scrape_documentation(max_pages=20):
-        print("\n❌ Setup failed at scraping step.")
-        sys.exit(1)
-    print()
-    
-    # Step 4: Build vector store
-    print("Step 4: Building vector store...")
-    if not build_vector_store():
-        print("\n❌ Setup failed at vector store step.")
+    # Steps 3-4: Scrape documentation and build vector store (pipelined)
+    print("Step 3-4: Scraping documentation and building vector store...")
+    if not scrape_and_build_vector_store(max_pages=20):
+        print("\n❌ Setup failed at scraping/vector store step.")
         sys.exit(1)
     print()
     
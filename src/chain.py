@@ -5,9 +5,14 @@ This module builds the complete RAG pipeline integrating retrieval,
 prompting, and LLM generation with conversation memory.
 """
 
+import asyncio
+import json
 import logging
 import time
-from typing import Dict, List, Optional
+from collections import deque
+from functools import lru_cache
+from pathlib import Path
+from typing import Deque, Dict, Iterator, List, Optional, Union
 
 from langchain_google_genai import ChatGoogleGenerativeAI
 try:
@@ -23,6 +28,7 @@ from src.prompts import (
     NO_CONTEXT_PROMPT
 )
 from src.retriever import Retriever
+from src.semantic_cache import SemanticCache
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -31,6 +37,69 @@ logger = logging.getLogger(__name__)
 # Chain parameters
 DEFAULT_TEMPERATURE = 0.3
 MAX_CONVERSATION_HISTORY = 5
+DEFAULT_REQUEST_TIMEOUT = 15.0  # seconds per LLM call before aborting
+TIMEOUT_RETRIES = 1  # extra attempts after a timed-out LLM call
+DEFAULT_BATCH_CONCURRENCY = 8  # queries in flight at once in batch_invoke
+LLM_CLIENT_CACHE_SIZE = 16  # distinct (model, key, temperature) clients kept alive
+# Requested model name -> model that actually answered, remembered across runs
+RESOLVED_MODEL_CACHE = Path("cache/resolved_model.json")
+
+# The system prompt never changes, so every request shares one message
+_SYSTEM_MESSAGE = SystemMessage(content=SYSTEM_PROMPT)
+
+
+def _load_resolved_model(requested_model: str) -> Optional[str]:
+    """Return the model that previously served requests for requested_model."""
+    try:
+        with open(RESOLVED_MODEL_CACHE, 'r', encoding='utf-8') as f:
+            return json.load(f).get(requested_model)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_resolved_model(requested_model: str, resolved_model: str):
+    """Remember which model served requests for requested_model."""
+    try:
+        with open(RESOLVED_MODEL_CACHE, 'r', encoding='utf-8') as f:
+            resolved = json.load(f)
+    except (OSError, ValueError):
+        resolved = {}
+    
+    resolved[requested_model] = resolved_model
+    try:
+        RESOLVED_MODEL_CACHE.parent.mkdir(parents=True, exist_ok=True)
+        with open(RESOLVED_MODEL_CACHE, 'w', encoding='utf-8') as f:
+            json.dump(resolved, f, indent=2)
+    except OSError as e:
+        logger.warning(f"Could not save resolved model: {e}")
+
+
+@lru_cache(maxsize=LLM_CLIENT_CACHE_SIZE)
+def _build_llm(
+    model: str,
+    api_key: Optional[str],
+    temperature: float
+) -> ChatGoogleGenerativeAI:
+    """
+    Create (or reuse) a Gemini chat client.
+    
+    Each client owns its own HTTP connection pool, so sharing instances
+    across RAGChain objects, temperature changes and model fallbacks keeps
+    connections alive instead of paying TLS setup again.
+    
+    Args:
+        model: Gemini model name
+        api_key: Google API key
+        temperature: LLM temperature
+        
+    Returns:
+        ChatGoogleGenerativeAI instance
+    """
+    return ChatGoogleGenerativeAI(
+        model=model,
+        google_api_key=api_key,
+        temperature=temperature
+    )
 
 
 class RAGChain:
@@ -41,7 +110,9 @@ class RAGChain:
         retriever: Retriever,
         api_key: Optional[str] = None,
         model_name: str = "gemini-2.5-flash",
-        temperature: float = DEFAULT_TEMPERATURE
+        temperature: float = DEFAULT_TEMPERATURE,
+        request_timeout: float = DEFAULT_REQUEST_TIMEOUT,
+        semantic_cache: Optional[SemanticCache] = None
     ):
         """
         Initialize RAG chain.
@@ -51,21 +122,30 @@ class RAGChain:
             api_key: Google API key for Gemini
             model_name: Gemini model name (e.g., gemini-2.5-flash, gemini-2.0-flash, gemini-pro)
             temperature: LLM temperature (0.0 to 1.0)
+            request_timeout: Seconds to wait for an async LLM call before retrying
+            semantic_cache: Cache returning stored answers for near-identical
+                standalone questions (disabled when None)
         """
         self.retriever = retriever
         self.temperature = temperature
+        self.request_timeout = request_timeout
         self.model_name = model_name
-        self.conversation_history: List[Dict] = []
+        self.requested_model_name = model_name
+        self.semantic_cache = semantic_cache
+        # Oldest exchanges are evicted automatically once the deque is full
+        self.conversation_history: Deque[Dict] = deque(maxlen=MAX_CONVERSATION_HISTORY * 2)
         
         # Get API key
         api_key = api_key or self._get_api_key()
         if not api_key:
             raise ValueError("GOOGLE_API_KEY not found in environment")
+        self.api_key = api_key
         
         # Initialize LLM
         # Try newer models first (gemini-2.5-flash, gemini-2.0-flash), then fallback to older ones
         model_variants = [
-            model_name,  # Try requested model first
+            _load_resolved_model(model_name),  # Model that worked last time, if any
+            model_name,  # Then the requested model
             "gemini-2.5-flash",  # Latest fast model
             "gemini-2.0-flash",  # Alternative fast model
             "gemini-pro",  # Older stable model
@@ -73,16 +153,12 @@ class RAGChain:
         ]
         # Remove duplicates while preserving order
         seen = set()
-        model_variants = [m for m in model_variants if not (m in seen or seen.add(m))]
+        model_variants = [m for m in model_variants if m and not (m in seen or seen.add(m))]
         
         last_error = None
         for model_variant in model_variants:
             try:
-                self.llm = ChatGoogleGenerativeAI(
-                    model=model_variant,
-                    google_api_key=api_key,
-                    temperature=temperature
-                )
+                self.llm = _build_llm(model_variant, api_key, temperature)
                 self.model_name = model_variant
                 logger.info(f"Initialized RAG chain with Gemini model: {model_variant}")
                 break
@@ -94,11 +170,7 @@ class RAGChain:
             # All variants failed during initialization
             logger.warning(f"Could not initialize model during __init__, will retry during first invoke")
             # Create with gemini-2.5-flash as default, will retry on first call if it fails
-            self.llm = ChatGoogleGenerativeAI(
-                model="gemini-2.5-flash",
-                google_api_key=api_key,
-                temperature=temperature
-            )
+            self.llm = _build_llm("gemini-2.5-flash", api_key, temperature)
             self.model_name = "gemini-2.5-flash"
     
     def _get_api_key(self) -> Optional[str]:
@@ -133,18 +205,351 @@ class RAGChain:
             prompt_text = format_qa_prompt(context, question)
         
         messages = [
-            SystemMessage(content=SYSTEM_PROMPT),
+            _SYSTEM_MESSAGE,
             HumanMessage(content=prompt_text)
         ]
         
         return messages
     
+    def _prepare_messages(
+        self,
+        query: str,
+        retrieved_docs: List[Dict],
+        use_history: bool = True
+    ) -> Optional[List]:
+        """
+        Build LLM messages for a query from its retrieved documents.
+        
+        Args:
+            query: User query string
+            retrieved_docs: Documents returned by the retriever
+            use_history: Whether to treat the query as a follow-up to the
+                conversation so far
+            
+        Returns:
+            List of message objects, or None if there is no usable context
+        """
+        # Format context
+        if retrieved_docs:
+            context = self.retriever.format_context_for_prompt(retrieved_docs)
+        else:
+            context = ""
+        
+        if not context or not retrieved_docs:
+            return None
+        
+        # Determine if this is a follow-up
+        is_followup = use_history and len(self.conversation_history) > 0
+        
+        return self._create_prompt_messages(
+            context,
+            query,
+            is_followup=is_followup
+        )
+    
+    def _invoke_llm(self, messages: List) -> str:
+        """
+        Generate a non-streaming response, falling back to alternative models.
+        
+        Args:
+            messages: Prompt messages for the LLM
+            
+        Returns:
+            Generated answer text
+        """
+        try:
+            response = self.llm.invoke(messages)
+            return response.content if hasattr(response, 'content') else str(response)
+        except Exception as llm_error:
+            # If model error, try to reinitialize with alternative model
+            if "404" in str(llm_error) or "not found" in str(llm_error).lower():
+                return self._invoke_with_alternative_models(messages, llm_error)
+            raise
+    
+    async def _ainvoke_llm(self, messages: List) -> str:
+        """
+        Asynchronously generate a response, falling back to alternative models.
+        
+        Args:
+            messages: Prompt messages for the LLM
+            
+        Returns:
+            Generated answer text
+        """
+        try:
+            response = await self._ainvoke_with_timeout(messages)
+            return response.content if hasattr(response, 'content') else str(response)
+        except Exception as llm_error:
+            if "404" in str(llm_error) or "not found" in str(llm_error).lower():
+                # Model fallback re-creates the client; run it off the event loop
+                return await asyncio.to_thread(
+                    self._invoke_with_alternative_models,
+                    messages,
+                    llm_error
+                )
+            raise
+    
+    async def _ainvoke_with_timeout(self, messages: List):
+        """
+        Await the LLM with a per-call timeout, retrying stragglers.
+        
+        Gemini latency has a long tail, so a call that exceeds
+        request_timeout is abandoned and re-issued with the same prompt.
+        
+        Args:
+            messages: Prompt messages for the LLM
+            
+        Returns:
+            Raw LLM response
+        """
+        for attempt in range(TIMEOUT_RETRIES + 1):
+            try:
+                return await asyncio.wait_for(
+                    self.llm.ainvoke(messages),
+                    timeout=self.request_timeout
+                )
+            except asyncio.TimeoutError:
+                logger.warning(
+                    f"LLM call timed out after {self.request_timeout}s "
+                    f"(attempt {attempt + 1}/{TIMEOUT_RETRIES + 1})"
+                )
+        
+        raise TimeoutError(
+            f"LLM call timed out after {TIMEOUT_RETRIES + 1} attempts "
+            f"of {self.request_timeout}s"
+        )
+    
+    def _invoke_with_alternative_models(
+        self,
+        messages: List,
+        llm_error: Exception
+    ) -> str:
+        """
+        Retry generation with alternative Gemini models after a model error.
+        
+        Args:
+            messages: Prompt messages for the LLM
+            llm_error: Error raised by the currently configured model
+            
+        Returns:
+            Generated answer text from the first model that succeeds
+        """
+        logger.warning(f"Model {self.model_name} not available, trying alternative...")
+        api_key = self.api_key
+        alternative_models = ["gemini-2.5-flash", "gemini-2.0-flash", "gemini-pro", "gemini-1.5-pro"]
+        if self.model_name in alternative_models:
+            alternative_models.remove(self.model_name)
+        
+        for alt_model in alternative_models:
+            try:
+                logger.info(f"Trying alternative model: {alt_model}")
+                self.llm = _build_llm(alt_model, api_key, self.temperature)
+                self.model_name = alt_model
+                # Retry the call
+                response = self.llm.invoke(messages)
+                answer = response.content if hasattr(response, 'content') else str(response)
+                logger.info(f"Successfully used model: {alt_model}")
+                _save_resolved_model(self.requested_model_name, alt_model)
+                return answer
+            except Exception as e2:
+                logger.warning(f"Alternative model {alt_model} also failed: {e2}")
+                continue
+        
+        # All models failed - provide helpful error message
+        error_msg = (
+            f"All Gemini models failed. The error suggests the API version (v1beta) "
+            f"may not support these models, or the API key may be for a different service. "
+            f"Original error: {llm_error}"
+        )
+        logger.error(error_msg)
+        raise ValueError(error_msg)
+    
+    def _build_response(
+        self,
+        query: str,
+        answer: str,
+        retrieved_docs: List[Dict],
+        start_time: float,
+        retrieval_time: float = 0.0,
+        generation_time: float = 0.0,
+        use_history: bool = True,
+        sources: Optional[List[Dict]] = None
+    ) -> Dict:
+        """
+        Record the exchange in conversation history and build the result dict.
+        
+        Args:
+            query: User query string
+            answer: Generated answer text
+            retrieved_docs: Documents used as context (empty if none)
+            start_time: Time the query started processing
+            retrieval_time: Seconds spent retrieving documents
+            generation_time: Seconds spent generating the answer
+            use_history: Whether to record the exchange in conversation history
+            sources: Precomputed sources (e.g. from the semantic cache);
+                extracted from retrieved_docs when omitted
+            
+        Returns:
+            Dictionary with answer, sources, and metadata
+        """
+        # Extract sources
+        if sources is None:
+            sources = [
+                {
+                    'text': doc.get('text', '')[:200] + '...',
+                    'source_url': doc.get('metadata', {}).get('source_url', ''),
+                    'title': doc.get('metadata', {}).get('title', 'Untitled'),
+                    'score': doc.get('score', 0.0)
+                }
+                for doc in retrieved_docs
+            ]
+        
+        # Calculate response time
+        response_time = time.time() - start_time
+        
+        if use_history:
+            # Update conversation history
+            self.conversation_history.append({
+                'role': 'user',
+                'content': query
+            })
+            self.conversation_history.append({
+                'role': 'assistant',
+                'content': answer
+            })
+        
+        return {
+            'answer': answer,
+            'sources': sources,
+            'response_time': response_time,
+            'retrieval_time': retrieval_time,
+            'generation_time': generation_time,
+            'num_sources': len(sources),
+            'query': query
+        }
+    
+    def _build_error_response(
+        self,
+        query: str,
+        error: Exception,
+        start_time: float
+    ) -> Dict:
+        """
+        Build a user-facing result dict for a failed query.
+        
+        Args:
+            query: User query string
+            error: Exception raised while processing the query
+            start_time: Time the query started processing
+            
+        Returns:
+            Dictionary with an explanatory answer and the error string
+        """
+        logger.error(f"Error in RAG chain: {error}")
+        response_time = time.time() - start_time
+        
+        # Provide helpful error message for common issues
+        error_str = str(error)
+        if "404" in error_str and "v1beta" in error_str:
+            user_message = (
+                "The Gemini API model is not available with your current API key. "
+                "This might happen if:\n"
+                "1. Your API key is for Vertex AI (use Vertex AI setup instead)\n"
+                "2. The model name is not supported by your API version\n"
+                "3. Your API key needs to be regenerated\n\n"
+                f"Technical error: {error_str[:200]}"
+            )
+        else:
+            user_message = f"I encountered an error processing your query: {error_str[:200]}. Please try again."
+        
+        return {
+            'answer': user_message,
+            'sources': [],
+            'response_time': response_time,
+            'num_sources': 0,
+            'query': query,
+            'error': error_str
+        }
+    
+    def _use_semantic_cache(self, use_history: bool = True) -> bool:
+        """
+        Whether the semantic cache applies to the next query.
+        
+        Follow-up answers depend on the conversation so far, so only
+        standalone questions are looked up and stored.
+        """
+        return self.semantic_cache is not None and not (use_history and self.conversation_history)
+    
+    def _cache_tag(self, top_k: Optional[int], use_mmr: bool) -> str:
+        """Settings a cached answer must match to be reused."""
+        return f"{self.model_name}|{self.temperature}|{top_k}|{use_mmr}"
+    
+    def _cached_response(
+        self,
+        query: str,
+        query_embedding: Optional[List[float]],
+        top_k: Optional[int],
+        use_mmr: bool,
+        start_time: float,
+        use_history: bool = True
+    ) -> Optional[Dict]:
+        """
+        Build the result for a query from the semantic cache, if it is a hit.
+        
+        Args:
+            query: User query string
+            query_embedding: Embedding of the query
+            top_k: Number of documents to retrieve
+            use_mmr: Whether to use MMR retrieval
+            start_time: Time the query started processing
+            use_history: Whether to record the exchange in conversation history
+            
+        Returns:
+            Result dictionary (flagged ``cached``), or None on a miss
+        """
+        if query_embedding is None:
+            return None
+        
+        cached = self.semantic_cache.lookup(query_embedding, tag=self._cache_tag(top_k, use_mmr))
+        if cached is None:
+            return None
+        
+        logger.info("Semantic cache hit; skipping retrieval and generation")
+        result = self._build_response(
+            query,
+            cached['answer'],
+            [],
+            start_time,
+            use_history=use_history,
+            sources=cached['sources']
+        )
+        result['cached'] = True
+        return result
+    
+    def _cache_response(
+        self,
+        result: Dict,
+        query_embedding: Optional[List[float]],
+        top_k: Optional[int],
+        use_mmr: bool
+    ):
+        """Store a generated answer in the semantic cache."""
+        if query_embedding is None or not result['sources']:
+            return
+        
+        self.semantic_cache.add(
+            query_embedding,
+            {'answer': result['answer'], 'sources': result['sources']},
+            tag=self._cache_tag(top_k, use_mmr)
+        )
+    
     def invoke(
         self,
         query: str,
         top_k: Optional[int] = None,
         use_mmr: bool = False,
-        stream: bool = False
+        stream: bool = False,
+        query_embedding: Optional[List[float]] = None
     ) -> Dict:
         """
         Process a query through the RAG chain.
@@ -154,158 +559,297 @@ class RAGChain:
             top_k: Number of documents to retrieve
             use_mmr: Whether to use MMR retrieval
             stream: Whether to stream the response
+            query_embedding: Precomputed query embedding to skip re-embedding
             
         Returns:
             Dictionary with answer, sources, and metadata
         """
+        if stream:
+            # The last item of the stream is the complete result dict
+            *_, result = self.invoke_stream(
+                query,
+                top_k=top_k,
+                use_mmr=use_mmr,
+                query_embedding=query_embedding
+            )
+            return result
+        
         start_time = time.time()
         
         try:
+            use_cache = self._use_semantic_cache()
+            if use_cache:
+                if query_embedding is None:
+                    query_embedding = self.retriever.embed_queries([query])[0]
+                cached = self._cached_response(query, query_embedding, top_k, use_mmr, start_time)
+                if cached is not None:
+                    return cached
+            
             # Retrieve relevant documents
+            retrieval_start = time.perf_counter()
             retrieved_docs = self.retriever.retrieve(
                 query,
                 top_k=top_k,
-                use_mmr=use_mmr
+                use_mmr=use_mmr,
+                query_embedding=query_embedding
             )
+            retrieval_time = time.perf_counter() - retrieval_start
             
-            # Format context
-            if retrieved_docs:
-                context = self.retriever.format_context_for_prompt(retrieved_docs)
-            else:
-                context = ""
-            
-            # Determine if this is a follow-up
-            is_followup = len(self.conversation_history) > 0
+            messages = self._prepare_messages(query, retrieved_docs)
+            generation_start = time.perf_counter()
             
             # Generate response
-            if not context or not retrieved_docs:
+            if messages is None:
                 answer = NO_CONTEXT_PROMPT
-                sources = []
+                retrieved_docs = []
             else:
-                # Create prompt messages
-                messages = self._create_prompt_messages(
-                    context,
+                # Non-streaming response
+                answer = self._invoke_llm(messages)
+            generation_time = time.perf_counter() - generation_start
+            
+            result = self._build_response(
+                query,
+                answer,
+                retrieved_docs,
+                start_time,
+                retrieval_time=retrieval_time,
+                generation_time=generation_time
+            )
+            if use_cache:
+                self._cache_response(result, query_embedding, top_k, use_mmr)
+            return result
+            
+        except Exception as e:
+            return self._build_error_response(query, e, start_time)
+    
+    def invoke_stream(
+        self,
+        query: str,
+        top_k: Optional[int] = None,
+        use_mmr: bool = False,
+        query_embedding: Optional[List[float]] = None
+    ) -> Iterator[Union[str, Dict]]:
+        """
+        Process a query, yielding the answer as the LLM generates it.
+        
+        Answer text is yielded chunk by chunk so a UI can render tokens as
+        they arrive; the final item is the same result dict invoke()
+        returns, recorded in conversation history once the answer is complete.
+        
+        Args:
+            query: User query string
+            top_k: Number of documents to retrieve
+            use_mmr: Whether to use MMR retrieval
+            query_embedding: Precomputed query embedding to skip re-embedding
+            
+        Yields:
+            Answer text chunks, then the result dictionary
+        """
+        start_time = time.time()
+        
+        try:
+            use_cache = self._use_semantic_cache()
+            if use_cache:
+                if query_embedding is None:
+                    query_embedding = self.retriever.embed_queries([query])[0]
+                cached = self._cached_response(query, query_embedding, top_k, use_mmr, start_time)
+                if cached is not None:
+                    yield cached['answer']
+                    yield cached
+                    return
+            
+            retrieval_start = time.perf_counter()
+            retrieved_docs = self.retriever.retrieve(
+                query,
+                top_k=top_k,
+                use_mmr=use_mmr,
+                query_embedding=query_embedding
+            )
+            retrieval_time = time.perf_counter() - retrieval_start
+            
+            messages = self._prepare_messages(query, retrieved_docs)
+            generation_start = time.perf_counter()
+            
+            parts = []
+            if messages is None:
+                parts.append(NO_CONTEXT_PROMPT)
+                retrieved_docs = []
+                yield NO_CONTEXT_PROMPT
+            else:
+                for chunk in self.llm.stream(messages):
+                    content = getattr(chunk, 'content', None)
+                    if isinstance(content, str) and content:
+                        parts.append(content)
+                        yield content
+            generation_time = time.perf_counter() - generation_start
+            
+            result = self._build_response(
+                query,
+                "".join(parts),
+                retrieved_docs,
+                start_time,
+                retrieval_time=retrieval_time,
+                generation_time=generation_time
+            )
+            if use_cache:
+                self._cache_response(result, query_embedding, top_k, use_mmr)
+            yield result
+            
+        except Exception as e:
+            yield self._build_error_response(query, e, start_time)
+    
+    async def ainvoke(
+        self,
+        query: str,
+        top_k: Optional[int] = None,
+        use_mmr: bool = False,
+        query_embedding: Optional[List[float]] = None,
+        use_history: bool = True
+    ) -> Dict:
+        """
+        Asynchronously process a query through the RAG chain.
+        
+        Retrieval runs in a worker thread and generation awaits the LLM's
+        async API, so several queries can be in flight concurrently.
+        
+        Args:
+            query: User query string
+            top_k: Number of documents to retrieve
+            use_mmr: Whether to use MMR retrieval
+            query_embedding: Precomputed query embedding to skip re-embedding
+            use_history: Whether to use and update conversation history
+            
+        Returns:
+            Dictionary with answer, sources, and metadata
+        """
+        start_time = time.time()
+        
+        try:
+            use_cache = self._use_semantic_cache(use_history)
+            if use_cache:
+                if query_embedding is None:
+                    query_embedding = (await asyncio.to_thread(self.retriever.embed_queries, [query]))[0]
+                cached = self._cached_response(
                     query,
-                    is_followup=is_followup
+                    query_embedding,
+                    top_k,
+                    use_mmr,
+                    start_time,
+                    use_history=use_history
                 )
-                
-                # Generate response
-                if stream:
-                    # Streaming response
-                    response = self.llm.stream(messages)
-                    answer = ""
-                    for chunk in response:
-                        if hasattr(chunk, 'content'):
-                            answer += chunk.content
-                else:
-                    # Non-streaming response
-                    try:
-                        response = self.llm.invoke(messages)
-                        answer = response.content if hasattr(response, 'content') else str(response)
-                    except Exception as llm_error:
-                        # If model error, try to reinitialize with alternative model
-                        if "404" in str(llm_error) or "not found" in str(llm_error).lower():
-                            logger.warning(f"Model {self.model_name} not available, trying alternative...")
-                            api_key = self._get_api_key()
-                            alternative_models = ["gemini-2.5-flash", "gemini-2.0-flash", "gemini-pro", "gemini-1.5-pro"]
-                            if self.model_name in alternative_models:
-                                alternative_models.remove(self.model_name)
-                            
-                            for alt_model in alternative_models:
-                                try:
-                                    logger.info(f"Trying alternative model: {alt_model}")
-                                    self.llm = ChatGoogleGenerativeAI(
-                                        model=alt_model,
-                                        google_api_key=api_key,
-                                        temperature=self.temperature
-                                    )
-                                    self.model_name = alt_model
-                                    # Retry the call
-                                    response = self.llm.invoke(messages)
-                                    answer = response.content if hasattr(response, 'content') else str(response)
-                                    logger.info(f"Successfully used model: {alt_model}")
-                                    break
-                                except Exception as e2:
-                                    logger.warning(f"Alternative model {alt_model} also failed: {e2}")
-                                    continue
-                            else:
-                                # All models failed - provide helpful error message
-                                error_msg = (
-                                    f"All Gemini models failed. The error suggests the API version (v1beta) "
-                                    f"may not support these models, or the API key may be for a different service. "
-                                    f"Original error: {llm_error}"
-                                )
-                                logger.error(error_msg)
-                                raise ValueError(error_msg)
-                        else:
-                            raise
-                
-                # Extract sources
-                sources = [
-                    {
-                        'text': doc.get('text', '')[:200] + '...',
-                        'source_url': doc.get('metadata', {}).get('source_url', ''),
-                        'title': doc.get('metadata', {}).get('title', 'Untitled'),
-                        'score': doc.get('score', 0.0)
-                    }
-                    for doc in retrieved_docs
-                ]
+                if cached is not None:
+                    return cached
             
-            # Calculate response time
-            response_time = time.time() - start_time
+            # Retrieval (embedding + ChromaDB) is blocking I/O
+            retrieval_start = time.perf_counter()
+            retrieved_docs = await asyncio.to_thread(
+                self.retriever.retrieve,
+                query,
+                top_k=top_k,
+                use_mmr=use_mmr,
+                query_embedding=query_embedding
+            )
+            retrieval_time = time.perf_counter() - retrieval_start
             
-            # Update conversation history
-            self.conversation_history.append({
-                'role': 'user',
-                'content': query
-            })
-            self.conversation_history.append({
-                'role': 'assistant',
-                'content': answer
-            })
+            messages = self._prepare_messages(query, retrieved_docs, use_history=use_history)
+            generation_start = time.perf_counter()
             
-            # Limit history size
-            if len(self.conversation_history) > MAX_CONVERSATION_HISTORY * 2:
-                self.conversation_history = self.conversation_history[-MAX_CONVERSATION_HISTORY * 2:]
+            if messages is None:
+                answer = NO_CONTEXT_PROMPT
+                retrieved_docs = []
+            else:
+                answer = await self._ainvoke_llm(messages)
+            generation_time = time.perf_counter() - generation_start
             
-            return {
-                'answer': answer,
-                'sources': sources,
-                'response_time': response_time,
-                'num_sources': len(sources),
-                'query': query
-            }
+            result = self._build_response(
+                query,
+                answer,
+                retrieved_docs,
+                start_time,
+                retrieval_time=retrieval_time,
+                generation_time=generation_time,
+                use_history=use_history
+            )
+            if use_cache:
+                self._cache_response(result, query_embedding, top_k, use_mmr)
+            return result
             
         except Exception as e:
-            logger.error(f"Error in RAG chain: {e}")
-            response_time = time.time() - start_time
+            return self._build_error_response(query, e, start_time)
+    
+    async def abatch_invoke(
+        self,
+        queries: List[str],
+        top_k: Optional[int] = None,
+        concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+        query_embeddings: Optional[List[Optional[List[float]]]] = None
+    ) -> List[Dict]:
+        """
+        Asynchronously process many independent queries.
+        
+        All queries are embedded in one batched call, then run through
+        ainvoke() with at most ``concurrency`` in flight. Queries are
+        treated as standalone questions: conversation history is neither
+        used nor updated.
+        
+        Args:
+            queries: User query strings
+            top_k: Number of documents to retrieve per query
+            concurrency: Maximum number of queries in flight at once
+            query_embeddings: Precomputed query embeddings (computed here
+                if omitted)
             
-            # Provide helpful error message for common issues
-            error_str = str(e)
-            if "404" in error_str and "v1beta" in error_str:
-                user_message = (
-                    "The Gemini API model is not available with your current API key. "
-                    "This might happen if:\n"
-                    "1. Your API key is for Vertex AI (use Vertex AI setup instead)\n"
-                    "2. The model name is not supported by your API version\n"
-                    "3. Your API key needs to be regenerated\n\n"
-                    f"Technical error: {error_str[:200]}"
+        Returns:
+            Result dictionaries in input order
+        """
+        if query_embeddings is None:
+            query_embeddings = await asyncio.to_thread(self.retriever.embed_queries, queries)
+        
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def _invoke_one(query: str, query_embedding: Optional[List[float]]) -> Dict:
+            async with semaphore:
+                return await self.ainvoke(
+                    query,
+                    top_k=top_k,
+                    query_embedding=query_embedding,
+                    use_history=False
                 )
-            else:
-                user_message = f"I encountered an error processing your query: {error_str[:200]}. Please try again."
+        
+        return await asyncio.gather(*[
+            _invoke_one(q, emb) for q, emb in zip(queries, query_embeddings)
+        ])
+    
+    def batch_invoke(
+        self,
+        queries: List[str],
+        top_k: Optional[int] = None,
+        concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+        query_embeddings: Optional[List[Optional[List[float]]]] = None
+    ) -> List[Dict]:
+        """
+        Process many independent queries (see abatch_invoke).
+        
+        Args:
+            queries: User query strings
+            top_k: Number of documents to retrieve per query
+            concurrency: Maximum number of queries in flight at once
+            query_embeddings: Precomputed query embeddings (computed here
+                if omitted)
             
-            return {
-                'answer': user_message,
-                'sources': [],
-                'response_time': response_time,
-                'num_sources': 0,
-                'query': query,
-                'error': error_str
-            }
+        Returns:
+            Result dictionaries in input order
+        """
+        return asyncio.run(self.abatch_invoke(
+            queries,
+            top_k=top_k,
+            concurrency=concurrency,
+            query_embeddings=query_embeddings
+        ))
     
     def clear_history(self):
         """Clear conversation history."""
-        self.conversation_history = []
+        self.conversation_history.clear()
         logger.info("Conversation history cleared")
     
     def update_temperature(self, temperature: float):
@@ -316,12 +860,12 @@ class RAGChain:
             temperature: New temperature value (0.0 to 1.0)
         """
         self.temperature = temperature
-        api_key = self._get_api_key()
-        self.llm = ChatGoogleGenerativeAI(
-            model=self.model_name,
-            google_api_key=api_key,
-            temperature=temperature
-        )
+        try:
+            # A shallow copy shares the cached client's connection pool; the
+            # cached instance itself is shared, so it isn't mutated in place
+            self.llm = self.llm.model_copy(update={'temperature': temperature})
+        except AttributeError:
+            self.llm = _build_llm(self.model_name, self.api_key, temperature)
         logger.info(f"Updated temperature to {temperature}")
 
 
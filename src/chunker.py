@@ -5,9 +5,13 @@ This module implements intelligent text chunking with metadata preservation
 for RAG applications.
 """
 
+import hashlib
 import logging
-from typing import Dict, List
+import os
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Iterator, List
 
+import numpy as np
 import tiktoken
 try:
     from langchain_text_splitters import RecursiveCharacterTextSplitter
@@ -22,31 +26,102 @@ logger = logging.getLogger(__name__)
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 200
 
+# Use the single-pass splitter instead of LangChain's recursive one
+USE_FAST_SPLITTER = True
 
-def chunk_documents(
-    documents: List[Dict],
-    chunk_size: int = CHUNK_SIZE,
-    chunk_overlap: int = CHUNK_OVERLAP
-) -> List[Dict]:
+# Split points in priority order: paragraphs, lines, sentences, words
+SEPARATORS = ["\n\n", "\n", ". ", " "]
+
+
+def _fast_split(text: str, chunk_size: int, chunk_overlap: int) -> List[str]:
     """
-    Split documents into chunks with metadata preservation.
+    Split text into overlapping chunks in a single forward pass.
+    
+    Mirrors RecursiveCharacterTextSplitter's packing: each chunk ends at the
+    last paragraph break that fits in chunk_size, else the last line,
+    sentence or word break, else a hard cut. The next chunk starts at the
+    first word boundary within chunk_overlap characters of the previous end.
+    Break points are located with str.rfind, so no intermediate split lists
+    are built.
     
     Args:
-        documents: List of document dictionaries with 'content', 'url', 'title'
+        text: Text to split
         chunk_size: Maximum size of each chunk in characters
-        chunk_overlap: Number of characters to overlap between chunks
+        chunk_overlap: Maximum number of characters shared by adjacent chunks
         
     Returns:
-        List of chunk dictionaries with metadata
+        List of whitespace-stripped chunk strings
     """
+    chunks = []
+    start = 0
+    prev_end = 0
+    text_length = len(text)
+    while start < text_length:
+        limit = start + chunk_size
+        end = min(limit, text_length)
+        
+        if limit < text_length:
+            # Break after the highest-priority separator past the previous chunk
+            for separator in SEPARATORS:
+                pos = text.rfind(separator, prev_end, limit)
+                if pos != -1:
+                    end = pos + len(separator)
+                    break
+        
+        piece = text[start:end].strip()
+        if piece:
+            chunks.append(piece)
+        if end >= text_length:
+            break
+        
+        # Carry up to chunk_overlap characters, starting on a word boundary
+        pos = text.find(" ", max(end - chunk_overlap, start + 1), end)
+        start = pos + 1 if pos != -1 else end
+        prev_end = end
+    
+    return chunks
+
+
+def _get_splitter(
+    chunk_size: int,
+    chunk_overlap: int,
+    use_fast_splitter: bool
+) -> Callable[[str], List[str]]:
+    """Return a text -> chunks function for the configured splitter."""
+    if use_fast_splitter:
+        return lambda text: _fast_split(text, chunk_size, chunk_overlap)
+    
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap,
         length_function=len,
-        separators=["\n\n", "\n", ". ", " ", ""]
+        separators=SEPARATORS + [""]
     )
+    return text_splitter.split_text
+
+
+def iter_chunk_documents(
+    documents: Iterable[Dict],
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP,
+    use_fast_splitter: bool = USE_FAST_SPLITTER
+) -> Iterator[List[Dict]]:
+    """
+    Lazily split documents into chunks, yielding one list per document.
     
-    all_chunks = []
+    Only one document's chunks are held at a time, so callers can embed
+    and index a corpus larger than memory.
+    
+    Args:
+        documents: Iterable of document dictionaries with 'content', 'url', 'title'
+        chunk_size: Maximum size of each chunk in characters
+        chunk_overlap: Number of characters to overlap between chunks
+        use_fast_splitter: Use the single-pass splitter (False for LangChain's)
+    
+    Yields:
+        List of chunk dictionaries with metadata for each non-empty document
+    """
+    split_text = _get_splitter(chunk_size, chunk_overlap, use_fast_splitter)
     
     for doc_idx, doc in enumerate(documents):
         content = doc.get('content', '')
@@ -58,11 +133,11 @@ def chunk_documents(
             continue
         
         # Split into chunks
-        chunks = text_splitter.split_text(content)
+        chunks = split_text(content)
         
         # Create chunk metadata
-        for chunk_idx, chunk_text in enumerate(chunks):
-            chunk_data = {
+        doc_chunks = [
+            {
                 'text': chunk_text,
                 'metadata': {
                     'source_url': url,
@@ -73,14 +148,107 @@ def chunk_documents(
                     'chunk_size': len(chunk_text)
                 }
             }
-            all_chunks.append(chunk_data)
+            for chunk_idx, chunk_text in enumerate(chunks)
+        ]
         
         logger.info(f"Split '{title}' into {len(chunks)} chunks")
+        yield doc_chunks
+
+
+def chunk_documents(
+    documents: List[Dict],
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP,
+    use_fast_splitter: bool = USE_FAST_SPLITTER
+) -> List[Dict]:
+    """
+    Split documents into chunks with metadata preservation.
+    
+    Args:
+        documents: List of document dictionaries with 'content', 'url', 'title'
+        chunk_size: Maximum size of each chunk in characters
+        chunk_overlap: Number of characters to overlap between chunks
+        use_fast_splitter: Use the single-pass splitter (False for LangChain's)
+    
+    Returns:
+        List of chunk dictionaries with metadata
+    """
+    all_chunks = []
+    for doc_chunks in iter_chunk_documents(documents, chunk_size, chunk_overlap, use_fast_splitter):
+        all_chunks.extend(doc_chunks)
     
     logger.info(f"Total chunks created: {len(all_chunks)}")
     return all_chunks
 
 
+def chunk_content_key(text: str) -> bytes:
+    """
+    Hash chunk text for duplicate detection.
+    
+    Case and whitespace are normalized so boilerplate repeated across pages
+    with different formatting maps to the same key.
+    
+    Args:
+        text: Chunk text
+    
+    Returns:
+        8-byte BLAKE2b digest of the normalized text
+    """
+    normalized = " ".join(text.lower().split())
+    return hashlib.blake2b(normalized.encode('utf-8'), digest_size=8).digest()
+
+
+def deduplicate_chunks(chunks: List[Dict], seen: Dict[bytes, Dict]) -> List[Dict]:
+    """
+    Drop chunks whose text was already seen, before they are embedded.
+    
+    The first copy's metadata gains a space-separated 'source_urls' entry
+    listing every page the text appeared on. Sources found after the first
+    copy has been indexed are not written back.
+    
+    Args:
+        chunks: Chunk dictionaries with 'text' and 'metadata'
+        seen: Content key -> first copy's metadata, shared across calls
+    
+    Returns:
+        Chunks whose text has not been seen before
+    """
+    unique = []
+    for chunk in chunks:
+        key = chunk_content_key(chunk['text'])
+        first_metadata = seen.get(key)
+        
+        if first_metadata is None:
+            seen[key] = chunk['metadata']
+            unique.append(chunk)
+            continue
+        
+        url = chunk['metadata'].get('source_url', '')
+        sources = first_metadata.get('source_urls', first_metadata.get('source_url', '')).split()
+        if url and url not in sources:
+            first_metadata['source_urls'] = " ".join(sources + [url])
+    
+    return unique
+
+
+@lru_cache(maxsize=4)
+def _get_encoding(model: str) -> tiktoken.Encoding:
+    """
+    Load (once per model) the tiktoken encoding for a model.
+    
+    Args:
+        model: Model name for tokenizer
+    
+    Returns:
+        Encoding for the model, or cl100k_base for unknown models
+    """
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        # Fallback to cl100k_base encoding
+        return tiktoken.get_encoding("cl100k_base")
+
+
 def count_tokens(text: str, model: str = "gpt-3.5-turbo") -> int:
     """
     Count tokens in text using tiktoken.
@@ -88,17 +256,11 @@ def count_tokens(text: str, model: str = "gpt-3.5-turbo") -> int:
     Args:
         text: Text to count tokens for
         model: Model name for tokenizer
-        
+    
     Returns:
         Number of tokens
     """
-    try:
-        encoding = tiktoken.encoding_for_model(model)
-        return len(encoding.encode(text))
-    except KeyError:
-        # Fallback to cl100k_base encoding
-        encoding = tiktoken.get_encoding("cl100k_base")
-        return len(encoding.encode(text))
+    return len(_get_encoding(model).encode(text))
 
 
 def count_chunk_tokens(chunks: List[Dict], model: str = "gpt-3.5-turbo") -> Dict:
@@ -108,18 +270,19 @@ def count_chunk_tokens(chunks: List[Dict], model: str = "gpt-3.5-turbo") -> Dict
     Args:
         chunks: List of chunk dictionaries
         model: Model name for tokenizer
-        
+    
     Returns:
         Dictionary with token statistics
     """
-    token_counts = []
-    
-    for chunk in chunks:
-        text = chunk.get('text', '')
-        token_count = count_tokens(text, model)
-        token_counts.append(token_count)
+    encoding = _get_encoding(model)
+    # encode_batch tokenizes in tiktoken's Rust core across threads
+    token_lists = encoding.encode_batch(
+        [chunk.get('text', '') for chunk in chunks],
+        num_threads=os.cpu_count() or 1
+    )
+    token_counts = np.fromiter((len(tokens) for tokens in token_lists), dtype=np.int64)
     
-    if not token_counts:
+    if not token_counts.size:
         return {
             'total_chunks': 0,
             'total_tokens': 0,
@@ -129,11 +292,11 @@ def count_chunk_tokens(chunks: List[Dict], model: str = "gpt-3.5-turbo") -> Dict
         }
     
     return {
-        'total_chunks': len(token_counts),
-        'total_tokens': sum(token_counts),
-        'avg_tokens': sum(token_counts) / len(token_counts),
-        'min_tokens': min(token_counts),
-        'max_tokens': max(token_counts)
+        'total_chunks': int(token_counts.size),
+        'total_tokens': int(token_counts.sum()),
+        'avg_tokens': float(token_counts.mean()),
+        'min_tokens': int(token_counts.min()),
+        'max_tokens': int(token_counts.max())
     }
 
 
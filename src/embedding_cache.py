@@ -0,0 +1,273 @@
+"""
+Persistent embedding cache backed by SQLite.
+
+This module stores embedding vectors as compact blobs (float16 by
+default, optionally int8 with a per-vector scale) keyed by a digest of
+the embedded text (XXH3-128 when xxhash is installed, SHA-256
+otherwise), so repeated runs (setup, benchmarks, sample generation) skip
+the embedding API for text seen before. Recently
+used vectors are also kept in an in-process LRU so repeat lookups within
+a run skip SQLite entirely.
+"""
+
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.vector_math import quantize_int8
+
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Default database file name inside the cache directory
+CACHE_DB_NAME = "embeddings.sqlite3"
+
+# Keys per SELECT ... IN (...) query (SQLite's default variable limit is 999)
+LOOKUP_BATCH_SIZE = 500
+
+# Vectors kept in the in-memory LRU (~30 MB at 768 float32 dimensions)
+MEMORY_CACHE_SIZE = 10_000
+
+# On-disk storage formats; float16 halves the database with relative error
+# around 1e-3, int8 (plus a float32 scale) quarters it at ~1e-2
+CACHE_PRECISIONS = ("float32", "float16", "int8")
+CACHE_PRECISION = "float16"
+
+
+def _encode(vector: np.ndarray, precision: str) -> bytes:
+    """Pack a float32 vector into a blob in the given storage format."""
+    if precision == "int8":
+        codes, scales = quantize_int8(vector[None, :])
+        return scales.tobytes() + codes.tobytes()
+    return vector.astype(precision).tobytes()
+
+
+def _decode(blob: bytes, precision: str) -> np.ndarray:
+    """Unpack a blob written by _encode() into a float32 vector."""
+    if precision == "int8":
+        scale = np.frombuffer(blob[:4], dtype=np.float32)[0]
+        return np.frombuffer(blob[4:], dtype=np.int8).astype(np.float32) * scale
+    return np.frombuffer(blob, dtype=precision).astype(np.float32)
+
+
+class EmbeddingCache:
+    """SQLite-backed store mapping text digests to embedding vectors."""
+    
+    def __init__(
+        self,
+        path: str = f"cache/embeddings/{CACHE_DB_NAME}",
+        memory_size: int = MEMORY_CACHE_SIZE,
+        precision: str = CACHE_PRECISION
+    ):
+        """
+        Open (or create) the cache database.
+        
+        Args:
+            path: Path to the SQLite database file
+            memory_size: Vectors kept in the in-memory LRU (0 disables it)
+            precision: Storage format for new entries, one of
+                CACHE_PRECISIONS (existing entries keep their own format)
+        """
+        if precision not in CACHE_PRECISIONS:
+            raise ValueError(f"precision must be one of {CACHE_PRECISIONS}, got {precision!r}")
+        
+        self.path = Path(path)
+        self.precision = precision
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.memory_size = memory_size
+        
+        # Most recently used key last; guarded by the same lock as SQLite
+        self._memory: OrderedDict = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        
+        # The generator is shared across worker threads (e.g. async retrieval),
+        # so a single connection is guarded by a lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "sha256 TEXT PRIMARY KEY, "
+            "vec BLOB NOT NULL, "
+            "dtype TEXT NOT NULL DEFAULT 'float32')"
+        )
+        # Databases created before the dtype column hold float32 blobs
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(embeddings)")}
+        if "dtype" not in columns:
+            self._conn.execute(
+                "ALTER TABLE embeddings ADD COLUMN dtype TEXT NOT NULL DEFAULT 'float32'"
+            )
+        self._conn.commit()
+    
+    @staticmethod
+    def key_for(text: str) -> str:
+        """Return the cache key for text (XXH3-128 hex digest if available)."""
+        if XXHASH_AVAILABLE:
+            return xxhash.xxh3_128_hexdigest(text.encode('utf-8'))
+        return EmbeddingCache.legacy_key_for(text)
+    
+    @staticmethod
+    def legacy_key_for(text: str) -> str:
+        """Return the SHA-256 hex digest key used by older caches."""
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+    
+    def _remember(self, key: str, vector: np.ndarray):
+        """Insert a vector into the in-memory LRU (caller holds the lock)."""
+        if self.memory_size <= 0:
+            return
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+    
+    def _recall(self, key: str) -> Optional[np.ndarray]:
+        """Look up a vector in the in-memory LRU (caller holds the lock)."""
+        vector = self._memory.get(key)
+        if vector is not None:
+            self._memory.move_to_end(key)
+        return vector
+    
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """
+        Look up an embedding by cache key.
+        
+        Args:
+            key: Cache key from key_for()
+        
+        Returns:
+            float32 embedding vector, or None on a miss
+        """
+        with self._lock:
+            vector = self._recall(key)
+            if vector is not None:
+                self.memory_hits += 1
+                return vector
+            
+            row = self._conn.execute(
+                "SELECT vec, dtype FROM embeddings WHERE sha256 = ?",
+                (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            
+            self.disk_hits += 1
+            vector = _decode(row[0], row[1])
+            self._remember(key, vector)
+            return vector
+    
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Look up many embeddings with one query per LOOKUP_BATCH_SIZE keys.
+        
+        Args:
+            keys: Cache keys from key_for()
+        
+        Returns:
+            Mapping of found keys to float32 embedding vectors (misses are absent)
+        """
+        found = {}
+        with self._lock:
+            # Serve what is in memory; only the rest goes to SQLite
+            pending = []
+            for key in dict.fromkeys(keys):
+                vector = self._recall(key)
+                if vector is not None:
+                    found[key] = vector
+                else:
+                    pending.append(key)
+            memory_found = len(found)
+            
+            for i in range(0, len(pending), LOOKUP_BATCH_SIZE):
+                batch = pending[i:i + LOOKUP_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT sha256, vec, dtype FROM embeddings WHERE sha256 IN ({placeholders})",
+                    batch
+                ).fetchall()
+                for key, blob, precision in rows:
+                    found[key] = _decode(blob, precision)
+                    self._remember(key, found[key])
+            
+            disk_found = len(found) - memory_found
+            self.memory_hits += memory_found
+            self.disk_hits += disk_found
+            self.misses += len(pending) - disk_found
+        return found
+    
+    def put(self, key: str, embedding: Sequence[float]):
+        """
+        Store an embedding under a cache key.
+        
+        Args:
+            key: Cache key from key_for()
+            embedding: Embedding vector
+        """
+        blob = _encode(np.asarray(embedding, dtype=np.float32), self.precision)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embeddings (sha256, vec, dtype) VALUES (?, ?, ?)",
+                (key, blob, self.precision)
+            )
+            self._conn.commit()
+            # Remember what a later disk read would return
+            self._remember(key, _decode(blob, self.precision))
+    
+    def put_many(self, items: Iterable[Tuple[str, Sequence[float]]]):
+        """
+        Store many embeddings in a single transaction.
+        
+        Args:
+            items: (cache key, embedding vector) pairs
+        """
+        blobs = [
+            (key, _encode(np.asarray(embedding, dtype=np.float32), self.precision))
+            for key, embedding in items
+        ]
+        if not blobs:
+            return
+        
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (sha256, vec, dtype) VALUES (?, ?, ?)",
+                [(key, blob, self.precision) for key, blob in blobs]
+            )
+            self._conn.commit()
+            for key, blob in blobs:
+                self._remember(key, _decode(blob, self.precision))
+    
+    def stats(self) -> Dict[str, int]:
+        """Return lookup counters for the in-memory and SQLite tiers."""
+        with self._lock:
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'memory_entries': len(self._memory)
+            }
+    
+    def __len__(self) -> int:
+        """Return the number of cached embeddings."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+    
+    def close(self):
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
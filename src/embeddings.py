@@ -6,12 +6,15 @@ for generating document embeddings.
 """
 
 import hashlib
-import json
 import logging
 import os
+import random
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 
 try:
     from langchain_google_genai import GoogleGenerativeAIEmbeddings
@@ -19,16 +22,43 @@ try:
 except ImportError:
     GEMINI_EMBEDDINGS_AVAILABLE = False
 
+import numpy as np
+import torch
 from sentence_transformers import SentenceTransformer
 
+from src.embedding_cache import CACHE_DB_NAME, XXHASH_AVAILABLE, EmbeddingCache
+from src.rate_limiter import TokenBucket
+from src.serialization import read_json
+from src.vector_math import truncate_embeddings
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Embedding parameters
-BATCH_SIZE = 100
+BATCH_SIZE = 100  # Gemini's maximum texts per embed_content request
 MAX_RETRIES = 3
 RETRY_DELAY = 1.0
+# Gemini batches in flight at once (rate limits are per project, not per connection)
+EMBEDDING_CONCURRENCY = 5
+# Upper bound on the random delay before each batch, to avoid bursts of 429s
+BATCH_START_JITTER = 0.1
+# Gemini embedding quota in texts per minute; requests are throttled to it
+# up front rather than waiting for 429s (None disables the limiter)
+EMBEDDING_RATE_LIMIT = 1500
+# Gemini embeddings are Matryoshka-trained; 768 is text-embedding-004's native
+# size, smaller values trade a little recall for storage and search speed
+# (see scripts/embedding_dimension_eval.py)
+OUTPUT_DIMENSIONALITY = 768
+# Gemini task type for indexed chunks
+DOCUMENT_TASK_TYPE = "RETRIEVAL_DOCUMENT"
+# Texts per local-model encode() call; sentence-transformers sorts each call's
+# inputs by length before padding, so larger calls waste fewer pad tokens
+LOCAL_BATCH_SIZE = 1024
+# Whole result sets remembered for repeated calls with the same texts (any
+# order), and the largest call eligible; bulk ingests are never repeated
+BATCH_CACHE_SIZE = 64
+BATCH_CACHE_MAX_TEXTS = 32
 
 
 class EmbeddingGenerator:
@@ -39,7 +69,10 @@ class EmbeddingGenerator:
         api_key: Optional[str] = None,
         use_gemini: bool = True,
         use_cache: bool = True,
-        cache_dir: str = "cache/embeddings"
+        cache_dir: str = "cache/embeddings",
+        output_dimensionality: Optional[int] = OUTPUT_DIMENSIONALITY,
+        max_concurrent_batches: int = EMBEDDING_CONCURRENCY,
+        rate_limit: Optional[float] = EMBEDDING_RATE_LIMIT
     ):
         """
         Initialize embedding generator.
@@ -49,11 +82,25 @@ class EmbeddingGenerator:
             use_gemini: Whether to use Gemini embeddings (fallback to sentence-transformers)
             use_cache: Whether to use embedding cache
             cache_dir: Directory for caching embeddings
+            output_dimensionality: Gemini embedding size (None for the model default)
+            max_concurrent_batches: Gemini batches in flight at once; lower it
+                to stay under a tight rate limit
+            rate_limit: Gemini texts per minute (None for no limit)
         """
         self.api_key = api_key or os.getenv("GOOGLE_API_KEY") or os.getenv("VERTEX_API_KEY")
         self.use_cache = use_cache
+        self.output_dimensionality = output_dimensionality
+        self.max_concurrent_batches = max(1, max_concurrent_batches)
+        # Shared by all worker threads; one full request may burst at once
+        self.rate_limiter = TokenBucket(rate_limit / 60, BATCH_SIZE) if rate_limit else None
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.cache = EmbeddingCache(str(self.cache_dir / CACHE_DB_NAME)) if use_cache else None
+        # MD5 keys of legacy JSON cache files, listed on first use
+        self._legacy_keys: Optional[Set[str]] = None
+        # Set of cache keys -> {cache key: embedding}, most recently used last
+        self._batch_cache: OrderedDict = OrderedDict()
+        self._batch_cache_lock = threading.Lock()
         
         # Initialize embedding models
         self.gemini_model = None
@@ -64,7 +111,8 @@ class EmbeddingGenerator:
             try:
                 self.gemini_model = GoogleGenerativeAIEmbeddings(
                     model="models/text-embedding-004",
-                    google_api_key=self.api_key
+                    google_api_key=self.api_key,
+                    output_dimensionality=output_dimensionality
                 )
                 logger.info("Initialized Google text-embedding-004 model")
             except Exception as e:
@@ -72,8 +120,12 @@ class EmbeddingGenerator:
         
         # Initialize fallback model (sentence-transformers)
         try:
-            self.local_model = SentenceTransformer('all-MiniLM-L6-v2')
-            logger.info("Initialized sentence-transformers embedding model")
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+            self.local_model = SentenceTransformer('all-MiniLM-L6-v2', device=device)
+            if device == "cuda":
+                # Half precision uses tensor cores and halves memory traffic
+                self.local_model.half()
+            logger.info(f"Initialized sentence-transformers embedding model on {device}")
         except Exception as e:
             logger.error(f"Failed to initialize sentence-transformers model: {e}")
             if not self.gemini_model:
@@ -81,47 +133,201 @@ class EmbeddingGenerator:
     
     def _get_cache_key(self, text: str) -> str:
         """Generate cache key for text."""
-        return hashlib.md5(text.encode('utf-8')).hexdigest()
+        return EmbeddingCache.key_for(text)
     
-    def _load_from_cache(self, cache_key: str) -> Optional[List[float]]:
-        """Load embedding from cache if available."""
+    def _load_many_from_cache(
+        self,
+        texts: List[str],
+        keys: Optional[List[str]] = None
+    ) -> List[Optional[List[float]]]:
+        """
+        Load embeddings for texts from the cache in one batched lookup.
+        
+        Args:
+            texts: Texts to look up
+            keys: Cache keys of texts, if already computed
+        
+        Returns:
+            Embedding per text (None where not cached)
+        """
         if not self.use_cache:
-            return None
+            return [None] * len(texts)
+        
+        if keys is None:
+            keys = [self._get_cache_key(text) for text in texts]
+        found = self._get_many_cached(keys)
+        
+        # Entries written before the switch to XXH3 keys are keyed by SHA-256
+        legacy_keys = {}
+        legacy_found = {}
+        if XXHASH_AVAILABLE:
+            legacy_keys = {
+                idx: EmbeddingCache.legacy_key_for(text)
+                for idx, (key, text) in enumerate(zip(keys, texts))
+                if key not in found
+            }
+            if legacy_keys:
+                legacy_found = self._get_many_cached(list(legacy_keys.values()))
+        
+        embeddings = []
+        migrated = []
+        for idx, (key, text) in enumerate(zip(keys, texts)):
+            embedding = found.get(key)
+            if embedding is not None:
+                embeddings.append(self._match_dimensionality(embedding.tolist()))
+                continue
+            
+            # Fall back to older caches (SHA-256 rows, then the
+            # one-JSON-file-per-text cache) and migrate hits
+            embedding = legacy_found.get(legacy_keys.get(idx))
+            if embedding is not None:
+                embedding = embedding.tolist()
+            else:
+                embedding = self._load_from_legacy_cache(text)
+            if embedding is not None:
+                migrated.append((key, embedding))
+                embedding = self._match_dimensionality(embedding)
+            embeddings.append(embedding)
         
-        cache_file = self.cache_dir / f"{cache_key}.json"
-        if cache_file.exists():
+        self._save_many_to_cache(migrated)
+        return embeddings
+    
+    def _get_many_cached(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Batched cache lookup that treats read errors as misses."""
+        try:
+            return self.cache.get_many(keys)
+        except Exception as e:
+            logger.warning(f"Error loading cached embeddings: {e}")
+            return {}
+    
+    def _match_dimensionality(self, embedding: List[float]) -> List[float]:
+        """Truncate cached full-size Gemini vectors to output_dimensionality."""
+        if (
+            self.gemini_model
+            and self.output_dimensionality
+            and len(embedding) > self.output_dimensionality
+        ):
+            return truncate_embeddings(embedding, self.output_dimensionality).tolist()
+        return embedding
+    
+    def _load_from_legacy_cache(self, text: str) -> Optional[List[float]]:
+        """Load embedding from the legacy MD5-keyed JSON cache files."""
+        # One directory listing replaces a stat() per cache miss
+        if self._legacy_keys is None:
+            self._legacy_keys = {
+                entry.name[:-len(".json")]
+                for entry in os.scandir(self.cache_dir)
+                if entry.name.endswith(".json")
+            }
+        
+        legacy_key = hashlib.md5(text.encode('utf-8')).hexdigest()
+        if legacy_key in self._legacy_keys:
+            cache_file = self.cache_dir / f"{legacy_key}.json"
             try:
-                with open(cache_file, 'r') as f:
-                    data = json.load(f)
-                    return data.get('embedding')
+                return read_json(cache_file).get('embedding')
             except Exception as e:
-                logger.warning(f"Error loading cache {cache_key}: {e}")
+                logger.warning(f"Error loading cache {legacy_key}: {e}")
         return None
     
-    def _save_to_cache(self, cache_key: str, embedding: List[float]):
-        """Save embedding to cache."""
-        if not self.use_cache:
+    def _save_many_to_cache(self, items: List[Tuple[str, List[float]]]):
+        """Save (cache key, embedding) pairs to the cache in one transaction."""
+        if not self.use_cache or not items:
             return
         
-        cache_file = self.cache_dir / f"{cache_key}.json"
         try:
-            with open(cache_file, 'w') as f:
-                json.dump({'embedding': embedding}, f)
+            self.cache.put_many(items)
         except Exception as e:
-            logger.warning(f"Error saving cache {cache_key}: {e}")
+            logger.warning(f"Error saving cached embeddings: {e}")
+    
+    def _embed_with_gemini(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts with one Gemini embed_content request per BATCH_SIZE texts."""
+        self._throttle(len(texts))
+        return self.gemini_model.embed_documents(
+            texts,
+            batch_size=BATCH_SIZE,
+            task_type=DOCUMENT_TASK_TYPE
+        )
+    
+    def _throttle(self, count: int):
+        """Wait until the rate limiter allows a request for count texts."""
+        if self.rate_limiter:
+            self.rate_limiter.acquire(count)
+    
+    def _encode_locally(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts with the local sentence-transformers model as float32 lists."""
+        embeddings = self.local_model.encode(
+            texts,
+            show_progress_bar=False,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        )
+        # Half-precision models return float16; cache and store float32
+        return np.asarray(embeddings, dtype=np.float32).tolist()
+    
+    def _embed_individually(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Embed texts one request at a time after a batch request failed.
+        
+        Isolates the failing text so the rest of the batch is still embedded.
+        
+        Args:
+            texts: List of texts to embed
+        
+        Returns:
+            List of embedding vectors, None where a text could not be embedded
+        """
+        embeddings = []
+        for text in texts:
+            try:
+                embeddings.append(self._embed_with_gemini([text])[0])
+            except Exception as e:
+                logger.warning(f"Skipping text that failed to embed: {e}")
+                embeddings.append(None)
+        return embeddings
+    
+    def _retry_delay(self, error: Exception, attempt: int) -> float:
+        """
+        Seconds to wait before retrying a failed embedding request.
+        
+        Honors a Retry-After header on rate-limit (429) responses, otherwise
+        uses exponential backoff.
+        
+        Args:
+            error: Exception raised by the embedding request
+            attempt: Zero-based attempt number that failed
+        
+        Returns:
+            Delay in seconds
+        """
+        cause = error.__cause__ or error
+        response = getattr(cause, 'response', None)
+        headers = getattr(response, 'headers', None) or {}
+        retry_after = headers.get('Retry-After') if hasattr(headers, 'get') else None
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return RETRY_DELAY * (2 ** attempt)  # Exponential backoff
+    
+    def _embed_batch(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Embed one batch after a small random delay to spread out requests."""
+        if self.gemini_model:
+            time.sleep(random.uniform(0, BATCH_START_JITTER))
+        return self._generate_with_retry(texts)
     
     def _generate_with_retry(
         self,
         texts: List[str]
-    ) -> List[List[float]]:
+    ) -> List[Optional[List[float]]]:
         """
         Generate embeddings with retry logic.
         
         Args:
             texts: List of texts to embed
-            
+        
         Returns:
-            List of embedding vectors
+            List of embedding vectors (None for texts that failed individually)
         """
         # Use Gemini if available, otherwise use local model
         model = self.gemini_model if self.gemini_model else self.local_model
@@ -133,16 +339,15 @@ class EmbeddingGenerator:
             try:
                 if self.gemini_model:
                     # Use Gemini embeddings
-                    embeddings = self.gemini_model.embed_documents(texts)
+                    embeddings = self._embed_with_gemini(texts)
                 else:
                     # Use sentence-transformers
-                    embeddings = self.local_model.encode(texts, show_progress_bar=False)
-                    embeddings = embeddings.tolist()
+                    embeddings = self._encode_locally(texts)
                 return embeddings
-                
+            
             except Exception as e:
                 if attempt < MAX_RETRIES - 1:
-                    wait_time = RETRY_DELAY * (2 ** attempt)  # Exponential backoff
+                    wait_time = self._retry_delay(e, attempt)
                     logger.warning(
                         f"Embedding attempt {attempt + 1} failed: {e}. "
                         f"Retrying in {wait_time}s..."
@@ -150,87 +355,210 @@ class EmbeddingGenerator:
                     time.sleep(wait_time)
                 else:
                     logger.error(f"All embedding attempts failed: {e}")
+                    # A single bad text shouldn't fail the whole batch
+                    if self.gemini_model and len(texts) > 1:
+                        logger.info("Retrying batch one text at a time")
+                        embeddings = self._embed_individually(texts)
+                        if any(embedding is not None for embedding in embeddings):
+                            return embeddings
                     # Fallback to local model if Gemini failed
                     if self.gemini_model and self.local_model:
                         logger.info("Falling back to sentence-transformers")
-                        embeddings = self.local_model.encode(texts, show_progress_bar=False)
-                        return embeddings.tolist()
+                        return self._encode_locally(texts)
                     raise
     
-    def generate_embeddings(
+    def embed_single(self, text: str) -> Optional[List[float]]:
+        """
+        Embed one text, such as a search query, with a single request.
+        
+        Skips the batching and thread pool used by generate_embeddings();
+        on failure the text is retried through that path, which adds
+        backoff and the local-model fallback.
+        
+        Args:
+            text: Text to embed
+        
+        Returns:
+            Embedding vector, or None if the text could not be embedded
+        """
+        key = self._get_cache_key(text)
+        cached = self._load_many_from_cache([text], [key])[0]
+        if cached:
+            return cached
+        
+        try:
+            if self.gemini_model:
+                # Same task type as documents, so scores and cache keys match
+                self._throttle(1)
+                embedding = self.gemini_model.embed_query(text, task_type=DOCUMENT_TASK_TYPE)
+            elif self.local_model:
+                embedding = self._encode_locally([text])[0]
+            else:
+                raise ValueError("No embedding model available")
+        except Exception as e:
+            logger.warning(f"Single embedding request failed, retrying as a batch: {e}")
+            chunks = self.generate_embeddings([{'text': text}], show_progress=False)
+            return chunks[0].get('embedding')
+        
+        self._save_many_to_cache([(key, embedding)])
+        return embedding
+    
+    def generate_embeddings_iter(
         self,
         chunks: List[Dict],
         batch_size: int = BATCH_SIZE,
         show_progress: bool = True
-    ) -> List[Dict]:
+    ) -> Iterator[Tuple[int, List[float]]]:
         """
-        Generate embeddings for chunks with caching and batching.
+        Embed chunks, yielding each embedding as soon as it is available.
+        
+        Cached embeddings are yielded first, then each batch as it
+        completes, so callers can index results while later batches are
+        still being embedded instead of holding every vector at once.
+        Chunks are not modified, and chunks that could not be embedded are
+        not yielded.
         
         Args:
             chunks: List of chunk dictionaries with 'text' key
             batch_size: Number of texts to process in each batch
             show_progress: Whether to log progress
-            
-        Returns:
-            List of chunks with 'embedding' key added
+        
+        Yields:
+            (chunk index, embedding) pairs in completion order
         """
-        all_embeddings = []
-        total_chunks = len(chunks)
+        # Work on distinct texts only; repeated chunks (boilerplate, repeated
+        # headings) share the first occurrence's embedding
+        positions: Dict[str, List[int]] = {}
+        for idx, chunk in enumerate(chunks):
+            positions.setdefault(chunk['text'], []).append(idx)
+        unique_texts = list(positions)
         
-        # Process in batches
-        for i in range(0, total_chunks, batch_size):
-            batch = chunks[i:i + batch_size]
-            batch_texts = [chunk['text'] for chunk in batch]
-            
-            if show_progress:
-                logger.info(f"Processing batch {i // batch_size + 1}/{(total_chunks - 1) // batch_size + 1}")
-            
-            # Check cache and generate embeddings
-            batch_embeddings = []
-            texts_to_embed = []
-            indices_to_embed = []
+        # Hash each text once for both the cache lookup and the save
+        keys = [self._get_cache_key(text) for text in unique_texts]
+        
+        # A repeat of a small, fully embedded call is answered in one lookup
+        batch_key = (
+            frozenset(keys)
+            if self.use_cache and len(keys) <= BATCH_CACHE_MAX_TEXTS
+            else None
+        )
+        cached_batch = self._recall_batch(batch_key)
+        if cached_batch is not None:
+            for text, key in zip(unique_texts, keys):
+                for chunk_idx in positions[text]:
+                    yield chunk_idx, cached_batch[key]
+            return
+        results: Dict[str, List[float]] = {}
+        
+        # Serve cached embeddings first
+        texts_to_embed = []
+        indices_to_embed = []
+        cached_embeddings = self._load_many_from_cache(unique_texts, keys)
+        for idx, (text, cached_embedding) in enumerate(zip(unique_texts, cached_embeddings)):
+            if cached_embedding:
+                results[keys[idx]] = cached_embedding
+                for chunk_idx in positions[text]:
+                    yield chunk_idx, cached_embedding
+            else:
+                texts_to_embed.append(text)
+                indices_to_embed.append(idx)
+        
+        # Embed the remaining texts in batches, several requests in flight
+        if not self.gemini_model:
+            batch_size = max(batch_size, LOCAL_BATCH_SIZE)
+        batches = [
+            (texts_to_embed[i:i + batch_size], indices_to_embed[i:i + batch_size])
+            for i in range(0, len(texts_to_embed), batch_size)
+        ]
+        if not batches:
+            self._remember_batch(batch_key, results)
+            return
+        # The local model is CPU-bound, so only overlap remote requests
+        max_workers = self.max_concurrent_batches if self.gemini_model else 1
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self._embed_batch, texts): (texts, indices)
+                for texts, indices in batches
+            }
             
-            for idx, text in enumerate(batch_texts):
-                cache_key = self._get_cache_key(text)
-                cached_embedding = self._load_from_cache(cache_key)
+            for completed, future in enumerate(as_completed(futures), 1):
+                texts, indices = futures[future]
+                if show_progress:
+                    logger.info(f"Processed batch {completed}/{len(batches)}")
                 
-                if cached_embedding:
-                    batch_embeddings.append((idx, cached_embedding))
-                else:
-                    texts_to_embed.append(text)
-                    indices_to_embed.append(idx)
-            
-            # Generate embeddings for uncached texts
-            if texts_to_embed:
                 try:
-                    new_embeddings = self._generate_with_retry(texts_to_embed)
-                    
-                    # Cache and store new embeddings
-                    for embed_idx, embedding in enumerate(new_embeddings):
-                        original_idx = indices_to_embed[embed_idx]
-                        text = texts_to_embed[embed_idx]
-                        cache_key = self._get_cache_key(text)
-                        self._save_to_cache(cache_key, embedding)
-                        batch_embeddings.append((original_idx, embedding))
-                    
+                    new_embeddings = future.result()
                 except Exception as e:
                     logger.error(f"Error generating embeddings: {e}")
-                    # Fill with None for failed embeddings
-                    for idx in indices_to_embed:
-                        batch_embeddings.append((idx, None))
-            
-            # Sort by original index and add to all_embeddings
-            batch_embeddings.sort(key=lambda x: x[0])
-            all_embeddings.extend([emb for _, emb in batch_embeddings])
+                    continue
+                
+                # Cache new embeddings (SQLite stays on this thread)
+                self._save_many_to_cache([
+                    (keys[unique_idx], embedding)
+                    for unique_idx, embedding in zip(indices, new_embeddings)
+                    if embedding is not None
+                ])
+                for text, unique_idx, embedding in zip(texts, indices, new_embeddings):
+                    if embedding is not None:
+                        results[keys[unique_idx]] = embedding
+                        for chunk_idx in positions[text]:
+                            yield chunk_idx, embedding
+        
+        # Only complete result sets are remembered
+        if len(results) == len(keys):
+            self._remember_batch(batch_key, results)
+    
+    def _recall_batch(self, batch_key: Optional[frozenset]) -> Optional[Dict[str, List[float]]]:
+        """Return a remembered result set for this set of cache keys, if any."""
+        if batch_key is None:
+            return None
+        with self._batch_cache_lock:
+            cached = self._batch_cache.get(batch_key)
+            if cached is not None:
+                self._batch_cache.move_to_end(batch_key)
+            return cached
+    
+    def _remember_batch(self, batch_key: Optional[frozenset], results: Dict[str, List[float]]):
+        """Remember a complete result set, evicting the least recently used."""
+        if batch_key is None:
+            return
+        with self._batch_cache_lock:
+            self._batch_cache[batch_key] = results
+            self._batch_cache.move_to_end(batch_key)
+            if len(self._batch_cache) > BATCH_CACHE_SIZE:
+                self._batch_cache.popitem(last=False)
+    
+    def generate_embeddings(
+        self,
+        chunks: List[Dict],
+        batch_size: int = BATCH_SIZE,
+        show_progress: bool = True
+    ) -> List[Dict]:
+        """
+        Generate embeddings for chunks with caching and batching.
+        
+        Args:
+            chunks: List of chunk dictionaries with 'text' key
+            batch_size: Number of texts to process in each batch
+            show_progress: Whether to log progress
+        
+        Returns:
+            List of chunks with 'embedding' key added
+        """
+        total_chunks = len(chunks)
+        embedded = [False] * total_chunks
         
         # Add embeddings to chunks
-        for chunk, embedding in zip(chunks, all_embeddings):
-            if embedding:
-                chunk['embedding'] = embedding
-            else:
+        for idx, embedding in self.generate_embeddings_iter(chunks, batch_size, show_progress):
+            chunks[idx]['embedding'] = embedding
+            embedded[idx] = True
+        
+        for was_embedded in embedded:
+            if not was_embedded:
                 logger.warning(f"Failed to generate embedding for chunk")
         
-        logger.info(f"Generated embeddings for {len([e for e in all_embeddings if e])}/{total_chunks} chunks")
+        logger.info(f"Generated embeddings for {sum(embedded)}/{total_chunks} chunks")
         return chunks
 
 
@@ -246,7 +574,7 @@ def generate_embeddings_for_chunks(
         chunks: List of chunk dictionaries
         api_key: Google API key for Gemini
         batch_size: Batch size for processing
-        
+    
     Returns:
         Chunks with embeddings added
     """
@@ -5,6 +5,9 @@ This module contains all prompt templates used for generating
 context-aware responses using the Gemini LLM.
 """
 
+from string import Formatter
+from typing import Dict, Iterable, Optional, Tuple
+
 SYSTEM_PROMPT = """You are a helpful Technical Documentation Assistant specializing in Python programming. 
 Your role is to answer questions accurately based on the provided documentation context.
 
@@ -92,6 +95,38 @@ FOLLOWUP_PROMPT_TEMPLATE = """You are continuing a conversation about Python pro
 ## Response:"""
 
 
+def _compile_template(template: str) -> Tuple[Tuple[str, Optional[str]], ...]:
+    """
+    Split a str.format template into (literal text, field name) pairs once.
+    
+    Rendering a compiled template only concatenates strings, instead of
+    re-parsing the template on every call.
+    
+    Args:
+        template: Template using plain ``{field}`` placeholders
+        
+    Returns:
+        Tuple of (literal, field) pairs; field is None for trailing text
+    """
+    return tuple(
+        (literal, field)
+        for literal, field, _, _ in Formatter().parse(template)
+    )
+
+
+def _render(compiled: Tuple[Tuple[str, Optional[str]], ...], **values: str) -> str:
+    """Fill a template compiled with _compile_template."""
+    return "".join([
+        literal + str(values[field]) if field is not None else literal
+        for literal, field in compiled
+    ])
+
+
+# Templates are parsed once at import time
+_QA_PROMPT_PARTS = _compile_template(QA_PROMPT_TEMPLATE)
+_FOLLOWUP_PROMPT_PARTS = _compile_template(FOLLOWUP_PROMPT_TEMPLATE)
+
+
 def format_qa_prompt(context: str, question: str) -> str:
     """
     Format QA prompt with context and question.
@@ -103,7 +138,8 @@ def format_qa_prompt(context: str, question: str) -> str:
     Returns:
         Formatted prompt string
     """
-    return QA_PROMPT_TEMPLATE.format(
+    return _render(
+        _QA_PROMPT_PARTS,
         context=context,
         question=question
     )
@@ -125,19 +161,20 @@ def format_followup_prompt(
     Returns:
         Formatted prompt string
     """
-    return FOLLOWUP_PROMPT_TEMPLATE.format(
+    return _render(
+        _FOLLOWUP_PROMPT_PARTS,
         context=context,
         question=question,
         conversation_history=conversation_history
     )
 
 
-def format_conversation_history(messages: list) -> str:
+def format_conversation_history(messages: Iterable[Dict]) -> str:
     """
     Format conversation messages into history string.
     
     Args:
-        messages: List of message dictionaries with 'role' and 'content'
+        messages: Message dictionaries with 'role' and 'content' (list or deque)
         
     Returns:
         Formatted conversation history string
@@ -146,7 +183,7 @@ def format_conversation_history(messages: list) -> str:
         return "No previous conversation."
     
     history_parts = []
-    for msg in messages[-5:]:  # Last 5 exchanges
+    for msg in list(messages)[-5:]:  # Last 5 exchanges
         role = msg.get('role', 'unknown')
         content = msg.get('content', '')
         history_parts.append(f"{role.capitalize()}: {content}")
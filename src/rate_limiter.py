@@ -0,0 +1,64 @@
+"""
+Token-bucket rate limiting for API clients.
+
+This module provides a thread-safe token bucket that callers draw from
+before each request, so bulk jobs stay under a published per-minute quota
+instead of discovering it through 429 responses and backoff sleeps.
+"""
+
+import logging
+import threading
+import time
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at a constant rate."""
+    
+    def __init__(self, rate: float, capacity: float):
+        """
+        Create a full bucket.
+        
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum tokens held (the largest burst)
+        """
+        if rate <= 0 or capacity <= 0:
+            raise ValueError("rate and capacity must be positive")
+        
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self, tokens: float = 1.0) -> float:
+        """
+        Take tokens from the bucket, blocking until the request may proceed.
+        
+        Tokens are reserved before sleeping, so concurrent callers queue up
+        behind each other instead of all waking at once. A request larger
+        than the capacity waits for a full bucket and leaves it in debt,
+        which later callers pay off, keeping the long-run rate exact.
+        
+        Args:
+            tokens: Tokens needed (e.g. texts in an embedding request)
+        
+        Returns:
+            Seconds spent waiting
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            
+            wait = max(0.0, (min(tokens, self.capacity) - self._tokens) / self.rate)
+            self._tokens -= tokens
+        
+        if wait > 0:
+            logger.debug(f"Rate limit reached, waiting {wait:.2f}s")
+            time.sleep(wait)
+        return wait
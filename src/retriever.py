@@ -6,10 +6,12 @@ relevance filtering, and MMR (Maximum Marginal Relevance) retrieval.
 """
 
 import logging
-import re
 from typing import Dict, List, Optional
 
+import numpy as np
+
 from src.embeddings import EmbeddingGenerator
+from src.vector_math import normalize_rows
 from src.vector_store import VectorStore
 
 # Configure logging
@@ -19,6 +21,8 @@ logger = logging.getLogger(__name__)
 # Retrieval parameters
 DEFAULT_TOP_K = 5
 RELEVANCE_THRESHOLD = 0.5  # Lowered from 0.7 for better retrieval
+SEARCH_MODES = ("hnsw", "binary", "truncated")
+DEFAULT_SEARCH_MODE = "hnsw"
 
 
 class Retriever:
@@ -29,7 +33,8 @@ class Retriever:
         vector_store: VectorStore,
         embedding_generator: Optional[EmbeddingGenerator] = None,
         top_k: int = DEFAULT_TOP_K,
-        relevance_threshold: float = RELEVANCE_THRESHOLD
+        relevance_threshold: float = RELEVANCE_THRESHOLD,
+        search_mode: str = DEFAULT_SEARCH_MODE
     ):
         """
         Initialize retriever.
@@ -39,10 +44,16 @@ class Retriever:
             embedding_generator: EmbeddingGenerator instance
             top_k: Number of documents to retrieve
             relevance_threshold: Minimum similarity score threshold
+            search_mode: "hnsw" queries ChromaDB's HNSW index; "binary" or
+                "truncated" run a two-stage search over an in-memory snapshot
+                (compact first pass + full-vector rerank)
         """
         self.vector_store = vector_store
         self.top_k = top_k
         self.relevance_threshold = relevance_threshold
+        if search_mode not in SEARCH_MODES:
+            raise ValueError(f"search_mode must be one of {SEARCH_MODES}, got {search_mode!r}")
+        self.search_mode = search_mode
         
         # Initialize embedding generator if not provided
         if embedding_generator:
@@ -63,23 +74,42 @@ class Retriever:
         Returns:
             Preprocessed query string
         """
-        # Convert to lowercase
-        query = query.lower()
+        # Lowercase, collapse whitespace runs and strip the ends in one
+        # C-level split/join pass (no regex on the query hot path)
+        return ' '.join(query.lower().split())
+    
+    def embed_queries(self, queries: List[str]) -> List[Optional[List[float]]]:
+        """
+        Embed several queries in a single batched embedding call.
         
-        # Remove extra whitespace
-        query = re.sub(r'\s+', ' ', query)
+        Args:
+            queries: Raw query strings
+            
+        Returns:
+            Query embeddings in input order (None for empty or failed queries)
+        """
+        processed = [self.preprocess_query(q) for q in queries]
+        query_chunks = [{'text': text} for text in processed if text]
         
-        # Strip leading/trailing whitespace
-        query = query.strip()
+        try:
+            query_chunks = self.embedding_generator.generate_embeddings(
+                query_chunks,
+                show_progress=False
+            )
+        except Exception as e:
+            logger.error(f"Error generating query embeddings: {e}")
+            return [None] * len(queries)
         
-        return query
+        embedded = iter(query_chunks)
+        return [next(embedded).get('embedding') if text else None for text in processed]
     
     def retrieve(
         self,
         query: str,
         top_k: Optional[int] = None,
         use_mmr: bool = False,
-        mmr_diversity: float = 0.5
+        mmr_diversity: float = 0.5,
+        query_embedding: Optional[List[float]] = None
     ) -> List[Dict]:
         """
         Retrieve relevant documents for a query.
@@ -89,6 +119,8 @@ class Retriever:
             top_k: Number of documents to retrieve (overrides default)
             use_mmr: Whether to use Maximum Marginal Relevance
             mmr_diversity: Diversity parameter for MMR (0.0 to 1.0)
+            query_embedding: Precomputed query embedding (e.g. from
+                embed_queries); skips embedding the query again
             
         Returns:
             List of retrieved documents with metadata and scores
@@ -101,21 +133,16 @@ class Retriever:
             return []
         
         # Generate query embedding
-        try:
-            query_chunks = [{'text': processed_query}]
-            query_chunks = self.embedding_generator.generate_embeddings(
-                query_chunks,
-                show_progress=False
-            )
+        if query_embedding is None:
+            try:
+                query_embedding = self.embedding_generator.embed_single(processed_query)
+            except Exception as e:
+                logger.error(f"Error generating query embedding: {e}")
+                return []
             
-            if not query_chunks or 'embedding' not in query_chunks[0]:
+            if not query_embedding:
                 logger.error("Failed to generate query embedding")
                 return []
-            
-            query_embedding = query_chunks[0]['embedding']
-        except Exception as e:
-            logger.error(f"Error generating query embedding: {e}")
-            return []
         
         # Determine number of results
         n_results = top_k if top_k is not None else self.top_k
@@ -130,7 +157,7 @@ class Retriever:
                     mmr_diversity
                 )
             else:
-                results = self.vector_store.search(
+                results = self._search(
                     query_embedding,
                     n_results=n_results * 2  # Get more for filtering
                 )
@@ -152,6 +179,36 @@ class Retriever:
         logger.info(f"Retrieved {len(filtered_results)} documents for query")
         return filtered_results
     
+    def _search(
+        self,
+        query_embedding: List[float],
+        n_results: int,
+        include_embeddings: bool = False
+    ) -> Dict:
+        """
+        Run a similarity search against the configured search backend.
+        
+        Args:
+            query_embedding: Query embedding vector
+            n_results: Number of results to return
+            include_embeddings: Also return the stored embedding of each hit
+            
+        Returns:
+            Search results in ChromaDB query format
+        """
+        if self.search_mode != "hnsw":
+            return self.vector_store.search_snapshot(
+                query_embedding,
+                n_results=n_results,
+                first_pass=self.search_mode,
+                include_embeddings=include_embeddings
+            )
+        return self.vector_store.search(
+            query_embedding,
+            n_results=n_results,
+            include_embeddings=include_embeddings
+        )
+    
     def _format_results(self, results: Dict, limit: int) -> List[Dict]:
         """
         Format ChromaDB results into standardized format.
@@ -163,30 +220,26 @@ class Retriever:
         Returns:
             List of formatted document dictionaries
         """
-        formatted = []
-        
         if not results or 'ids' not in results:
-            return formatted
-        
-        ids = results.get('ids', [[]])[0]
-        documents = results.get('documents', [[]])[0]
-        metadatas = results.get('metadatas', [[]])[0]
-        distances = results.get('distances', [[]])[0]
+            return []
         
-        for i in range(min(len(ids), limit)):
-            # Convert distance to similarity score (1 - distance for cosine)
-            distance = distances[i] if i < len(distances) else 1.0
-            similarity_score = 1.0 - distance
-            
-            formatted.append({
-                'id': ids[i],
-                'text': documents[i] if i < len(documents) else '',
-                'metadata': metadatas[i] if i < len(metadatas) else {},
-                'score': similarity_score,
+        # ChromaDB returns parallel, equal-length lists for one query
+        ids = results['ids'][0][:limit]
+        documents = results['documents'][0]
+        metadatas = results['metadatas'][0]
+        distances = results['distances'][0]
+        
+        # Similarity score is 1 - distance for cosine
+        return [
+            {
+                'id': doc_id,
+                'text': text,
+                'metadata': metadata,
+                'score': 1.0 - distance,
                 'distance': distance
-            })
-        
-        return formatted
+            }
+            for doc_id, text, metadata, distance in zip(ids, documents, metadatas, distances)
+        ]
     
     def _retrieve_with_mmr(
         self,
@@ -208,9 +261,10 @@ class Retriever:
             List of diverse, relevant documents
         """
         # Get initial larger set
-        initial_results = self.vector_store.search(
+        initial_results = self._search(
             query_embedding,
-            n_results=n_results * 3
+            n_results=n_results * 3,
+            include_embeddings=True
         )
         
         candidates = self._format_results(initial_results, n_results * 3)
@@ -218,75 +272,83 @@ class Retriever:
         if not candidates:
             return []
         
-        # MMR selection
-        selected = []
-        remaining = candidates.copy()
+        # Reuse the vectors stored with each hit, re-embedding the candidates
+        # in one batched call only if the backend did not return them;
+        # unit-length rows make each similarity a single dot product
+        vectors = self._stored_embeddings(initial_results, len(candidates))
+        if vectors is None:
+            vectors = self._get_embeddings_for_texts([c['text'] for c in candidates])
+        relevance = np.array([c['score'] for c in candidates], dtype=np.float32)
         
         # Select first document (most relevant)
-        if remaining:
-            selected.append(remaining.pop(0))
+        selected = [0]
+        available = np.ones(len(candidates), dtype=bool)
+        available[0] = False
+        max_similarity = np.zeros(len(candidates), dtype=np.float32)
         
         # Select remaining documents using MMR
-        while len(selected) < n_results and remaining:
-            best_score = -float('inf')
-            best_idx = 0
+        while len(selected) < n_results and available.any():
+            # Max similarity to already selected, updated with the newest pick
+            max_similarity = np.maximum(max_similarity, vectors @ vectors[selected[-1]])
             
-            for idx, candidate in enumerate(remaining):
-                # Relevance to query
-                relevance = candidate['score']
-                
-                # Max similarity to already selected
-                max_similarity = 0.0
-                if selected:
-                    # Calculate similarity to selected documents
-                    candidate_embedding = self._get_embedding_for_text(candidate['text'])
-                    if candidate_embedding:
-                        for selected_doc in selected:
-                            selected_embedding = self._get_embedding_for_text(selected_doc['text'])
-                            if selected_embedding:
-                                # Cosine similarity
-                                similarity = self._cosine_similarity(
-                                    candidate_embedding,
-                                    selected_embedding
-                                )
-                                max_similarity = max(max_similarity, similarity)
-                
-                # MMR score
-                mmr_score = (diversity * relevance) - ((1 - diversity) * max_similarity)
-                
-                if mmr_score > best_score:
-                    best_score = mmr_score
-                    best_idx = idx
+            # MMR score
+            mmr_scores = (diversity * relevance) - ((1 - diversity) * max_similarity)
+            mmr_scores[~available] = -np.inf
+            
+            best_idx = int(np.argmax(mmr_scores))
+            selected.append(best_idx)
+            available[best_idx] = False
+        
+        return [candidates[idx] for idx in selected]
+    
+    def _stored_embeddings(self, results: Dict, count: int) -> Optional[np.ndarray]:
+        """
+        Extract the embeddings returned alongside search results.
+        
+        Args:
+            results: Search results requested with include_embeddings
+            count: Number of leading results to keep
             
-            selected.append(remaining.pop(best_idx))
+        Returns:
+            float32 array of unit-length rows, or None if the results
+            carry no (or incomplete) embeddings
+        """
+        batches = results.get('embeddings')
+        if batches is None or len(batches) == 0 or batches[0] is None:
+            return None
         
-        return selected
+        vectors = np.asarray(batches[0], dtype=np.float32)[:count]
+        if vectors.ndim != 2 or len(vectors) != count:
+            return None
+        return normalize_rows(vectors)
     
-    def _get_embedding_for_text(self, text: str) -> Optional[List[float]]:
-        """Get embedding for text (cached if possible)."""
+    def _get_embeddings_for_texts(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts in one batched call (cached if possible).
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            float32 array of unit-length rows; rows for texts that could
+            not be embedded are zero, so they look dissimilar to everything
+        """
         try:
-            chunks = [{'text': text}]
             chunks = self.embedding_generator.generate_embeddings(
-                chunks,
+                [{'text': text} for text in texts],
                 show_progress=False
             )
-            return chunks[0].get('embedding') if chunks else None
-        except Exception:
-            return None
-    
-    def _cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
-        """Calculate cosine similarity between two vectors."""
-        if len(vec1) != len(vec2):
-            return 0.0
-        
-        dot_product = sum(a * b for a, b in zip(vec1, vec2))
-        magnitude1 = sum(a * a for a in vec1) ** 0.5
-        magnitude2 = sum(b * b for b in vec2) ** 0.5
-        
-        if magnitude1 == 0 or magnitude2 == 0:
-            return 0.0
-        
-        return dot_product / (magnitude1 * magnitude2)
+            embeddings = [chunk.get('embedding') for chunk in chunks]
+        except Exception as e:
+            logger.warning(f"Error embedding MMR candidates: {e}")
+            embeddings = []
+        
+        dim = next((len(e) for e in embeddings if e), 0)
+        vectors = np.zeros((len(texts), dim), dtype=np.float32)
+        for i, embedding in enumerate(embeddings[:len(texts)]):
+            if embedding and len(embedding) == dim:
+                vectors[i] = embedding
+        return normalize_rows(vectors)
     
     def format_context_for_prompt(self, retrieved_docs: List[Dict]) -> str:
         """
@@ -307,6 +369,9 @@ class Retriever:
             text = doc.get('text', '')
             metadata = doc.get('metadata', {})
             source_url = metadata.get('source_url', 'Unknown')
+            if metadata.get('source_urls'):
+                # Deduplicated chunks list every page they appeared on
+                source_url = ", ".join(metadata['source_urls'].split())
             title = metadata.get('title', 'Untitled')
             score = doc.get('score', 0.0)
             
@@ -5,17 +5,37 @@ This module handles scraping, cleaning, and storing Python documentation
 from the official Python tutorial website.
 """
 
-import json
 import logging
 import os
+import re
+import threading
 import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional
-from urllib.parse import urljoin, urlparse
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import urldefrag, urljoin, urlparse
 
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.dammit import EncodingDetector
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src.serialization import iter_json_lines, read_json, write_json, write_json_lines
+
+try:
+    from lxml import etree
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
 
 # Configure logging
 logging.basicConfig(
@@ -29,13 +49,486 @@ TUTORIAL_BASE_URL = "https://docs.python.org/3/tutorial/"
 LIBRARY_BASE_URL = "https://docs.python.org/3/library/"
 REFERENCE_BASE_URL = "https://docs.python.org/3/reference/"
 
-# Rate limiting: 1 second between requests
+# Rate limiting: 1 second between request starts
 REQUEST_DELAY = 1.0
 
+# Pages fetched concurrently (also the HTTP connection pool size)
+MAX_WORKERS = 8
+
+# Worker processes for HTML parsing (0 parses in the fetching threads);
+# worth enabling only when pages arrive faster than one thread parses them
+PARSE_WORKERS = 0
+
+# Retries for rate-limited (429) responses
+MAX_FETCH_RETRIES = 3
+
+# Seconds a previously saved page is reused without any request
+PAGE_CACHE_TTL = 24 * 60 * 60
+
+# Combined output of all scraped pages (Parquet when pyarrow is installed,
+# JSON Lines otherwise; a JSON array from older runs is still read)
+COMBINED_JSON = "all_docs.json"
+COMBINED_JSONL = "all_docs.jsonl"
+COMBINED_PARQUET = "all_docs.parquet"
+
+# Documents decoded per Parquet record batch when streaming
+PARQUET_BATCH_SIZE = 64
+
+# BeautifulSoup parser for the fallback path (with lxml installed, pages
+# are parsed by lxml directly)
+HTML_PARSER = 'html.parser'
+
+# Whitespace around line breaks, including whole blank lines
+_LINE_BREAKS = re.compile(r'[^\S\n]*\n\s*')
+
+# Elements kept when parsing a page (everything else is never built)
+CONTENT_STRAINER = SoupStrainer(['title', 'div'])
+
+# Non-content elements dropped from the main text (tail text is kept)
+NON_CONTENT_TAGS: Tuple[str, ...] = ('nav', 'footer', 'header', 'script', 'style')
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+# Popular standard library modules - most commonly used
+LIBRARY_URLS: Tuple[str, ...] = (
+    # File and Directory Operations
+    "https://docs.python.org/3/library/os.html",
+    "https://docs.python.org/3/library/pathlib.html",
+    "https://docs.python.org/3/library/shutil.html",
+    "https://docs.python.org/3/library/glob.html",
+    
+    # System and Environment
+    "https://docs.python.org/3/library/sys.html",
+    "https://docs.python.org/3/library/platform.html",
+    
+    # Data Serialization
+    "https://docs.python.org/3/library/json.html",
+    "https://docs.python.org/3/library/pickle.html",
+    
+    # Date and Time
+    "https://docs.python.org/3/library/datetime.html",
+    "https://docs.python.org/3/library/time.html",
+    
+    # Data Structures
+    "https://docs.python.org/3/library/collections.html",
+    "https://docs.python.org/3/library/heapq.html",
+    "https://docs.python.org/3/library/bisect.html",
+    "https://docs.python.org/3/library/array.html",
+    
+    # String and Text Processing
+    "https://docs.python.org/3/library/string.html",
+    "https://docs.python.org/3/library/re.html",  # Regular expressions
+    "https://docs.python.org/3/library/textwrap.html",
+    
+    # Iteration and Functional Programming
+    "https://docs.python.org/3/library/itertools.html",
+    "https://docs.python.org/3/library/functools.html",
+    
+    # Math and Statistics
+    "https://docs.python.org/3/library/math.html",
+    "https://docs.python.org/3/library/statistics.html",
+    "https://docs.python.org/3/library/random.html",
+    
+    # File I/O
+    "https://docs.python.org/3/library/io.html",
+    "https://docs.python.org/3/library/csv.html",
+    
+    # URL and Web
+    "https://docs.python.org/3/library/urllib.html",
+    "https://docs.python.org/3/library/urllib.parse.html",
+    
+    # Utilities
+    "https://docs.python.org/3/library/argparse.html",
+    "https://docs.python.org/3/library/logging.html",
+    "https://docs.python.org/3/library/hashlib.html",
+    "https://docs.python.org/3/library/base64.html",
+    
+    # Advanced
+    "https://docs.python.org/3/library/typing.html",  # Type hints
+    "https://docs.python.org/3/library/contextlib.html",  # Context managers
+    "https://docs.python.org/3/library/abc.html",  # Abstract base classes
+)
+
+# Language reference sections
+REFERENCE_URLS: Tuple[str, ...] = (
+    # Data Model (includes decorators, descriptors, etc.)
+    "https://docs.python.org/3/reference/datamodel.html",
+    
+    # Execution Model
+    "https://docs.python.org/3/reference/executionmodel.html",
+    
+    # Expressions
+    "https://docs.python.org/3/reference/expressions.html",
+    
+    # Simple Statements
+    "https://docs.python.org/3/reference/simple_stmts.html",
+    
+    # Compound Statements (functions, classes, decorators)
+    "https://docs.python.org/3/reference/compound_stmts.html",
+    
+    # Top-level Components
+    "https://docs.python.org/3/reference/toplevel_components.html",
+    
+    # Glossary (definitions)
+    "https://docs.python.org/3/glossary.html",
+)
+
+# Advanced topics from different sections
+ADVANCED_URLS: Tuple[str, ...] = (
+    # Generators and Iterators (from tutorial)
+    "https://docs.python.org/3/tutorial/classes.html#generators",
+    "https://docs.python.org/3/tutorial/classes.html#generator-expressions",
+    "https://docs.python.org/3/tutorial/classes.html#iterators",
+    
+    # Async/Await
+    "https://docs.python.org/3/library/asyncio.html",
+)
+
+# Tutorial pages to scrape (relative to the tutorial base URL) - expanded
+# sections including advanced topics
+TUTORIAL_PAGES: Tuple[str, ...] = (
+    # Basic Tutorial
+    "index.html",
+    "introduction.html",
+    "interpreter.html",
+    "introduction.html#informal-introduction",
+    
+    # Data Structures
+    "datastructures.html",
+    "datastructures.html#more-on-lists",
+    "datastructures.html#using-lists-as-stacks",
+    "datastructures.html#using-lists-as-queues",
+    "datastructures.html#list-comprehensions",
+    "datastructures.html#nested-list-comprehensions",
+    "datastructures.html#the-del-statement",
+    "datastructures.html#tuples-and-sequences",
+    "datastructures.html#sets",
+    "datastructures.html#dictionaries",
+    "datastructures.html#looping-techniques",
+    "datastructures.html#more-on-conditions",
+    "datastructures.html#comparing-sequences-and-other-types",
+    
+    # Control Flow
+    "controlflow.html",
+    "controlflow.html#if-statements",
+    "controlflow.html#for-statements",
+    "controlflow.html#the-range-function",
+    "controlflow.html#break-and-continue-statements",
+    "controlflow.html#pass-statements",
+    "controlflow.html#match-statements",
+    "controlflow.html#defining-functions",
+    
+    # Functions (Advanced)
+    "functions.html",
+    "functions.html#more-on-defining-functions",
+    "functions.html#default-argument-values",
+    "functions.html#keyword-arguments",
+    "functions.html#special-parameters",
+    "functions.html#arbitrary-argument-lists",
+    "functions.html#unpacking-argument-lists",
+    "functions.html#lambda-expressions",
+    "functions.html#documentation-strings",
+    "functions.html#function-annotations",
+    
+    # Data Structures (Advanced)
+    "datastructures.html#list-comprehensions",
+    "datastructures.html#nested-list-comprehensions",
+    
+    # Modules
+    "modules.html",
+    "modules.html#more-on-modules",
+    "modules.html#standard-modules",
+    "modules.html#the-dir-function",
+    "modules.html#packages",
+    "modules.html#intra-package-references",
+    "modules.html#packages-in-multiple-directories",
+    
+    # Input/Output
+    "inputoutput.html",
+    "inputoutput.html#fancier-output-formatting",
+    "inputoutput.html#old-string-formatting",
+    "inputoutput.html#reading-and-writing-files",
+    "inputoutput.html#methods-of-file-objects",
+    "inputoutput.html#saving-structured-data-with-json",
+    
+    # Errors and Exceptions
+    "errors.html",
+    "errors.html#syntax-errors",
+    "errors.html#exceptions",
+    "errors.html#handling-exceptions",
+    "errors.html#raising-exceptions",
+    "errors.html#exception-chaining",
+    "errors.html#user-defined-exceptions",
+    "errors.html#defining-clean-up-actions",
+    
+    # Classes
+    "classes.html",
+    "classes.html#a-word-about-names-and-objects",
+    "classes.html#python-scopes-and-namespaces",
+    "classes.html#a-first-look-at-classes",
+    "classes.html#class-objects",
+    "classes.html#instance-objects",
+    "classes.html#method-objects",
+    "classes.html#class-and-instance-variables",
+    "classes.html#random-remarks",
+    "classes.html#inheritance",
+    "classes.html#multiple-inheritance",
+    "classes.html#private-variables",
+    "classes.html#odds-and-ends",
+    "classes.html#iterators",
+    "classes.html#generators",
+    "classes.html#generator-expressions",
+    
+    # Standard Library
+    "stdlib.html",
+    "stdlib.html#os-interface",
+    "stdlib.html#file-wildcards",
+    "stdlib.html#command-line-arguments",
+    "stdlib.html#error-output-redirection-and-program-termination",
+    "stdlib.html#string-pattern-matching",
+    "stdlib.html#mathematics",
+    "stdlib.html#internet-access",
+    "stdlib.html#dates-and-times",
+    "stdlib.html#data-compression",
+    "stdlib.html#performance-measurement",
+    "stdlib.html#quality-control",
+    "stdlib.html#batteries-included",
+    
+    "stdlib2.html",
+    "stdlib2.html#output-formatting",
+    "stdlib2.html#templating",
+    "stdlib2.html#working-with-binary-data-record-layouts",
+    "stdlib2.html#multi-threading",
+    "stdlib2.html#logging",
+    "stdlib2.html#weak-references",
+    "stdlib2.html#tools-for-working-with-lists",
+    "stdlib2.html#decimal-floating-point-arithmetic",
+    
+    # Advanced Topics (from Language Reference)
+    # Note: These are from docs.python.org/3/reference/ but we'll add tutorial equivalents
+)
+
+
+class RateLimiter:
+    """Thread-safe limiter spacing request starts at least `delay` seconds apart."""
+    
+    def __init__(self, delay: float):
+        """
+        Initialize rate limiter.
+        
+        Args:
+            delay: Minimum seconds between consecutive requests
+        """
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._next_slot = None
+    
+    def wait(self):
+        """Block until the caller may start its request."""
+        with self._lock:
+            now = time.monotonic()
+            if self._next_slot is None:
+                self._next_slot = now
+            slot = max(self._next_slot, now)
+            self._next_slot = slot + self.delay
+        
+        wait_time = slot - now
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+
+def _create_session(pool_size: int = MAX_WORKERS) -> requests.Session:
+    """
+    Create an HTTP session whose connection pool is shared by all workers.
+    
+    Transient server errors are retried by urllib3 with backoff; 429s are
+    left to _fetch() so the retry goes through the shared rate limiter.
+    """
+    session = requests.Session()
+    session.headers.update({'User-Agent': USER_AGENT})
+    retries = Retry(
+        total=MAX_FETCH_RETRIES,
+        backoff_factor=0.3,
+        status_forcelist=[500, 502, 503, 504],
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def _fetch(
+    session: requests.Session,
+    url: str,
+    rate_limiter: RateLimiter,
+    headers: Optional[Dict[str, str]] = None
+) -> requests.Response:
+    """
+    Fetch a URL, backing off and retrying on rate-limit responses.
+    
+    Args:
+        session: Shared HTTP session
+        url: URL to fetch
+        rate_limiter: Limiter shared by all workers
+        headers: Extra request headers (e.g. conditional-request validators)
+        
+    Returns:
+        Successful (or 304 Not Modified) HTTP response
+    """
+    extra = {'headers': headers} if headers else {}
+    for attempt in range(MAX_FETCH_RETRIES + 1):
+        rate_limiter.wait()
+        response = session.get(url, timeout=10, **extra)
+        if response.status_code != 429 or attempt == MAX_FETCH_RETRIES:
+            break
+        
+        retry_after = response.headers.get('Retry-After', '')
+        wait_time = float(retry_after) if retry_after.isdigit() else 2.0 ** attempt
+        logger.warning(f"Rate limited on {url}, retrying in {wait_time}s")
+        time.sleep(wait_time)
+    
+    response.raise_for_status()
+    return response
+
+
+def _load_cached_page(filepath: str, url: str) -> Optional[Dict]:
+    """Load a previously saved page for url, or None if absent or unreadable."""
+    try:
+        doc_data = read_json(Path(filepath))
+    except (OSError, ValueError):
+        return None
+    return doc_data if doc_data.get('url') == url else None
+
+
+def _conditional_headers(doc_data: Optional[Dict]) -> Dict[str, str]:
+    """Build If-None-Match / If-Modified-Since headers from a cached page."""
+    validators = (doc_data or {}).get('_http_cache') or {}
+    headers = {}
+    if validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
+    return headers
+
+
+def _extract_with_lxml(html: bytes) -> Optional[Tuple[str, str]]:
+    """
+    Extract the title and main text straight from an lxml tree.
+    
+    Skips BeautifulSoup's Python wrapper object for every node; each text
+    node is stripped and joined by newlines, as get_text(separator='\\n',
+    strip=True) does.
+    
+    Args:
+        html: Raw page HTML
+        
+    Returns:
+        (title, text) tuple, or None if the page has no content
+    """
+    # libxml2 assumes Latin-1 for undeclared pages; the web default is UTF-8
+    declared = EncodingDetector.find_declared_encoding(html, is_html=True)
+    root = etree.fromstring(html, etree.HTMLParser(encoding=None if declared else 'utf-8'))
+    if root is None:
+        return None
+    
+    # Sphinx pages keep their text in <div class="body">
+    containers = root.xpath(
+        '//div[contains(concat(" ", normalize-space(@class), " "), " body ")]'
+    ) or root.xpath('//main') or root.xpath('//body')
+    if not containers:
+        return None
+    main_content = containers[0]
+    
+    title = root.find('.//title')
+    title_text = (title.text or '').strip() if title is not None else "Python Documentation"
+    text = '\n'.join(filter(None, map(str.strip, _iter_text_nodes(main_content))))
+    return title_text, text
+
+
+def _iter_text_nodes(element) -> Iterator[str]:
+    """
+    Yield an lxml subtree's text nodes one by one, skipping non-content tags.
+    
+    Navigation, footer, script and similar elements are skipped with their
+    subtrees, but their tail text belongs to the parent and is kept as its
+    own node. Removing them from the tree instead would merge the text
+    around them into one string.
+    """
+    if element.text:
+        yield element.text
+    for child in element:
+        # Comments and processing instructions have a non-string tag
+        if isinstance(child.tag, str) and child.tag not in NON_CONTENT_TAGS:
+            yield from _iter_text_nodes(child)
+        if child.tail:
+            yield child.tail
+
+
+def _extract_with_soup(html: bytes) -> Optional[Tuple[str, str]]:
+    """
+    Extract the title and main text with BeautifulSoup (lxml-less fallback).
+    
+    Args:
+        html: Raw page HTML
+        
+    Returns:
+        (title, text) tuple, or None if the page has no content
+    """
+    # Sphinx pages keep their text in <div class="body">, so first build a
+    # tree of only <title> and <div> elements (skipping head, nav, footer)
+    soup = BeautifulSoup(html, HTML_PARSER, parse_only=CONTENT_STRAINER)
+    main_content = soup.find('div', class_='body')
+    if main_content is None:
+        # Not a Sphinx layout; fall back to parsing the whole page
+        soup = BeautifulSoup(html, HTML_PARSER)
+        main_content = soup.find('main') or soup.find('body')
+        if not main_content:
+            return None
+    
+    # Remove navigation, footer, script and other non-content elements
+    for element in main_content.find_all(NON_CONTENT_TAGS):
+        element.decompose()
+    
+    title = soup.find('title')
+    title_text = title.get_text().strip() if title else "Python Documentation"
+    return title_text, main_content.get_text(separator='\n', strip=True)
+
+
+def _parse_page(html: bytes, url: str) -> Optional[Dict]:
+    """
+    Extract the title and main text content from a documentation page.
+    
+    Args:
+        html: Raw page HTML
+        url: Page URL
+        
+    Returns:
+        Document dictionary, or None if the page has no content
+    """
+    extracted = _extract_with_lxml(html) if LXML_AVAILABLE else _extract_with_soup(html)
+    if extracted is None:
+        return None
+    title_text, text = extracted
+    
+    # One regex pass strips every line and drops blank lines (no per-line list)
+    content = _LINE_BREAKS.sub('\n', text)
+    
+    return {
+        'url': url,
+        'title': title_text,
+        'content': content,
+        'date_scraped': datetime.now().isoformat(),
+        'content_length': len(content)
+    }
+
 
 def scrape_library_reference(
     output_dir: str = "data",
-    delay: float = REQUEST_DELAY
+    delay: float = REQUEST_DELAY,
+    on_page: Optional[Callable[[Dict], None]] = None,
+    session: Optional[requests.Session] = None,
+    max_age: Optional[float] = PAGE_CACHE_TTL
 ) -> List[Dict]:
     """
     Scrape Python Standard Library Reference documentation.
@@ -46,79 +539,29 @@ def scrape_library_reference(
     Args:
         output_dir: Directory to save scraped content
         delay: Delay between requests in seconds
+        on_page: Called with each page as soon as it is scraped
+        session: HTTP session to reuse (a new one is created if omitted)
+        max_age: Seconds a saved page is reused without revalidating
+            (0 or None always revalidates)
         
     Returns:
         List of dictionaries containing scraped content
     """
     Path(output_dir).mkdir(parents=True, exist_ok=True)
     
-    # Popular standard library modules - most commonly used
-    library_urls = [
-        # File and Directory Operations
-        "https://docs.python.org/3/library/os.html",
-        "https://docs.python.org/3/library/pathlib.html",
-        "https://docs.python.org/3/library/shutil.html",
-        "https://docs.python.org/3/library/glob.html",
-        
-        # System and Environment
-        "https://docs.python.org/3/library/sys.html",
-        "https://docs.python.org/3/library/platform.html",
-        
-        # Data Serialization
-        "https://docs.python.org/3/library/json.html",
-        "https://docs.python.org/3/library/pickle.html",
-        
-        # Date and Time
-        "https://docs.python.org/3/library/datetime.html",
-        "https://docs.python.org/3/library/time.html",
-        
-        # Data Structures
-        "https://docs.python.org/3/library/collections.html",
-        "https://docs.python.org/3/library/heapq.html",
-        "https://docs.python.org/3/library/bisect.html",
-        "https://docs.python.org/3/library/array.html",
-        
-        # String and Text Processing
-        "https://docs.python.org/3/library/string.html",
-        "https://docs.python.org/3/library/re.html",  # Regular expressions
-        "https://docs.python.org/3/library/textwrap.html",
-        
-        # Iteration and Functional Programming
-        "https://docs.python.org/3/library/itertools.html",
-        "https://docs.python.org/3/library/functools.html",
-        
-        # Math and Statistics
-        "https://docs.python.org/3/library/math.html",
-        "https://docs.python.org/3/library/statistics.html",
-        "https://docs.python.org/3/library/random.html",
-        
-        # File I/O
-        "https://docs.python.org/3/library/io.html",
-        "https://docs.python.org/3/library/csv.html",
-        
-        # URL and Web
-        "https://docs.python.org/3/library/urllib.html",
-        "https://docs.python.org/3/library/urllib.parse.html",
-        
-        # Utilities
-        "https://docs.python.org/3/library/argparse.html",
-        "https://docs.python.org/3/library/logging.html",
-        "https://docs.python.org/3/library/hashlib.html",
-        "https://docs.python.org/3/library/base64.html",
-        
-        # Advanced
-        "https://docs.python.org/3/library/typing.html",  # Type hints
-        "https://docs.python.org/3/library/contextlib.html",  # Context managers
-        "https://docs.python.org/3/library/abc.html",  # Abstract base classes
-    ]
-    
-    logger.info(f"Scraping {len(library_urls)} standard library modules...")
-    return scrape_custom_urls(library_urls, output_dir, delay, prefix="lib")
+    logger.info(f"Scraping {len(LIBRARY_URLS)} standard library modules...")
+    return scrape_custom_urls(
+        LIBRARY_URLS, output_dir, delay, prefix="lib", on_page=on_page, session=session,
+        max_age=max_age
+    )
 
 
 def scrape_language_reference(
     output_dir: str = "data",
-    delay: float = REQUEST_DELAY
+    delay: float = REQUEST_DELAY,
+    on_page: Optional[Callable[[Dict], None]] = None,
+    session: Optional[requests.Session] = None,
+    max_age: Optional[float] = PAGE_CACHE_TTL
 ) -> List[Dict]:
     """
     Scrape Python Language Reference documentation.
@@ -129,43 +572,29 @@ def scrape_language_reference(
     Args:
         output_dir: Directory to save scraped content
         delay: Delay between requests in seconds
+        on_page: Called with each page as soon as it is scraped
+        session: HTTP session to reuse (a new one is created if omitted)
+        max_age: Seconds a saved page is reused without revalidating
+            (0 or None always revalidates)
         
     Returns:
         List of dictionaries containing scraped content
     """
     Path(output_dir).mkdir(parents=True, exist_ok=True)
     
-    # Language reference sections
-    reference_urls = [
-        # Data Model (includes decorators, descriptors, etc.)
-        "https://docs.python.org/3/reference/datamodel.html",
-        
-        # Execution Model
-        "https://docs.python.org/3/reference/executionmodel.html",
-        
-        # Expressions
-        "https://docs.python.org/3/reference/expressions.html",
-        
-        # Simple Statements
-        "https://docs.python.org/3/reference/simple_stmts.html",
-        
-        # Compound Statements (functions, classes, decorators)
-        "https://docs.python.org/3/reference/compound_stmts.html",
-        
-        # Top-level Components
-        "https://docs.python.org/3/reference/toplevel_components.html",
-        
-        # Glossary (definitions)
-        "https://docs.python.org/3/glossary.html",
-    ]
-    
-    logger.info(f"Scraping {len(reference_urls)} language reference sections...")
-    return scrape_custom_urls(reference_urls, output_dir, delay, prefix="ref")
+    logger.info(f"Scraping {len(REFERENCE_URLS)} language reference sections...")
+    return scrape_custom_urls(
+        REFERENCE_URLS, output_dir, delay, prefix="ref", on_page=on_page, session=session,
+        max_age=max_age
+    )
 
 
 def scrape_advanced_topics(
     output_dir: str = "data",
-    delay: float = REQUEST_DELAY
+    delay: float = REQUEST_DELAY,
+    on_page: Optional[Callable[[Dict], None]] = None,
+    session: Optional[requests.Session] = None,
+    max_age: Optional[float] = PAGE_CACHE_TTL
 ) -> List[Dict]:
     """
     Scrape advanced Python topics from various documentation sections.
@@ -173,102 +602,133 @@ def scrape_advanced_topics(
     Args:
         output_dir: Directory to save scraped content
         delay: Delay between requests in seconds
+        on_page: Called with each page as soon as it is scraped
+        session: HTTP session to reuse (a new one is created if omitted)
+        max_age: Seconds a saved page is reused without revalidating
+            (0 or None always revalidates)
         
     Returns:
         List of dictionaries containing scraped content
     """
     Path(output_dir).mkdir(parents=True, exist_ok=True)
     
-    # Advanced topics from different sections
-    advanced_urls = [
-        # Generators and Iterators (from tutorial)
-        "https://docs.python.org/3/tutorial/classes.html#generators",
-        "https://docs.python.org/3/tutorial/classes.html#generator-expressions",
-        "https://docs.python.org/3/tutorial/classes.html#iterators",
-        
-        # Async/Await
-        "https://docs.python.org/3/library/asyncio.html",
-    ]
-    
-    return scrape_custom_urls(advanced_urls, output_dir, delay, prefix="adv")
+    return scrape_custom_urls(
+        ADVANCED_URLS, output_dir, delay, prefix="adv", on_page=on_page, session=session,
+        max_age=max_age
+    )
 
 
 def scrape_custom_urls(
-    urls: List[str],
+    urls: Sequence[str],
     output_dir: str = "data",
     delay: float = REQUEST_DELAY,
-    prefix: str = "doc"
+    prefix: str = "doc",
+    on_page: Optional[Callable[[Dict], None]] = None,
+    session: Optional[requests.Session] = None,
+    max_age: Optional[float] = PAGE_CACHE_TTL,
+    parse_workers: int = PARSE_WORKERS
 ) -> List[Dict]:
     """
     Scrape custom list of URLs.
     
+    Pages saved by an earlier run are reused without a request while
+    younger than max_age; older ones are revalidated with a conditional
+    request and reused on 304 Not Modified. URLs that differ only in their
+    fragment (#anchor) point into the same page, which is fetched and
+    returned once under the fragment-free URL.
+    
     Args:
-        urls: List of URLs to scrape
+        urls: URLs to scrape
         output_dir: Directory to save scraped content
         delay: Delay between requests in seconds
+        on_page: Called with each page as soon as it is scraped
+        session: HTTP session to reuse, so consecutive scrapes share
+            keep-alive connections (a new one is created if omitted)
+        max_age: Seconds a saved page is reused without revalidating
+            (0 or None always revalidates)
+        parse_workers: Processes that parse fetched pages in parallel,
+            off the GIL of the fetching threads (0 parses in-thread)
         
     Returns:
         List of dictionaries containing scraped content
     """
     Path(output_dir).mkdir(parents=True, exist_ok=True)
     
-    scraped_data = []
-    session = requests.Session()
-    session.headers.update({
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-    })
+    # Anchors only scroll within a page; fetch each document once, in
+    # first-mention order
+    requested = len(urls)
+    urls = list(dict.fromkeys(urldefrag(url).url for url in urls))
+    if len(urls) < requested:
+        logger.info(f"{requested} {prefix} URLs cover {len(urls)} distinct pages")
     
-    for i, url in enumerate(urls, 1):
+    owns_session = session is None
+    if owns_session:
+        session = _create_session()
+    rate_limiter = RateLimiter(delay)
+    parser = ProcessPoolExecutor(max_workers=parse_workers) if parse_workers > 0 else None
+    
+    def scrape_one(item) -> Optional[Dict]:
+        i, url = item
+        filename = f"{prefix}_{i:03d}_{urlparse(url).path.split('/')[-1] or 'index'}.json"
+        filepath = os.path.join(output_dir, filename)
         try:
-            logger.info(f"Scraping {prefix} {i}/{len(urls)}: {url}")
-            
-            response = session.get(url, timeout=10)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Remove navigation, footer, etc.
-            for element in soup.find_all(['nav', 'footer', 'header']):
-                element.decompose()
-            for element in soup.find_all(['script', 'style']):
-                element.decompose()
-            
-            title = soup.find('title')
-            title_text = title.get_text().strip() if title else "Python Documentation"
-            
-            main_content = soup.find('div', class_='body') or soup.find('main') or soup.find('body')
-            
-            if main_content:
-                content = main_content.get_text(separator='\n', strip=True)
-                lines = [line.strip() for line in content.split('\n') if line.strip()]
-                content = '\n'.join(lines)
-                
-                doc_data = {
-                    'url': url,
-                    'title': title_text,
-                    'content': content,
-                    'date_scraped': datetime.now().isoformat(),
-                    'content_length': len(content)
-                }
-                
-                scraped_data.append(doc_data)
-                
-                filename = f"{prefix}_{i:03d}_{urlparse(url).path.split('/')[-1] or 'index'}.json"
-                filepath = os.path.join(output_dir, filename)
-                
-                with open(filepath, 'w', encoding='utf-8') as f:
-                    json.dump(doc_data, f, indent=2, ensure_ascii=False)
+            cached = _load_cached_page(filepath, url)
+            if cached is not None and max_age and time.time() - os.path.getmtime(filepath) < max_age:
+                logger.info(f"Using cached {prefix} {i}/{len(urls)}: {url}")
+                doc_data = cached
+            else:
+                logger.info(f"Scraping {prefix} {i}/{len(urls)}: {url}")
+                response = _fetch(session, url, rate_limiter, _conditional_headers(cached))
                 
-                logger.info(f"Saved: {filepath} ({len(content)} characters)")
+                if response.status_code == 304 and cached is not None:
+                    # Unchanged upstream; renew the saved copy's freshness
+                    logger.info(f"Not modified: {url}")
+                    os.utime(filepath)
+                    doc_data = cached
+                else:
+                    if parser is not None:
+                        doc_data = parser.submit(_parse_page, response.content, url).result()
+                    else:
+                        doc_data = _parse_page(response.content, url)
+                    if not doc_data:
+                        logger.warning(f"No content found for {url}")
+                        return None
+                    
+                    # Validators for the next run's conditional request
+                    validators = {
+                        'etag': response.headers.get('ETag'),
+                        'last_modified': response.headers.get('Last-Modified')
+                    }
+                    if any(validators.values()):
+                        doc_data['_http_cache'] = validators
+                    
+                    # Save individual file
+                    write_json(Path(filepath), doc_data)
+                    
+                    logger.info(f"Saved: {filepath} ({doc_data['content_length']} characters)")
             
-            if i < len(urls):
-                time.sleep(delay)
-                
+            if on_page is not None:
+                on_page(doc_data)
+            return doc_data
+            
+        except requests.RequestException as e:
+            logger.error(f"Error fetching {url}: {e}")
         except Exception as e:
             logger.error(f"Error processing {url}: {e}")
-            continue
+        return None
     
-    return scraped_data
+    # Network waits overlap across workers while the limiter keeps the
+    # overall request rate polite; map() preserves input order
+    try:
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            results = list(executor.map(scrape_one, enumerate(urls, 1)))
+    finally:
+        if parser is not None:
+            parser.shutdown()
+        if owns_session:
+            session.close()
+    
+    return [doc for doc in results if doc]
 
 
 def scrape_python_docs(
@@ -276,7 +736,9 @@ def scrape_python_docs(
     max_pages: int = 100,
     output_dir: str = "data",
     delay: float = REQUEST_DELAY,
-    include_advanced: bool = True
+    include_advanced: bool = True,
+    on_page: Optional[Callable[[Dict], None]] = None,
+    max_age: Optional[float] = PAGE_CACHE_TTL
 ) -> List[Dict]:
     """
     Scrape Python documentation pages from the tutorial section.
@@ -286,6 +748,11 @@ def scrape_python_docs(
         max_pages: Maximum number of pages to scrape
         output_dir: Directory to save scraped content
         delay: Delay between requests in seconds
+        include_advanced: Whether to also scrape the library and language references
+        on_page: Called with each page as soon as it is scraped (from a
+            worker thread), so it can be processed while scraping continues
+        max_age: Seconds a saved page is reused without revalidating
+            (0 or None always revalidates)
         
     Returns:
         List of dictionaries containing scraped content with metadata
@@ -293,243 +760,151 @@ def scrape_python_docs(
     # Create output directory
     Path(output_dir).mkdir(parents=True, exist_ok=True)
     
-    # Pages to scrape - expanded tutorial sections including advanced topics
-    pages_to_scrape = [
-        # Basic Tutorial
-        "index.html",
-        "introduction.html",
-        "interpreter.html",
-        "introduction.html#informal-introduction",
-        
-        # Data Structures
-        "datastructures.html",
-        "datastructures.html#more-on-lists",
-        "datastructures.html#using-lists-as-stacks",
-        "datastructures.html#using-lists-as-queues",
-        "datastructures.html#list-comprehensions",
-        "datastructures.html#nested-list-comprehensions",
-        "datastructures.html#the-del-statement",
-        "datastructures.html#tuples-and-sequences",
-        "datastructures.html#sets",
-        "datastructures.html#dictionaries",
-        "datastructures.html#looping-techniques",
-        "datastructures.html#more-on-conditions",
-        "datastructures.html#comparing-sequences-and-other-types",
-        
-        # Control Flow
-        "controlflow.html",
-        "controlflow.html#if-statements",
-        "controlflow.html#for-statements",
-        "controlflow.html#the-range-function",
-        "controlflow.html#break-and-continue-statements",
-        "controlflow.html#pass-statements",
-        "controlflow.html#match-statements",
-        "controlflow.html#defining-functions",
-        
-        # Functions (Advanced)
-        "functions.html",
-        "functions.html#more-on-defining-functions",
-        "functions.html#default-argument-values",
-        "functions.html#keyword-arguments",
-        "functions.html#special-parameters",
-        "functions.html#arbitrary-argument-lists",
-        "functions.html#unpacking-argument-lists",
-        "functions.html#lambda-expressions",
-        "functions.html#documentation-strings",
-        "functions.html#function-annotations",
-        
-        # Data Structures (Advanced)
-        "datastructures.html#list-comprehensions",
-        "datastructures.html#nested-list-comprehensions",
-        
-        # Modules
-        "modules.html",
-        "modules.html#more-on-modules",
-        "modules.html#standard-modules",
-        "modules.html#the-dir-function",
-        "modules.html#packages",
-        "modules.html#intra-package-references",
-        "modules.html#packages-in-multiple-directories",
-        
-        # Input/Output
-        "inputoutput.html",
-        "inputoutput.html#fancier-output-formatting",
-        "inputoutput.html#old-string-formatting",
-        "inputoutput.html#reading-and-writing-files",
-        "inputoutput.html#methods-of-file-objects",
-        "inputoutput.html#saving-structured-data-with-json",
-        
-        # Errors and Exceptions
-        "errors.html",
-        "errors.html#syntax-errors",
-        "errors.html#exceptions",
-        "errors.html#handling-exceptions",
-        "errors.html#raising-exceptions",
-        "errors.html#exception-chaining",
-        "errors.html#user-defined-exceptions",
-        "errors.html#defining-clean-up-actions",
-        
-        # Classes
-        "classes.html",
-        "classes.html#a-word-about-names-and-objects",
-        "classes.html#python-scopes-and-namespaces",
-        "classes.html#a-first-look-at-classes",
-        "classes.html#class-objects",
-        "classes.html#instance-objects",
-        "classes.html#method-objects",
-        "classes.html#class-and-instance-variables",
-        "classes.html#random-remarks",
-        "classes.html#inheritance",
-        "classes.html#multiple-inheritance",
-        "classes.html#private-variables",
-        "classes.html#odds-and-ends",
-        "classes.html#iterators",
-        "classes.html#generators",
-        "classes.html#generator-expressions",
-        
-        # Standard Library
-        "stdlib.html",
-        "stdlib.html#os-interface",
-        "stdlib.html#file-wildcards",
-        "stdlib.html#command-line-arguments",
-        "stdlib.html#error-output-redirection-and-program-termination",
-        "stdlib.html#string-pattern-matching",
-        "stdlib.html#mathematics",
-        "stdlib.html#internet-access",
-        "stdlib.html#dates-and-times",
-        "stdlib.html#data-compression",
-        "stdlib.html#performance-measurement",
-        "stdlib.html#quality-control",
-        "stdlib.html#batteries-included",
-        
-        "stdlib2.html",
-        "stdlib2.html#output-formatting",
-        "stdlib2.html#templating",
-        "stdlib2.html#working-with-binary-data-record-layouts",
-        "stdlib2.html#multi-threading",
-        "stdlib2.html#logging",
-        "stdlib2.html#weak-references",
-        "stdlib2.html#tools-for-working-with-lists",
-        "stdlib2.html#decimal-floating-point-arithmetic",
-        
-        # Advanced Topics (from Language Reference)
-        # Note: These are from docs.python.org/3/reference/ but we'll add tutorial equivalents
+    urls = [
+        page if page.startswith('http') else urljoin(base_url, page)
+        for page in TUTORIAL_PAGES[:max_pages]
     ]
+    # One session (and connection pool) for every section, so later
+    # sections reuse the keep-alive connections to docs.python.org
+    session = _create_session()
+    try:
+        scraped_data = scrape_custom_urls(
+            urls, output_dir, delay, prefix="doc", on_page=on_page, session=session,
+            max_age=max_age
+        )
+        
+        # Scrape the reference sections if requested. A page already
+        # fetched by an earlier section (e.g. an anchor into a tutorial
+        # page) is skipped, so it is neither refetched nor stored twice
+        if include_advanced:
+            seen = {urldefrag(url).url for url in urls}
+            sections = (
+                ("standard library reference", "library reference pages", LIBRARY_URLS, "lib"),
+                ("language reference", "language reference pages", REFERENCE_URLS, "ref"),
+                ("additional advanced topics", "advanced topic pages", ADVANCED_URLS, "adv"),
+            )
+            for label, noun, section_urls, prefix in sections:
+                pending = [url for url in section_urls if urldefrag(url).url not in seen]
+                seen.update(urldefrag(url).url for url in pending)
+                logger.info(f"Scraping {label}...")
+                try:
+                    section_data = scrape_custom_urls(
+                        pending, output_dir, delay, prefix=prefix, on_page=on_page,
+                        session=session, max_age=max_age
+                    )
+                    scraped_data.extend(section_data)
+                    logger.info(f"Added {len(section_data)} {noun}")
+                except Exception as e:
+                    logger.warning(f"Error scraping {label}: {e}")
+    finally:
+        session.close()
     
-    # Note: Advanced topics like decorators are handled separately via scrape_advanced_topics()
+    save_combined_data(scraped_data, output_dir)
     
-    scraped_data = []
-    session = requests.Session()
-    session.headers.update({
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-    })
+    logger.info(f"Scraping complete. Total pages: {len(scraped_data)}")
+    return scraped_data
+
+
+def save_combined_data(scraped_data: List[Dict], output_dir: str = "data") -> Path:
+    """
+    Save all scraped pages to a single combined file.
     
-    for i, page in enumerate(pages_to_scrape[:max_pages], 1):
-        try:
-            # Construct full URL
-            if page.startswith('http'):
-                url = page
-            else:
-                url = urljoin(base_url, page)
-            
-            logger.info(f"Scraping page {i}/{max_pages}: {url}")
-            
-            # Fetch page
-            response = session.get(url, timeout=10)
-            response.raise_for_status()
-            
-            # Parse HTML
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Remove navigation, footer, and other non-content elements
-            for element in soup.find_all(['nav', 'footer', 'header']):
-                element.decompose()
-            
-            # Remove script and style tags
-            for element in soup.find_all(['script', 'style']):
-                element.decompose()
-            
-            # Extract title
-            title = soup.find('title')
-            title_text = title.get_text().strip() if title else "Python Documentation"
-            
-            # Extract main content
-            main_content = soup.find('div', class_='body') or soup.find('main') or soup.find('body')
-            
-            if main_content:
-                # Get text content
-                content = main_content.get_text(separator='\n', strip=True)
-                
-                # Clean up content
-                lines = [line.strip() for line in content.split('\n') if line.strip()]
-                content = '\n'.join(lines)
-                
-                # Create metadata
-                doc_data = {
-                    'url': url,
-                    'title': title_text,
-                    'content': content,
-                    'date_scraped': datetime.now().isoformat(),
-                    'content_length': len(content)
-                }
-                
-                scraped_data.append(doc_data)
-                
-                # Save individual file
-                filename = f"doc_{i:03d}_{urlparse(url).path.split('/')[-1] or 'index'}.json"
-                filepath = os.path.join(output_dir, filename)
-                
-                with open(filepath, 'w', encoding='utf-8') as f:
-                    json.dump(doc_data, f, indent=2, ensure_ascii=False)
-                
-                logger.info(f"Saved: {filepath} ({len(content)} characters)")
-            else:
-                logger.warning(f"No content found for {url}")
-            
-            # Rate limiting
-            if i < len(pages_to_scrape[:max_pages]):
-                time.sleep(delay)
-                
-        except requests.RequestException as e:
-            logger.error(f"Error fetching {url}: {e}")
-            continue
-        except Exception as e:
-            logger.error(f"Error processing {url}: {e}")
-            continue
+    Writes zstd-compressed Parquet when pyarrow is available and JSON
+    Lines otherwise, removing any stale combined file in another format.
     
-    # Scrape library reference if requested
-    if include_advanced:
-        logger.info("Scraping standard library reference...")
-        try:
-            library_data = scrape_library_reference(output_dir, delay)
-            scraped_data.extend(library_data)
-            logger.info(f"Added {len(library_data)} library reference pages")
-        except Exception as e:
-            logger.warning(f"Error scraping library reference: {e}")
+    Args:
+        scraped_data: List of scraped document dictionaries
+        output_dir: Directory to save the combined file
         
-        logger.info("Scraping language reference...")
-        try:
-            reference_data = scrape_language_reference(output_dir, delay)
-            scraped_data.extend(reference_data)
-            logger.info(f"Added {len(reference_data)} language reference pages")
-        except Exception as e:
-            logger.warning(f"Error scraping language reference: {e}")
+    Returns:
+        Path of the written file
+    """
+    output_path = Path(output_dir)
+    
+    if PYARROW_AVAILABLE:
+        written = output_path / COMBINED_PARQUET
+        pq.write_table(pa.Table.from_pylist(scraped_data), written, compression='zstd')
+    else:
+        # One compact document per line, so readers can stream it
+        written = output_path / COMBINED_JSONL
+        write_json_lines(written, scraped_data)
+    
+    for name in (COMBINED_PARQUET, COMBINED_JSONL, COMBINED_JSON):
+        stale = output_path / name
+        if stale != written and stale.exists():
+            stale.unlink()
+    return written
+
+
+def scraped_data_path(data_dir: str = "data") -> Optional[Path]:
+    """
+    Locate the combined scraped data file.
+    
+    Args:
+        data_dir: Directory containing scraped data
         
-        logger.info("Scraping additional advanced topics...")
-        try:
-            advanced_data = scrape_advanced_topics(output_dir, delay)
-            scraped_data.extend(advanced_data)
-            logger.info(f"Added {len(advanced_data)} advanced topic pages")
-        except Exception as e:
-            logger.warning(f"Error scraping advanced topics: {e}")
+    Returns:
+        Path to the Parquet, JSON Lines or JSON combined file, or None if
+        none exists
+    """
+    parquet_path = Path(data_dir) / COMBINED_PARQUET
+    if PYARROW_AVAILABLE and parquet_path.exists():
+        return parquet_path
     
-    # Save combined data
-    combined_filepath = os.path.join(output_dir, "all_docs.json")
-    with open(combined_filepath, 'w', encoding='utf-8') as f:
-        json.dump(scraped_data, f, indent=2, ensure_ascii=False)
+    for name in (COMBINED_JSONL, COMBINED_JSON):
+        json_path = Path(data_dir) / name
+        if json_path.exists():
+            return json_path
+    return None
+
+
+def iter_scraped_data(
+    data_dir: str = "data",
+    batch_size: int = PARQUET_BATCH_SIZE
+) -> Iterator[Dict]:
+    """
+    Stream previously scraped documentation one document at a time.
     
-    logger.info(f"Scraping complete. Total pages: {len(scraped_data)}")
-    return scraped_data
+    Parquet data is decoded batch_size rows at a time and JSON Lines data
+    one line at a time, so chunking can start before the whole corpus is
+    loaded.
+    
+    Args:
+        data_dir: Directory containing scraped data
+        batch_size: Documents decoded per Parquet record batch
+        
+    Yields:
+        Dictionaries containing scraped content
+    """
+    combined_path = scraped_data_path(data_dir)
+    
+    if combined_path is not None and combined_path.suffix == '.parquet':
+        parquet_file = pq.ParquetFile(combined_path)
+        for batch in parquet_file.iter_batches(batch_size=batch_size):
+            yield from batch.to_pylist()
+        return
+    if combined_path is not None and combined_path.suffix == '.jsonl':
+        yield from iter_json_lines(combined_path)
+        return
+    
+    yield from load_scraped_data(data_dir)
+
+
+def _load_page_file(path: str) -> Optional[Dict]:
+    """
+    Read one saved page, logging and skipping unreadable files.
+    
+    Args:
+        path: Path of a per-page JSON file
+        
+    Returns:
+        Document dictionary, or None if the file can't be read
+    """
+    try:
+        return read_json(path)
+    except Exception as e:
+        logger.error(f"Error loading {path}: {e}")
+        return None
 
 
 def load_scraped_data(data_dir: str = "data") -> List[Dict]:
@@ -537,30 +912,34 @@ def load_scraped_data(data_dir: str = "data") -> List[Dict]:
     Load previously scraped documentation data.
     
     Args:
-        data_dir: Directory containing scraped JSON files
+        data_dir: Directory containing scraped JSON, JSON Lines or Parquet files
         
     Returns:
         List of dictionaries containing scraped content
     """
-    combined_filepath = os.path.join(data_dir, "all_docs.json")
+    combined_path = scraped_data_path(data_dir)
     
-    if os.path.exists(combined_filepath):
-        with open(combined_filepath, 'r', encoding='utf-8') as f:
-            return json.load(f)
+    if combined_path is not None:
+        if combined_path.suffix == '.parquet':
+            return pq.read_table(combined_path).to_pylist()
+        if combined_path.suffix == '.jsonl':
+            return list(iter_json_lines(combined_path))
+        return read_json(combined_path)
     
-    # If combined file doesn't exist, load individual files
-    scraped_data = []
-    data_path = Path(data_dir)
+    # If combined file doesn't exist, load individual files; scandir gets
+    # names without a stat per entry, and the small reads overlap in threads
+    if not os.path.isdir(data_dir):
+        return []
     
-    if data_path.exists():
-        for json_file in data_path.glob("doc_*.json"):
-            try:
-                with open(json_file, 'r', encoding='utf-8') as f:
-                    scraped_data.append(json.load(f))
-            except Exception as e:
-                logger.error(f"Error loading {json_file}: {e}")
+    with os.scandir(data_dir) as entries:
+        page_files = sorted(
+            entry.path for entry in entries
+            if entry.name.startswith("doc_") and entry.name.endswith(".json")
+        )
     
-    return scraped_data
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        pages = executor.map(_load_page_file, page_files)
+        return [page for page in pages if page is not None]
 
 
 if __name__ == "__main__":
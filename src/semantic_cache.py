@@ -0,0 +1,153 @@
+"""
+Semantic answer cache keyed by query embeddings.
+
+This module remembers answers to previous questions and returns them for
+new queries whose embedding is nearly identical (cosine similarity above
+a threshold), so rephrased questions skip retrieval and the LLM call.
+Entries are persisted as JSON so the cache survives app restarts.
+"""
+
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src.serialization import read_json, write_json
+from src.vector_math import normalize_rows
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Default location of the persisted cache
+QUERY_CACHE_PATH = "cache/query_cache.json"
+
+# Minimum cosine similarity for a cached answer to be reused
+SIMILARITY_THRESHOLD = 0.95
+
+# Entries kept before the oldest are evicted
+MAX_CACHE_ENTRIES = 1000
+
+
+class SemanticCache:
+    """In-memory nearest-neighbour cache of past query answers."""
+    
+    def __init__(
+        self,
+        path: Optional[str] = QUERY_CACHE_PATH,
+        similarity_threshold: float = SIMILARITY_THRESHOLD,
+        max_entries: int = MAX_CACHE_ENTRIES
+    ):
+        """
+        Create the cache, loading persisted entries if present.
+        
+        Args:
+            path: JSON file the cache is persisted to (None keeps it in memory)
+            similarity_threshold: Minimum cosine similarity for a hit
+            max_entries: Maximum number of entries kept
+        """
+        self.path = Path(path) if path else None
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        
+        # Row i of _vectors is the unit-length embedding of _entries[i]
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None
+        self._entries: List[Dict] = []
+        self._load()
+    
+    def _load(self):
+        """Load persisted entries, ignoring a missing or corrupt file."""
+        if self.path is None or not self.path.exists():
+            return
+        
+        try:
+            stored = read_json(self.path)
+            entries = stored['entries'][-self.max_entries:]
+            if entries:
+                self._vectors = normalize_rows([e['embedding'] for e in entries])
+                self._entries = [{'tag': e['tag'], 'payload': e['payload']} for e in entries]
+            logger.info(f"Loaded {len(self._entries)} cached answers from {self.path}")
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable query cache {self.path}: {e}")
+    
+    def _save(self):
+        """Persist all entries (caller holds the lock)."""
+        if self.path is None:
+            return
+        
+        entries = [
+            {'embedding': vector.tolist(), **entry}
+            for vector, entry in zip(self._vectors, self._entries)
+        ] if self._entries else []
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            write_json(self.path, {'entries': entries}, indent=False)
+        except OSError as e:
+            logger.warning(f"Could not save query cache: {e}")
+    
+    def lookup(self, embedding: Sequence[float], tag: str = "") -> Optional[Dict]:
+        """
+        Return the payload of the most similar cached query, if close enough.
+        
+        Args:
+            embedding: Query embedding
+            tag: Only entries stored with the same tag can match (e.g. the
+                model and retrieval settings that produced the answer)
+        
+        Returns:
+            Cached payload, or None on a miss
+        """
+        query = normalize_rows([embedding])[0]
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != query.shape[0]:
+                return None
+            
+            similarities = self._vectors @ query
+            candidates = [i for i, entry in enumerate(self._entries) if entry['tag'] == tag]
+            if not candidates:
+                return None
+            
+            best = max(candidates, key=lambda i: similarities[i])
+            if similarities[best] < self.similarity_threshold:
+                return None
+            return self._entries[best]['payload']
+    
+    def add(self, embedding: Sequence[float], payload: Dict, tag: str = ""):
+        """
+        Cache a payload for a query embedding and persist the cache.
+        
+        Args:
+            embedding: Query embedding
+            payload: JSON-serializable data to return on later hits
+            tag: Tag restricting which lookups can match this entry
+        """
+        vector = normalize_rows([embedding])
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != vector.shape[1]:
+                # First entry, or the embedding model changed dimensionality
+                self._vectors = vector
+                self._entries = []
+            else:
+                self._vectors = np.vstack([self._vectors, vector])
+            self._entries.append({'tag': tag, 'payload': payload})
+            
+            if len(self._entries) > self.max_entries:
+                self._vectors = self._vectors[-self.max_entries:]
+                self._entries = self._entries[-self.max_entries:]
+            self._save()
+    
+    def clear(self):
+        """Remove every cached entry, including the persisted file."""
+        with self._lock:
+            self._vectors = None
+            self._entries = []
+            if self.path is not None:
+                self.path.unlink(missing_ok=True)
+    
+    def __len__(self) -> int:
+        """Return the number of cached entries."""
+        with self._lock:
+            return len(self._entries)
@@ -0,0 +1,121 @@
+"""
+JSON serialization helpers.
+
+This module uses orjson when it is installed (several times faster than
+the standard library and aware of numpy types) and falls back to the
+stdlib json module otherwise. Output is always UTF-8 encoded bytes.
+Both backends raise ValueError subclasses on malformed input.
+"""
+
+import json
+import logging
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def dumps(obj: Any, indent: bool = False) -> bytes:
+    """
+    Serialize an object to UTF-8 JSON bytes.
+    
+    Args:
+        obj: JSON-serializable object
+        indent: Whether to pretty-print with 2-space indentation
+    
+    Returns:
+        Encoded JSON document
+    """
+    if ORJSON_AVAILABLE:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
+    
+    if indent:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+    # Compact output stays on the C encoder and drops the padding spaces
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def write_json(path: Path, obj: Any, indent: bool = True):
+    """
+    Write an object to a JSON file.
+    
+    Args:
+        path: Output file path
+        obj: JSON-serializable object
+        indent: Whether to pretty-print with 2-space indentation
+    """
+    with open(path, 'wb') as f:
+        f.write(dumps(obj, indent=indent))
+
+
+def loads(data: bytes) -> Any:
+    """
+    Deserialize a JSON document.
+    
+    Args:
+        data: UTF-8 encoded JSON bytes
+    
+    Returns:
+        Decoded object
+    """
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def read_json(path: Path) -> Any:
+    """
+    Read an object from a JSON file.
+    
+    Args:
+        path: Input file path
+    
+    Returns:
+        Decoded object
+    """
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+
+def write_json_lines(path: Path, objs: Iterable[Any]):
+    """
+    Write objects to a JSON Lines file, one compact document per line.
+    
+    Each object is encoded and written as it is produced, so the whole
+    file is never materialized in memory.
+    
+    Args:
+        path: Output file path
+        objs: JSON-serializable objects
+    """
+    with open(path, 'wb') as f:
+        for obj in objs:
+            f.write(dumps(obj))
+            f.write(b'\n')
+
+
+def iter_json_lines(path: Path) -> Iterator[Any]:
+    """
+    Stream objects from a JSON Lines file, skipping blank lines.
+    
+    Args:
+        path: Input file path
+    
+    Yields:
+        Decoded objects in file order
+    """
+    with open(path, 'rb') as f:
+        for line in f:
+            if line.strip():
+                yield loads(line)
@@ -0,0 +1,166 @@
+"""
+Vector math helpers for in-memory similarity search.
+
+This module provides normalization, binary and int8 scalar quantization,
+and the matching distance routines used by the vector store's fast
+search path. Cosine similarity uses SimSIMD's SIMD kernels when the
+package is installed and falls back to NumPy otherwise.
+"""
+
+import logging
+from typing import Tuple
+
+import numpy as np
+
+try:
+    import simsimd
+    SIMSIMD_AVAILABLE = True
+except ImportError:
+    SIMSIMD_AVAILABLE = False
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Number of set bits for every possible byte value
+_POPCOUNT_TABLE = np.array(
+    [bin(i).count("1") for i in range(256)],
+    dtype=np.uint8
+)
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """
+    L2-normalize each row so dot products equal cosine similarity.
+    
+    Args:
+        vectors: 2-D array of shape (n, dim)
+    
+    Returns:
+        float32 array of unit-length rows (zero rows are left as zeros)
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def cosine_similarities(query: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+    """
+    Cosine similarity between a query and each row of a matrix.
+    
+    Args:
+        query: Vector of shape (dim,)
+        vectors: 2-D array of shape (n, dim)
+    
+    Returns:
+        float32 similarities of shape (n,) (0 for zero-length vectors)
+    """
+    query = np.ascontiguousarray(query, dtype=np.float32)
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    
+    if SIMSIMD_AVAILABLE:
+        distances = np.asarray(simsimd.cdist(query[None, :], vectors, metric="cosine"))
+        return (1.0 - distances[0]).astype(np.float32)
+    
+    norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query)
+    similarities = vectors @ query
+    return np.divide(
+        similarities,
+        norms,
+        out=np.zeros_like(similarities),
+        where=norms != 0
+    )
+
+
+def binarize(vectors: np.ndarray) -> np.ndarray:
+    """
+    Binary-quantize vectors by sign, packing 8 dimensions per byte.
+    
+    Args:
+        vectors: Array of shape (dim,) or (n, dim)
+    
+    Returns:
+        uint8 array of shape (..., ceil(dim / 8))
+    """
+    return np.packbits(np.asarray(vectors) > 0, axis=-1)
+
+
+def hamming_distances(codes: np.ndarray, query_code: np.ndarray) -> np.ndarray:
+    """
+    Compute Hamming distances between packed binary codes and a query code.
+    
+    Args:
+        codes: Packed codes of shape (n, n_bytes)
+        query_code: Packed query code of shape (n_bytes,)
+    
+    Returns:
+        Integer distances of shape (n,)
+    """
+    xor = np.bitwise_xor(codes, query_code)
+    return _POPCOUNT_TABLE[xor].sum(axis=1, dtype=np.int32)
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Scalar-quantize vectors to int8 with a per-vector scale.
+    
+    Each row is divided by ``max(|v|) / 127`` and rounded, so
+    ``codes[i] * scales[i]`` approximates the original row.
+    
+    Args:
+        vectors: 2-D array of shape (n, dim)
+    
+    Returns:
+        Tuple of (int8 codes of shape (n, dim), float32 scales of shape (n,))
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def int8_dot(
+    codes: np.ndarray,
+    scales: np.ndarray,
+    query_code: np.ndarray,
+    query_scale: float
+) -> np.ndarray:
+    """
+    Approximate dot products between int8-quantized rows and a query.
+    
+    Accumulates in int32 to avoid overflow, then rescales to float.
+    
+    Args:
+        codes: int8 codes of shape (n, dim)
+        scales: Per-row scales of shape (n,)
+        query_code: int8 query code of shape (dim,)
+        query_scale: Query scale
+    
+    Returns:
+        float32 dot products of shape (n,)
+    """
+    raw = codes.astype(np.int32) @ query_code.astype(np.int32)
+    return raw.astype(np.float32) * scales * np.float32(query_scale)
+
+
+def truncate_embeddings(vectors: np.ndarray, dim: int) -> np.ndarray:
+    """
+    Matryoshka-truncate embeddings to their first dim components.
+    
+    Matryoshka-trained models (e.g. Gemini embeddings) front-load
+    information, so a prefix re-normalized to unit length is a usable
+    lower-dimensional embedding.
+    
+    Args:
+        vectors: Array of shape (dim_full,) or (n, dim_full)
+        dim: Target dimensionality
+    
+    Returns:
+        Unit-normalized float32 array with last axis of size dim
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        return normalize_rows(vectors[None, :dim])[0]
+    return normalize_rows(vectors[:, :dim])
@@ -5,13 +5,26 @@ This module handles document storage, retrieval, and management
 in the ChromaDB vector database.
 """
 
+import hashlib
 import logging
+import shutil
+import threading
 from pathlib import Path
 from typing import Dict, List, Optional
 
 import chromadb
+import numpy as np
 from chromadb.config import Settings
 
+from src.vector_math import (
+    binarize,
+    hamming_distances,
+    int8_dot,
+    normalize_rows,
+    quantize_int8,
+    truncate_embeddings
+)
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -19,6 +32,46 @@ logger = logging.getLogger(__name__)
 # Collection name
 COLLECTION_NAME = "python_docs"
 
+# HNSW index parameters (ChromaDB's ANN index); larger construction_ef/M
+# improve recall at build time, search_ef trades query latency for recall
+HNSW_METADATA = {
+    "hnsw:space": "cosine",
+    "hnsw:construction_ef": 200,
+    "hnsw:M": 16,
+    "hnsw:search_ef": 50
+}
+
+# Collections created by this version store unit-length embeddings, so the
+# snapshot can use raw dot products; older collections lack the flag
+NORMALIZED_METADATA_KEY = "embeddings_normalized"
+COLLECTION_METADATA = {**HNSW_METADATA, NORMALIZED_METADATA_KEY: True}
+
+# In-memory two-stage search parameters
+RERANK_CANDIDATES = 50  # First-pass shortlist size for the full-vector rerank
+FIRST_PASS_DIMS = 256  # Matryoshka prefix length for the truncated first pass
+FIRST_PASS_MODES = ("binary", "truncated")
+SNAPSHOT_BATCH_SIZE = 1000  # Documents fetched per collection.get() when snapshotting
+ADD_BATCH_SIZE = 2048  # Documents written per collection.upsert() call (Chroma caps a call near 5.4k)
+# Sibling directory (under persist_directory) holding the int8 snapshot as
+# memory-mapped .npy files, so restarts skip fetching float32 embeddings
+SNAPSHOT_CACHE_SUFFIX = "_int8_snapshot"
+SNAPSHOT_CACHE_ARRAYS = ("ids", "codes", "int8_vectors", "int8_scales")
+
+
+def content_hash(text: str) -> str:
+    """
+    Stable digest of a chunk's text for deduplication and IDs.
+    
+    Unlike the builtin hash(), this is the same in every process.
+    
+    Args:
+        text: Chunk text
+    
+    Returns:
+        32-character (128-bit) BLAKE2b hex digest
+    """
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
 
 class VectorStore:
     """Manages ChromaDB vector store operations."""
@@ -26,7 +79,8 @@ class VectorStore:
     def __init__(
         self,
         persist_directory: str = "./chroma_db",
-        collection_name: str = COLLECTION_NAME
+        collection_name: str = COLLECTION_NAME,
+        quantize_embeddings: bool = True
     ):
         """
         Initialize ChromaDB client and collection.
@@ -34,10 +88,23 @@ class VectorStore:
         Args:
             persist_directory: Directory to persist ChromaDB data
             collection_name: Name of the collection
+            quantize_embeddings: Hold in-memory snapshot vectors as int8
+                (4x smaller) instead of float32
         """
         self.persist_directory = Path(persist_directory)
         self.persist_directory.mkdir(parents=True, exist_ok=True)
         self.collection_name = collection_name
+        self.quantize_embeddings = quantize_embeddings
+        
+        # Lazily built in-memory copy of the collection for search_snapshot();
+        # the lock stops concurrent first queries from each building one
+        self._snapshot: Optional[Dict] = None
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_cache_dir = self.persist_directory / f"{collection_name}{SNAPSHOT_CACHE_SUFFIX}"
+        
+        # Text hashes added through this instance, so deduplication also
+        # holds across incremental add_documents() calls
+        self._seen_text_hashes = set()
         
         # Initialize ChromaDB client
         self.client = chromadb.PersistentClient(
@@ -49,7 +116,7 @@ class VectorStore:
         try:
             self.collection = self.client.get_or_create_collection(
                 name=collection_name,
-                metadata={"hnsw:space": "cosine"}
+                metadata=COLLECTION_METADATA
             )
             logger.info(f"Initialized collection: {collection_name}")
         except Exception as e:
@@ -64,24 +131,32 @@ class VectorStore:
         """
         Add document chunks to the vector store.
         
+        Chunk IDs are derived from the text alone and written with upsert,
+        so re-indexing the same content replaces entries instead of
+        duplicating them.
+        
         Args:
             chunks: List of chunk dictionaries with 'text', 'embedding', 'metadata'
-            deduplicate: Whether to skip duplicate documents
-            
+            deduplicate: Whether to skip texts already added through this
+                instance (repeats within one call always share one ID)
+        
         Returns:
-            Number of documents added
+            Number of documents written
         """
         if not chunks:
             logger.warning("No chunks to add")
             return 0
         
-        # Prepare data for ChromaDB
+        # Prepare data for ChromaDB; embeddings are copied row by row into
+        # one contiguous float32 block once the first reveals the dimension
         ids = []
-        embeddings = []
+        embeddings: Optional[np.ndarray] = None
         documents = []
         metadatas = []
+        hashes = []
         
-        seen_texts = set() if deduplicate else None
+        seen_texts = self._seen_text_hashes
+        pending_hashes = set()
         
         for idx, chunk in enumerate(chunks):
             text = chunk.get('text', '')
@@ -91,42 +166,61 @@ class VectorStore:
             if not text:
                 continue
             
-            if not embedding:
+            if embedding is None or len(embedding) == 0:
                 logger.warning(f"Skipping chunk {idx} - no embedding")
                 continue
             
-            # Deduplication check
-            if deduplicate:
-                text_hash = hash(text)
-                if text_hash in seen_texts:
-                    logger.debug(f"Skipping duplicate chunk {idx}")
-                    continue
-                seen_texts.add(text_hash)
+            # Deduplication check; one upsert call can't repeat an ID
+            text_hash = content_hash(text)
+            if text_hash in pending_hashes or (deduplicate and text_hash in seen_texts):
+                logger.debug(f"Skipping duplicate chunk {idx}")
+                continue
+            pending_hashes.add(text_hash)
             
-            # Generate unique ID
-            chunk_id = f"chunk_{idx}_{hash(text) % 1000000}"
+            # Content-addressed ID: the same text maps to the same entry
+            # in every run
+            chunk_id = f"c_{text_hash}"
             
+            if embeddings is None:
+                embeddings = np.empty((len(chunks), len(embedding)), dtype=np.float32)
+            embeddings[len(ids)] = embedding
             ids.append(chunk_id)
-            embeddings.append(embedding)
+            hashes.append(text_hash)
             documents.append(text)
             metadatas.append(metadata)
         
-        # Add to collection
+        # Normalize once at ingest (one vectorized call) so cosine
+        # similarity reduces to a dot product at query time
+        if ids:
+            embeddings = normalize_rows(embeddings[:len(ids)])
+        
+        # Write to the collection in bounded batches so a large ingest
+        # doesn't build one huge write and earlier batches are durable on
+        # failure
+        added = 0
         try:
-            self.collection.add(
-                ids=ids,
-                embeddings=embeddings,
-                documents=documents,
-                metadatas=metadatas
-            )
-            logger.info(f"Added {len(ids)} documents to collection")
-            return len(ids)
+            for start in range(0, len(ids), ADD_BATCH_SIZE):
+                batch = slice(start, start + ADD_BATCH_SIZE)
+                self.collection.upsert(
+                    ids=ids[batch],
+                    embeddings=embeddings[batch],
+                    documents=documents[batch],
+                    metadatas=metadatas[batch]
+                )
+                self._invalidate_snapshot()
+                if deduplicate:
+                    seen_texts.update(hashes[batch])
+                added += len(ids[batch])
+                logger.info(f"Added {added}/{len(ids)} documents to collection")
+            return added
         except Exception as e:
-            logger.error(f"Error adding documents: {e}")
+            logger.error(f"Error adding documents after {added}/{len(ids)}: {e}")
             raise
     
     def clear_collection(self):
         """Clear all documents from the collection."""
+        self._invalidate_snapshot()
+        self._seen_text_hashes.clear()
         try:
             # Delete the collection completely
             self.client.delete_collection(name=self.collection_name)
@@ -138,7 +232,7 @@ class VectorStore:
         try:
             self.collection = self.client.create_collection(
                 name=self.collection_name,
-                metadata={"hnsw:space": "cosine"}
+                metadata=COLLECTION_METADATA
             )
             logger.info("Created fresh collection")
         except Exception as e:
@@ -171,11 +265,7 @@ class VectorStore:
         Returns:
             True if collection has documents, False otherwise
         """
-        try:
-            count = self.collection.count()
-            return count > 0
-        except Exception:
-            return False
+        return self.get_collection_stats().get('document_count', 0) > 0
     
     def get_sample_documents(self, n: int = 5) -> List[Dict]:
         """
@@ -183,7 +273,7 @@ class VectorStore:
         
         Args:
             n: Number of samples to retrieve
-            
+        
         Returns:
             List of sample documents with metadata
         """
@@ -207,7 +297,8 @@ class VectorStore:
         self,
         query_embedding: List[float],
         n_results: int = 5,
-        where: Optional[Dict] = None
+        where: Optional[Dict] = None,
+        include_embeddings: bool = False
     ) -> Dict:
         """
         Search the collection with optional metadata filtering.
@@ -216,20 +307,293 @@ class VectorStore:
             query_embedding: Query embedding vector
             n_results: Number of results to return
             where: Metadata filter dictionary
-            
+            include_embeddings: Also return the stored embedding of each hit
+        
         Returns:
             Search results with documents, metadatas, distances, and ids
+            (plus embeddings if requested)
         """
+        include = ["documents", "metadatas", "distances"]
+        if include_embeddings:
+            include.append("embeddings")
+        
         try:
             results = self.collection.query(
                 query_embeddings=[query_embedding],
                 n_results=n_results,
-                where=where
+                where=where,
+                include=include
             )
             return results
         except Exception as e:
             logger.error(f"Error searching collection: {e}")
             return {}
+    
+    @property
+    def embeddings_normalized(self) -> bool:
+        """Whether every stored embedding is unit-length."""
+        return bool((self.collection.metadata or {}).get(NORMALIZED_METADATA_KEY))
+    
+    def _invalidate_snapshot(self):
+        """Drop the in-memory snapshot and its on-disk int8 copy."""
+        self._snapshot = None
+        if self._snapshot_cache_dir.exists():
+            shutil.rmtree(self._snapshot_cache_dir, ignore_errors=True)
+    
+    def _save_snapshot_cache(self, snapshot: Dict):
+        """Persist the int8 snapshot arrays next to the collection."""
+        try:
+            self._snapshot_cache_dir.mkdir(parents=True, exist_ok=True)
+            for name in SNAPSHOT_CACHE_ARRAYS:
+                values = np.asarray(snapshot[name])
+                np.save(self._snapshot_cache_dir / f"{name}.npy", values)
+        except Exception as e:
+            logger.warning(f"Could not save snapshot cache: {e}")
+    
+    def _load_snapshot_cache(self, ids: List[str]) -> Optional[Dict]:
+        """
+        Load the on-disk int8 snapshot if it matches the collection.
+        
+        Args:
+            ids: Current collection IDs, in collection order
+        
+        Returns:
+            Dictionary of memory-mapped arrays, or None if missing or stale
+        """
+        try:
+            cached = {
+                name: np.load(self._snapshot_cache_dir / f"{name}.npy", mmap_mode='r')
+                for name in SNAPSHOT_CACHE_ARRAYS
+            }
+        except (OSError, ValueError):
+            return None
+        
+        if cached['ids'].tolist() != ids:
+            return None
+        return cached
+    
+    def _fetch_collection(self, include: List[str]) -> Dict[str, List]:
+        """Read the whole collection in SNAPSHOT_BATCH_SIZE batches."""
+        fetched = {'ids': [], **{field: [] for field in include}}
+        offset = 0
+        while True:
+            batch = self.collection.get(
+                limit=SNAPSHOT_BATCH_SIZE,
+                offset=offset,
+                include=include
+            )
+            if not batch['ids']:
+                break
+            for field in fetched:
+                fetched[field].extend(batch[field])
+            offset += len(batch['ids'])
+        return fetched
+    
+    def _load_snapshot(self) -> Dict:
+        """
+        Load the collection into memory with compact first-pass embeddings.
+        
+        With quantize_embeddings set, the int8 vectors are also saved as
+        .npy files beside the collection; later loads memory-map them and
+        fetch only documents and metadata from ChromaDB.
+        
+        Returns:
+            Dictionary with ids, documents, metadatas, packed sign-bit codes,
+            FIRST_PASS_DIMS-truncated vectors and unit-normalized full
+            vectors (int8 codes plus per-vector scales when
+            quantize_embeddings is set, float32 otherwise)
+        """
+        cached = None
+        if self.quantize_embeddings and self._snapshot_cache_dir.exists():
+            fetched = self._fetch_collection(["documents", "metadatas"])
+            cached = self._load_snapshot_cache(fetched['ids'])
+        if cached is None:
+            fetched = self._fetch_collection(["embeddings", "documents", "metadatas"])
+        
+        ids = fetched['ids']
+        snapshot = {
+            'ids': ids,
+            'documents': fetched['documents'],
+            'metadatas': fetched['metadatas'],
+            'codes': None,
+            'truncated': None,
+            'vectors': None,
+            'int8_vectors': None,
+            'int8_scales': None
+        }
+        
+        if cached is not None:
+            snapshot['codes'] = cached['codes']
+            snapshot['int8_vectors'] = cached['int8_vectors']
+            snapshot['int8_scales'] = cached['int8_scales']
+            # The truncated first pass tolerates int8 rounding error
+            dequantized = cached['int8_vectors'][:, :FIRST_PASS_DIMS] * cached['int8_scales'][:, None]
+            snapshot['truncated'] = truncate_embeddings(dequantized, FIRST_PASS_DIMS)
+        elif ids:
+            vectors = np.asarray(fetched['embeddings'], dtype=np.float32)
+            if not self.embeddings_normalized:
+                vectors = normalize_rows(vectors)
+            snapshot['codes'] = binarize(vectors)
+            snapshot['truncated'] = truncate_embeddings(vectors, FIRST_PASS_DIMS)
+            if self.quantize_embeddings:
+                snapshot['int8_vectors'], snapshot['int8_scales'] = quantize_int8(vectors)
+                self._save_snapshot_cache(snapshot)
+            else:
+                snapshot['vectors'] = vectors
+        
+        # Publish only once fully built; readers check it without the lock
+        self._snapshot = snapshot
+        source = "on-disk int8 cache" if cached is not None else "collection"
+        logger.info(f"Loaded {len(ids)} documents into search snapshot from {source}")
+        return self._snapshot
+    
+    def _get_snapshot(self) -> Dict:
+        """Return the in-memory snapshot, building it on first use."""
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        with self._snapshot_lock:
+            if self._snapshot is None:
+                self._load_snapshot()
+            return self._snapshot
+    
+    def prewarm(self, build_snapshot: bool = False) -> int:
+        """
+        Load the index into memory ahead of the first query.
+        
+        A one-result query makes ChromaDB load its HNSW index and pulls the
+        segment files into the OS page cache, avoiding cold reads on the
+        first real search. The snapshot used by search_snapshot() is only
+        worth its RAM and disk cache for the "binary" and "truncated"
+        search modes, so it is built only on request.
+        
+        Args:
+            build_snapshot: Also read the full collection into the
+                quantized snapshot
+        
+        Returns:
+            Number of documents in the collection
+        """
+        try:
+            if build_snapshot:
+                count = len(self._get_snapshot()['ids'])
+            else:
+                count = self.collection.count()
+                sample = self.collection.get(limit=1, include=["embeddings"])
+                if len(sample['embeddings']):
+                    self.collection.query(query_embeddings=[sample['embeddings'][0]], n_results=1)
+            logger.info(f"Prewarmed {count} vectors")
+            return count
+        except Exception as e:
+            logger.warning(f"Error prewarming vector store: {e}")
+            return 0
+    
+    def search_snapshot(
+        self,
+        query_embedding: List[float],
+        n_results: int = 5,
+        rerank_candidates: int = RERANK_CANDIDATES,
+        first_pass: str = "binary",
+        include_embeddings: bool = False
+    ) -> Dict:
+        """
+        Two-stage search over the in-memory snapshot.
+        
+        A cheap first pass over the whole collection picks a shortlist,
+        which is then reranked by cosine similarity on the full vectors
+        (int8 dot products with int32 accumulation when
+        quantize_embeddings is set, float32 otherwise). First passes:
+        
+        - "binary": Hamming distance on sign-bit codes (32x smaller)
+        - "truncated": cosine on FIRST_PASS_DIMS-dim Matryoshka prefixes
+        
+        Args:
+            query_embedding: Query embedding vector
+            n_results: Number of results to return
+            rerank_candidates: Shortlist size from the first pass
+            first_pass: First-pass strategy, one of FIRST_PASS_MODES
+            include_embeddings: Also return each hit's unit-length vector
+                (dequantized when the snapshot is int8)
+        
+        Returns:
+            Search results in the same nested format as search()
+        """
+        if first_pass not in FIRST_PASS_MODES:
+            raise ValueError(f"first_pass must be one of {FIRST_PASS_MODES}, got {first_pass!r}")
+        
+        try:
+            snapshot = self._get_snapshot()
+            if not snapshot['ids']:
+                return {}
+            
+            query = normalize_rows(np.asarray([query_embedding], dtype=np.float32))[0]
+            total = len(snapshot['ids'])
+            n_candidates = min(max(rerank_candidates, n_results), total)
+            
+            # First pass over compact representations (lower is closer)
+            if first_pass == "binary":
+                distances = hamming_distances(snapshot['codes'], binarize(query))
+            else:
+                distances = -(snapshot['truncated'] @ truncate_embeddings(query, FIRST_PASS_DIMS))
+            if n_candidates < total:
+                candidates = np.argpartition(distances, n_candidates - 1)[:n_candidates]
+            else:
+                candidates = np.arange(total)
+            
+            # Cosine rerank of the shortlist
+            if snapshot['int8_vectors'] is not None:
+                query_codes, query_scales = quantize_int8(query[None, :])
+                similarities = int8_dot(
+                    snapshot['int8_vectors'][candidates],
+                    snapshot['int8_scales'][candidates],
+                    query_codes[0],
+                    query_scales[0]
+                )
+            else:
+                similarities = snapshot['vectors'][candidates] @ query
+            order = np.argsort(-similarities)[:n_results]
+            top = candidates[order]
+            
+            results = {
+                'ids': [[snapshot['ids'][i] for i in top]],
+                'documents': [[snapshot['documents'][i] for i in top]],
+                'metadatas': [[snapshot['metadatas'][i] for i in top]],
+                'distances': [[float(1.0 - similarities[j]) for j in order]]
+            }
+            if include_embeddings:
+                if snapshot['int8_vectors'] is not None:
+                    vectors = snapshot['int8_vectors'][top] * snapshot['int8_scales'][top][:, None]
+                else:
+                    vectors = snapshot['vectors'][top]
+                results['embeddings'] = [vectors]
+            return results
+        except Exception as e:
+            logger.error(f"Error in snapshot search: {e}")
+            return {}
+    
+    def search_binary(
+        self,
+        query_embedding: List[float],
+        n_results: int = 5,
+        rerank_candidates: int = RERANK_CANDIDATES
+    ) -> Dict:
+        """
+        Search with a binary Hamming first pass and cosine rerank.
+        
+        Args:
+            query_embedding: Query embedding vector
+            n_results: Number of results to return
+            rerank_candidates: Shortlist size from the Hamming first pass
+        
+        Returns:
+            Search results in the same nested format as search()
+        """
+        return self.search_snapshot(
+            query_embedding,
+            n_results=n_results,
+            rerank_candidates=rerank_candidates,
+            first_pass="binary"
+        )
 
 
 def initialize_vector_store(
@@ -242,7 +606,7 @@ def initialize_vector_store(
     Args:
         persist_directory: Directory to persist ChromaDB data
         collection_name: Name of the collection
-        
+    
     Returns:
         Initialized VectorStore instance
     """
@@ -0,0 +1,14 @@
+"""
+Shared pytest fixtures.
+"""
+
+from unittest.mock import patch
+
+import pytest
+
+
+@pytest.fixture(scope="session", autouse=True)
+def mock_llm_class():
+    """Stand in for the Gemini chat client so no test can reach the API."""
+    with patch('src.chain.ChatGoogleGenerativeAI') as llm_class:
+        yield llm_class
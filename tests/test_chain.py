@@ -2,13 +2,15 @@
 Tests for the RAG chain module.
 """
 
-import os
-from unittest.mock import Mock, patch
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock, create_autospec, patch
 
 import pytest
 
-from src.chain import RAGChain
+from src.chain import MAX_CONVERSATION_HISTORY, RAGChain
 from src.retriever import Retriever
+from src.semantic_cache import SemanticCache
 from src.vector_store import VectorStore
 
 
@@ -18,7 +20,7 @@ class TestChain:
     @pytest.fixture
     def mock_retriever(self):
         """Create a mock retriever."""
-        retriever = Mock(spec=Retriever)
+        retriever = create_autospec(Retriever, instance=True, spec_set=True)
         retriever.retrieve.return_value = [
             {
                 'text': 'Test documentation content',
@@ -35,17 +37,13 @@ class TestChain:
     @pytest.fixture
     def chain(self, mock_retriever):
         """Create a chain instance with mocked LLM."""
-        with patch('src.chain.ChatGoogleGenerativeAI') as mock_llm_class:
-            mock_llm = Mock()
-            mock_response = Mock()
-            mock_response.content = "Test response from LLM"
-            mock_llm.invoke.return_value = mock_response
-            mock_llm_class.return_value = mock_llm
-            
-            with patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key'}):
-                chain = RAGChain(mock_retriever, api_key='test_key')
-                chain.llm = mock_llm
-                return chain
+        # The Gemini client class itself is patched for the session (conftest.py)
+        mock_llm = Mock()
+        mock_llm.invoke.return_value = SimpleNamespace(content="Test response from LLM")
+        
+        chain = RAGChain(mock_retriever, api_key='test_key')
+        chain.llm = mock_llm
+        return chain
     
     def test_chain_produces_responses(self, chain, mock_retriever):
         """Test that chain produces responses."""
@@ -70,6 +68,24 @@ class TestChain:
         assert chain.conversation_history[0]['content'] == "What is Python?"
         assert chain.conversation_history[2]['content'] == "Tell me more"
     
+    def test_conversation_history_is_bounded(self, chain):
+        """Test that old exchanges are evicted once history is full."""
+        for i in range(MAX_CONVERSATION_HISTORY + 2):
+            chain.invoke(f"Question {i}")
+        
+        assert len(chain.conversation_history) == MAX_CONVERSATION_HISTORY * 2
+        assert chain.conversation_history[0]['content'] == "Question 2"
+    
+    def test_prompt_messages(self, chain):
+        """Test that prompts embed context and question and share the system message."""
+        first = chain._create_prompt_messages("Context {with braces}", "What is a list?")
+        second = chain._create_prompt_messages("Other context", "What is a dict?")
+        
+        assert first[0] is second[0]
+        assert "Context {with braces}" in first[1].content
+        assert "What is a list?" in first[1].content
+        assert "{question}" not in second[1].content
+    
     def test_source_attribution(self, chain, mock_retriever):
         """Test that source attribution is included."""
         result = chain.invoke("Test question")
@@ -98,6 +114,111 @@ class TestChain:
         for key in required_keys:
             assert key in result, f"Missing key: {key}"
     
+    def test_stage_timings_reported(self, chain, mock_retriever):
+        """Test that retrieval and generation times are measured."""
+        result = chain.invoke("Test question")
+        
+        assert result['retrieval_time'] >= 0.0
+        assert result['generation_time'] >= 0.0
+        assert result['retrieval_time'] + result['generation_time'] <= result['response_time']
+    
+    def test_invoke_stream_yields_chunks_then_result(self, chain):
+        """Test that streamed chunks arrive before the final result dict."""
+        chain.llm.stream.return_value = iter([Mock(content="Hello"), Mock(content=", world")])
+        
+        items = list(chain.invoke_stream("Test question"))
+        
+        assert items[:2] == ["Hello", ", world"]
+        assert items[-1]['answer'] == "Hello, world"
+        assert chain.conversation_history[-1]['content'] == "Hello, world"
+    
+    def test_stream_flag_returns_joined_answer(self, chain):
+        """Test that invoke(stream=True) returns the complete answer."""
+        chain.llm.stream.return_value = iter([Mock(content="Part one. "), Mock(content="Part two.")])
+        
+        result = chain.invoke("Test question", stream=True)
+        
+        assert result['answer'] == "Part one. Part two."
+        assert 'sources' in result
+    
+    def test_semantic_cache_skips_llm_for_repeat_question(self, chain, mock_retriever, tmp_path):
+        """Test that a near-identical standalone question is answered from the cache."""
+        chain.semantic_cache = SemanticCache(str(tmp_path / "query_cache.json"))
+        mock_retriever.embed_queries.side_effect = [[[1.0, 0.0]], [[0.99, 0.01]]]
+        
+        first = chain.invoke("How do I use lists?")
+        chain.clear_history()
+        second = chain.invoke("python list usage")
+        
+        assert chain.llm.invoke.call_count == 1
+        assert mock_retriever.retrieve.call_count == 1
+        assert second['cached'] is True
+        assert second['answer'] == first['answer']
+        assert second['sources'] == first['sources']
+    
+    def test_semantic_cache_ignores_followups(self, chain, mock_retriever, tmp_path):
+        """Test that follow-up questions bypass the cache."""
+        chain.semantic_cache = SemanticCache(str(tmp_path / "query_cache.json"))
+        mock_retriever.embed_queries.return_value = [[1.0, 0.0]]
+        
+        chain.invoke("How do I use lists?")
+        chain.invoke("How do I use lists?")
+        
+        assert chain.llm.invoke.call_count == 2
+        assert len(chain.semantic_cache) == 1
+    
+    def test_async_invoke(self, chain, mock_retriever):
+        """Test that the async variant produces the same response format."""
+        async_response = Mock()
+        async_response.content = "Async response from LLM"
+        chain.llm.ainvoke = AsyncMock(return_value=async_response)
+        
+        result = asyncio.run(chain.ainvoke("Test question"))
+        
+        assert result['answer'] == "Async response from LLM"
+        assert len(result['sources']) == 1
+        assert len(chain.conversation_history) == 2
+        chain.llm.ainvoke.assert_awaited_once()
+    
+    def test_async_invoke_retries_on_timeout(self, chain, mock_retriever):
+        """Test that a timed-out LLM call is retried once."""
+        async_response = Mock()
+        async_response.content = "Retried response"
+        calls = []
+        
+        async def flaky(messages):
+            calls.append(messages)
+            if len(calls) == 1:
+                await asyncio.sleep(1)
+            return async_response
+        
+        chain.request_timeout = 0.01
+        chain.llm.ainvoke = flaky
+        
+        result = asyncio.run(chain.ainvoke("Test question"))
+        
+        assert result['answer'] == "Retried response"
+        assert len(calls) == 2
+    
+    def test_batch_invoke(self, chain, mock_retriever):
+        """Test that batch queries run independently and keep input order."""
+        async def echo(messages):
+            response = Mock()
+            response.content = f"Answer: {messages[-1].content[-20:]}"
+            return response
+        
+        chain.llm.ainvoke = echo
+        mock_retriever.embed_queries.return_value = [[0.1], [0.2], [0.3]]
+        queries = ["first question", "second question", "third question"]
+        
+        results = chain.batch_invoke(queries, concurrency=2)
+        
+        assert [r['query'] for r in results] == queries
+        assert all('error' not in r for r in results)
+        mock_retriever.embed_queries.assert_called_once_with(queries)
+        assert mock_retriever.retrieve.call_args.kwargs['query_embedding'] in ([0.1], [0.2], [0.3])
+        assert len(chain.conversation_history) == 0
+    
     def test_clear_history(self, chain):
         """Test clearing conversation history."""
         chain.invoke("Question 1")
@@ -118,6 +239,32 @@ class TestChain:
         assert chain.temperature == 0.7
         assert chain.temperature != original_temp
     
+    def test_temperature_update_reuses_client(self, chain):
+        """Test that a temperature change copies the client instead of rebuilding it."""
+        llm = chain.llm
+        
+        with patch('src.chain._build_llm') as mock_build:
+            chain.update_temperature(0.9)
+        
+        llm.model_copy.assert_called_once_with(update={'temperature': 0.9})
+        mock_build.assert_not_called()
+        assert chain.llm is llm.model_copy.return_value
+    
+    def test_resolved_model_remembered(self, chain, mock_retriever, tmp_path):
+        """Test that a working fallback model is tried first by later chains."""
+        chain.llm.invoke.side_effect = Exception("404 model not found")
+        alt_llm = Mock()
+        alt_llm.invoke.return_value = Mock(content="Fallback answer")
+        
+        with patch('src.chain.RESOLVED_MODEL_CACHE', tmp_path / "resolved_model.json"), \
+                patch('src.chain._build_llm', return_value=alt_llm) as mock_build:
+            result = chain.invoke("Test question")
+            new_chain = RAGChain(mock_retriever, api_key='test_key')
+        
+        assert result['answer'] == "Fallback answer"
+        assert new_chain.model_name == chain.model_name
+        assert mock_build.call_args.args[0] == chain.model_name
+    
     def test_no_context_handling(self, chain, mock_retriever):
         """Test handling when no context is retrieved."""
         mock_retriever.retrieve.return_value = []
@@ -0,0 +1,149 @@
+"""
+Tests for the chunker module.
+"""
+
+from unittest.mock import Mock, patch
+
+import pytest
+
+from src.chunker import (
+    _fast_split,
+    _get_encoding,
+    chunk_documents,
+    deduplicate_chunks,
+    count_chunk_tokens,
+    count_tokens,
+    iter_chunk_documents
+)
+
+
+class TestChunker:
+    """Test cases for chunking and token counting."""
+    
+    @pytest.fixture
+    def documents(self):
+        """Create sample documents."""
+        return [
+            {
+                'content': "This is a test document. " * 100,
+                'url': 'https://example.com/one',
+                'title': 'First Document'
+            },
+            {
+                'content': "",
+                'url': 'https://example.com/empty',
+                'title': 'Empty Document'
+            },
+            {
+                'content': "A short second document.",
+                'url': 'https://example.com/two',
+                'title': 'Second Document'
+            }
+        ]
+    
+    def test_iter_chunk_documents_yields_per_document(self, documents):
+        """Test that chunks are yielded one document at a time, skipping empty ones."""
+        per_document = list(iter_chunk_documents(documents, chunk_size=200, chunk_overlap=20))
+        
+        assert len(per_document) == 2
+        assert {c['metadata']['title'] for c in per_document[0]} == {'First Document'}
+        assert per_document[1][0]['metadata']['document_index'] == 2
+        assert chunk_documents(documents, chunk_size=200, chunk_overlap=20) == [
+            chunk for doc_chunks in per_document for chunk in doc_chunks
+        ]
+    
+    @pytest.mark.parametrize("use_fast_splitter", [True, False])
+    def test_chunks_respect_size(self, documents, use_fast_splitter):
+        """Test that no chunk exceeds the configured size with either splitter."""
+        chunks = chunk_documents(
+            documents,
+            chunk_size=200,
+            chunk_overlap=20,
+            use_fast_splitter=use_fast_splitter
+        )
+        
+        assert all(len(chunk['text']) <= 200 for chunk in chunks)
+        assert all(c['metadata']['chunk_size'] == len(c['text']) for c in chunks)
+    
+    def test_fast_split_prefers_paragraph_breaks(self):
+        """Test that the fast splitter breaks on the highest-priority separator."""
+        text = "First paragraph here.\n\nSecond paragraph. It has two sentences."
+        
+        chunks = _fast_split(text, chunk_size=40, chunk_overlap=0)
+        
+        assert chunks[0] == "First paragraph here."
+        assert chunks[1].startswith("Second paragraph.")
+        assert all(len(chunk) <= 40 for chunk in chunks)
+    
+    def test_fast_split_overlaps_and_covers_text(self):
+        """Test that adjacent chunks overlap on word boundaries and nothing is lost."""
+        words = [f"word{i}" for i in range(300)]
+        text = " ".join(words)
+        
+        chunks = _fast_split(text, chunk_size=100, chunk_overlap=30)
+        
+        assert all(len(chunk) <= 100 for chunk in chunks)
+        assert all(chunk.split()[0] in words for chunk in chunks)
+        for previous, current in zip(chunks, chunks[1:]):
+            assert current.split()[0] in previous.split()
+        assert {w for chunk in chunks for w in chunk.split()} == set(words)
+    
+    def test_fast_split_hard_cuts_unbroken_text(self):
+        """Test that text without separators is cut at chunk_size."""
+        chunks = _fast_split("x" * 250, chunk_size=100, chunk_overlap=0)
+        
+        assert [len(chunk) for chunk in chunks] == [100, 100, 50]
+    
+    def test_deduplicate_chunks_merges_sources(self):
+        """Test that repeated text is dropped and its sources recorded once."""
+        def chunk(text, url):
+            return {'text': text, 'metadata': {'source_url': url}}
+        
+        seen = {}
+        first = deduplicate_chunks([chunk("Deprecated since 3.8", "a"), chunk("Unique", "a")], seen)
+        second = deduplicate_chunks([chunk("deprecated   since 3.8", "b"), chunk("Deprecated since 3.8", "b")], seen)
+        
+        assert [c['text'] for c in first] == ["Deprecated since 3.8", "Unique"]
+        assert second == []
+        assert first[0]['metadata']['source_urls'] == "a b"
+        assert 'source_urls' not in first[1]['metadata']
+    
+    @pytest.fixture
+    def mock_encoding(self):
+        """Patch tiktoken with a whitespace tokenizer (no BPE download)."""
+        _get_encoding.cache_clear()
+        encoding = Mock()
+        encoding.encode.side_effect = lambda text: text.split()
+        encoding.encode_batch.side_effect = (
+            lambda texts, num_threads: [text.split() for text in texts]
+        )
+        with patch('src.chunker.tiktoken.encoding_for_model', return_value=encoding) as mock_load:
+            yield mock_load
+        _get_encoding.cache_clear()
+    
+    def test_encoding_loaded_once(self, mock_encoding):
+        """Test that the tokenizer is loaded once per model, not per call."""
+        counts = [count_tokens("hello world") for _ in range(3)]
+        
+        assert counts == [2, 2, 2]
+        assert mock_encoding.call_count == 1
+    
+    def test_count_chunk_tokens(self, mock_encoding):
+        """Test token statistics over several chunks."""
+        chunks = [{'text': "one two three"}, {'text': "one"}]
+        
+        stats = count_chunk_tokens(chunks)
+        encoding = mock_encoding.return_value
+        
+        assert stats['total_chunks'] == 2
+        assert stats['total_tokens'] == 4
+        assert stats['avg_tokens'] == 2
+        assert stats['min_tokens'] == 1
+        assert stats['max_tokens'] == 3
+        assert encoding.encode_batch.call_count == 1
+        encoding.encode.assert_not_called()
+        assert count_chunk_tokens([])['total_tokens'] == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,134 @@
+"""
+Tests for the persistent embedding cache.
+"""
+
+import sqlite3
+
+import numpy as np
+import pytest
+
+from src.embedding_cache import XXHASH_AVAILABLE, EmbeddingCache
+
+if XXHASH_AVAILABLE:
+    import xxhash
+
+
+class TestEmbeddingCache:
+    """Test cases for embedding cache functionality."""
+    
+    @pytest.fixture
+    def cache(self, tmp_path):
+        """Create a cache backed by a temporary database."""
+        cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite3"))
+        yield cache
+        cache.close()
+    
+    def test_round_trip(self, cache):
+        """Test that stored embeddings are returned on lookup."""
+        key = EmbeddingCache.key_for("some text")
+        cache.put(key, [0.25, -0.5, 1.0])
+        
+        assert cache.get(key).tolist() == [0.25, -0.5, 1.0]
+        assert len(cache) == 1
+    
+    def test_batched_round_trip(self, cache):
+        """Test that put_many/get_many store and find many keys at once."""
+        keys = [EmbeddingCache.key_for(f"text {i}") for i in range(1200)]
+        cache.put_many((key, [float(i)]) for i, key in enumerate(keys))
+        
+        found = cache.get_many(keys + [EmbeddingCache.key_for("missing")])
+        
+        assert len(found) == 1200
+        assert found[keys[1100]].tolist() == [1100.0]
+    
+    def test_repeat_lookups_served_from_memory(self, cache):
+        """Test that repeat lookups hit the in-memory LRU instead of SQLite."""
+        key = EmbeddingCache.key_for("hot text")
+        cache.put(key, [1.0, 2.0])
+        cache.close()
+        
+        # Served without touching the (now closed) database
+        assert cache.get(key).tolist() == [1.0, 2.0]
+        assert cache.get_many([key])[key].tolist() == [1.0, 2.0]
+        assert cache.stats()['memory_hits'] == 2
+    
+    def test_memory_tier_evicts_least_recently_used(self, tmp_path):
+        """Test that the in-memory LRU keeps at most memory_size vectors."""
+        cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite3"), memory_size=2)
+        keys = [EmbeddingCache.key_for(f"text {i}") for i in range(3)]
+        cache.put(keys[0], [0.0])
+        cache.put(keys[1], [1.0])
+        cache.get(keys[0])
+        cache.put(keys[2], [2.0])
+        
+        assert cache.stats()['memory_entries'] == 2
+        assert cache.get(keys[1]).tolist() == [1.0]
+        assert cache.stats()['disk_hits'] == 1
+        cache.close()
+    
+    def test_miss_returns_none(self, cache):
+        """Test that unknown keys are cache misses."""
+        assert cache.get(EmbeddingCache.key_for("never stored")) is None
+    
+    def test_persists_across_instances(self, tmp_path):
+        """Test that embeddings survive reopening the database."""
+        path = str(tmp_path / "embeddings.sqlite3")
+        key = EmbeddingCache.key_for("persistent text")
+        
+        first = EmbeddingCache(path)
+        first.put(key, [1.0, 2.0])
+        first.close()
+        
+        second = EmbeddingCache(path)
+        assert second.get(key).tolist() == [1.0, 2.0]
+        second.close()
+    
+    @pytest.mark.parametrize("precision,atol,blob_size", [
+        ("float32", 0.0, 256),
+        ("float16", 1e-3, 128),
+        ("int8", 1e-2, 68)
+    ])
+    def test_precisions_round_trip(self, tmp_path, precision, atol, blob_size):
+        """Test that each storage format round-trips within its precision."""
+        vector = np.random.default_rng(0).uniform(-1, 1, 64).astype(np.float32)
+        cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite3"), memory_size=0, precision=precision)
+        key = EmbeddingCache.key_for("quantized text")
+        cache.put(key, vector)
+        
+        blob = cache._conn.execute("SELECT vec FROM embeddings").fetchone()[0]
+        
+        assert len(blob) == blob_size
+        np.testing.assert_allclose(cache.get(key), vector, atol=atol)
+        cache.close()
+    
+    def test_float32_database_upgraded_in_place(self, tmp_path):
+        """Test that databases without a dtype column keep serving float32 rows."""
+        path = tmp_path / "embeddings.sqlite3"
+        key = EmbeddingCache.key_for("old row")
+        conn = sqlite3.connect(str(path))
+        conn.execute("CREATE TABLE embeddings (sha256 TEXT PRIMARY KEY, vec BLOB NOT NULL)")
+        conn.execute(
+            "INSERT INTO embeddings VALUES (?, ?)",
+            (key, np.array([0.1, 0.2], dtype=np.float32).tobytes())
+        )
+        conn.commit()
+        conn.close()
+        
+        cache = EmbeddingCache(str(path))
+        
+        assert cache.get(key).tolist() == np.array([0.1, 0.2], dtype=np.float32).tolist()
+        cache.close()
+    
+    def test_keys_are_stable_digests(self):
+        """Test that keys are XXH3-128 digests, with SHA-256 as the legacy key."""
+        assert EmbeddingCache.legacy_key_for("abc") == (
+            "ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad"
+        )
+        if XXHASH_AVAILABLE:
+            assert EmbeddingCache.key_for("abc") == xxhash.xxh3_128_hexdigest(b"abc")
+        else:
+            assert EmbeddingCache.key_for("abc") == EmbeddingCache.legacy_key_for("abc")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
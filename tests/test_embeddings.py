@@ -0,0 +1,204 @@
+"""
+Tests for the embedding generation module.
+"""
+
+import hashlib
+import json
+import time
+from unittest.mock import Mock, patch
+
+import numpy as np
+import pytest
+
+from src.embedding_cache import EmbeddingCache
+from src.embeddings import BATCH_SIZE, DOCUMENT_TASK_TYPE, LOCAL_BATCH_SIZE, EmbeddingGenerator
+
+
+class TestEmbeddingGenerator:
+    """Test cases for embedding generation."""
+    
+    @pytest.fixture
+    def generator(self, tmp_path):
+        """Create a generator with a mocked Gemini model and no local model."""
+        with patch('src.embeddings.SentenceTransformer', side_effect=OSError("offline")), \
+                patch('src.embeddings.GoogleGenerativeAIEmbeddings') as mock_gemini:
+            generator = EmbeddingGenerator(
+                api_key="test-key",
+                cache_dir=str(tmp_path / "cache")
+            )
+        generator.gemini_model = mock_gemini.return_value
+        yield generator
+        generator.cache.close()
+    
+    def test_texts_sent_as_batched_requests(self, generator):
+        """Test that uncached texts are embedded with batched document requests."""
+        generator.gemini_model.embed_documents.side_effect = (
+            lambda texts, **kwargs: [[float(len(text))] for text in texts]
+        )
+        
+        chunks = generator.generate_embeddings([{'text': 'a'}, {'text': 'bb'}], show_progress=False)
+        
+        assert [chunk['embedding'] for chunk in chunks] == [[1.0], [2.0]]
+        generator.gemini_model.embed_documents.assert_called_once_with(
+            ['a', 'bb'],
+            batch_size=BATCH_SIZE,
+            task_type=DOCUMENT_TASK_TYPE
+        )
+    
+    def test_duplicate_texts_embedded_once(self, generator):
+        """Test that repeated texts in one call are sent once and broadcast."""
+        generator.gemini_model.embed_documents.side_effect = (
+            lambda texts, **kwargs: [[float(len(text))] for text in texts]
+        )
+        
+        chunks = generator.generate_embeddings(
+            [{'text': 'a'}, {'text': 'bb'}, {'text': 'a'}],
+            show_progress=False
+        )
+        
+        assert [chunk['embedding'] for chunk in chunks] == [[1.0], [2.0], [1.0]]
+        assert generator.gemini_model.embed_documents.call_args.args[0] == ['a', 'bb']
+    
+    def test_iter_yields_cached_first_without_mutating(self, generator):
+        """Test that the streaming API yields cached hits before new batches."""
+        generator.cache.put(generator._get_cache_key('cached'), [0.5])
+        generator.gemini_model.embed_documents.side_effect = (
+            lambda texts, **kwargs: [[float(len(text))] for text in texts]
+        )
+        chunks = [{'text': 'new'}, {'text': 'cached'}]
+        
+        pairs = list(generator.generate_embeddings_iter(chunks, show_progress=False))
+        
+        assert pairs == [(1, [0.5]), (0, [3.0])]
+        assert all('embedding' not in chunk for chunk in chunks)
+    
+    def test_repeated_text_set_served_from_batch_cache(self, generator):
+        """Test that the same small set of texts, in any order, skips per-text lookups."""
+        generator.gemini_model.embed_documents.side_effect = (
+            lambda texts, **kwargs: [[float(len(text))] for text in texts]
+        )
+        generator.generate_embeddings([{'text': 'a'}, {'text': 'bb'}], show_progress=False)
+        
+        with patch.object(generator, '_load_many_from_cache') as mock_load:
+            chunks = generator.generate_embeddings([{'text': 'bb'}, {'text': 'a'}], show_progress=False)
+        
+        mock_load.assert_not_called()
+        assert [chunk['embedding'] for chunk in chunks] == [[2.0], [1.0]]
+        generator.gemini_model.embed_documents.assert_called_once()
+    
+    def test_concurrent_batches_keep_chunk_order(self, generator):
+        """Test that batches finishing out of order are reassembled by index."""
+        def embed(texts, **kwargs):
+            # Earlier batches finish last
+            time.sleep(0.05 / len(texts[0]))
+            return [[float(len(text))] for text in texts]
+        
+        generator.gemini_model.embed_documents.side_effect = embed
+        chunks = [{'text': 'x' * length} for length in range(1, 9)]
+        
+        result = generator.generate_embeddings(chunks, batch_size=2, show_progress=False)
+        
+        assert [chunk['embedding'] for chunk in result] == [[float(n)] for n in range(1, 9)]
+        assert generator.gemini_model.embed_documents.call_count == 4
+    
+    def test_max_concurrent_batches_bounds_workers(self, generator):
+        """Test that no more than max_concurrent_batches requests overlap."""
+        active = []
+        peak = []
+        
+        def embed(texts, **kwargs):
+            active.append(1)
+            peak.append(len(active))
+            time.sleep(0.02)
+            active.pop()
+            return [[1.0]] * len(texts)
+        
+        generator.max_concurrent_batches = 2
+        generator.gemini_model.embed_documents.side_effect = embed
+        
+        generator.generate_embeddings([{'text': str(i)} for i in range(8)], batch_size=1, show_progress=False)
+        
+        assert max(peak) <= 2
+    
+    def test_requests_drawn_from_rate_limiter(self, generator):
+        """Test that each Gemini request takes one token per text."""
+        generator.gemini_model.embed_documents.side_effect = (
+            lambda texts, **kwargs: [[1.0]] * len(texts)
+        )
+        
+        with patch.object(generator.rate_limiter, 'acquire') as mock_acquire:
+            generator.generate_embeddings([{'text': 'a'}, {'text': 'b'}], show_progress=False)
+        
+        mock_acquire.assert_called_once_with(2)
+    
+    def test_failed_batch_falls_back_to_single_texts(self, generator):
+        """Test that one bad text doesn't drop the rest of its batch."""
+        def embed(texts, **kwargs):
+            if len(texts) > 1 or texts[0] == 'bad':
+                raise RuntimeError("invalid content")
+            return [[1.0]]
+        
+        generator.gemini_model.embed_documents.side_effect = embed
+        
+        with patch('src.embeddings.time.sleep'):
+            chunks = generator.generate_embeddings(
+                [{'text': 'good'}, {'text': 'bad'}, {'text': 'fine'}],
+                show_progress=False
+            )
+        
+        assert chunks[0]['embedding'] == [1.0]
+        assert 'embedding' not in chunks[1]
+        assert chunks[2]['embedding'] == [1.0]
+        assert generator.cache.get(generator._get_cache_key('bad')) is None
+    
+    def test_embed_single_uses_single_request_and_cache(self, generator):
+        """Test that one text is embedded with embed_query and then served from cache."""
+        generator.gemini_model.embed_query.return_value = [0.25, 0.5]
+        
+        first = generator.embed_single("python lists")
+        second = generator.embed_single("python lists")
+        
+        assert first == second == [0.25, 0.5]
+        generator.gemini_model.embed_query.assert_called_once_with(
+            "python lists",
+            task_type=DOCUMENT_TASK_TYPE
+        )
+        generator.gemini_model.embed_documents.assert_not_called()
+    
+    def test_local_model_encodes_large_length_sorted_batches(self, generator):
+        """Test that the local model gets whole LOCAL_BATCH_SIZE batches to length-sort."""
+        generator.gemini_model = None
+        generator.local_model = Mock()
+        generator.local_model.encode.side_effect = lambda texts, **kwargs: np.ones((len(texts), 2))
+        chunks = [{'text': 'x' * (i % 7 + 1) + str(i)} for i in range(LOCAL_BATCH_SIZE + 10)]
+        
+        generator.generate_embeddings(chunks, show_progress=False)
+        
+        assert [len(c.args[0]) for c in generator.local_model.encode.call_args_list] == [LOCAL_BATCH_SIZE, 10]
+    
+    def test_legacy_json_cache_is_migrated(self, generator):
+        """Test that legacy MD5-keyed JSON files are served and copied into SQLite."""
+        legacy_key = hashlib.md5('old text'.encode('utf-8')).hexdigest()
+        (generator.cache_dir / f"{legacy_key}.json").write_text(json.dumps({'embedding': [0.5, 0.25]}))
+        generator.gemini_model.embed_documents.side_effect = lambda texts, **kwargs: [[1.0]] * len(texts)
+        
+        chunks = generator.generate_embeddings([{'text': 'old text'}, {'text': 'new text'}], show_progress=False)
+        
+        assert chunks[0]['embedding'] == [0.5, 0.25]
+        generator.gemini_model.embed_documents.assert_called_once()
+        assert generator.gemini_model.embed_documents.call_args.args[0] == ['new text']
+        assert generator.cache.get(generator._get_cache_key('old text')).tolist() == [0.5, 0.25]
+    
+    def test_sha256_keyed_rows_are_migrated(self, generator):
+        """Test that rows stored under the old SHA-256 key are still served."""
+        generator.cache.put(EmbeddingCache.legacy_key_for('old text'), [0.5, 0.25])
+        
+        chunks = generator.generate_embeddings([{'text': 'old text'}], show_progress=False)
+        
+        assert chunks[0]['embedding'] == [0.5, 0.25]
+        generator.gemini_model.embed_documents.assert_not_called()
+        assert generator.cache.get(generator._get_cache_key('old text')).tolist() == [0.5, 0.25]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
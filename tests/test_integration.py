@@ -2,9 +2,9 @@
 Integration tests for the complete RAG system.
 """
 
-import os
 import pytest
-from unittest.mock import Mock, patch
+from types import SimpleNamespace
+from unittest.mock import Mock, create_autospec
 
 from src.chain import RAGChain
 from src.retriever import Retriever
@@ -18,12 +18,12 @@ class TestIntegration:
     def mock_system(self):
         """Create a mock system for testing."""
         # Mock vector store
-        vector_store = Mock(spec=VectorStore)
+        vector_store = create_autospec(VectorStore, instance=True, spec_set=True)
         vector_store.check_if_indexed.return_value = True
         vector_store.get_collection_stats.return_value = {'document_count': 100}
         
         # Mock retriever
-        retriever = Mock(spec=Retriever)
+        retriever = create_autospec(Retriever, instance=True, spec_set=True)
         retriever.retrieve.return_value = [
             {
                 'text': 'Python lists are created using square brackets.',
@@ -37,22 +37,18 @@ class TestIntegration:
         retriever.format_context_for_prompt.return_value = "Context: Python lists..."
         
         # Mock chain
-        with patch('src.chain.ChatGoogleGenerativeAI') as mock_llm_class:
-            mock_llm = Mock()
-            mock_response = Mock()
-            mock_response.content = "You can create a list in Python using square brackets: my_list = [1, 2, 3]"
-            mock_llm.invoke.return_value = mock_response
-            mock_llm_class.return_value = mock_llm
-            
-            with patch.dict(os.environ, {'GOOGLE_API_KEY': 'test_key'}):
-                chain = RAGChain(retriever, api_key='test_key')
-                chain.llm = mock_llm
-                
-                return {
-                    'vector_store': vector_store,
-                    'retriever': retriever,
-                    'chain': chain
-                }
+        # The Gemini client class itself is patched for the session (conftest.py)
+        mock_llm = Mock()
+        mock_llm.invoke.return_value = SimpleNamespace(content="You can create a list in Python using square brackets: my_list = [1, 2, 3]")
+        
+        chain = RAGChain(retriever, api_key='test_key')
+        chain.llm = mock_llm
+        
+        return {
+            'vector_store': vector_store,
+            'retriever': retriever,
+            'chain': chain
+        }
     
     def test_end_to_end_query(self, mock_system):
         """Test complete flow from query to response."""
@@ -92,24 +88,21 @@ class TestIntegration:
         # Verify conversation history
         assert len(chain.conversation_history) == len(queries) * 2
     
-    def test_various_question_types(self, mock_system):
+    @pytest.mark.parametrize("question_type", [
+        "What is...",  # Definition
+        "How do I...",  # How-to
+        "What is the difference between...",  # Comparison
+        "Explain...",  # Explanation
+        "Show me an example of...",  # Example request
+    ])
+    def test_various_question_types(self, mock_system, question_type):
         """Test with various question types."""
         chain = mock_system['chain']
         
-        question_types = [
-            "What is...",  # Definition
-            "How do I...",  # How-to
-            "What is the difference between...",  # Comparison
-            "Explain...",  # Explanation
-            "Show me an example of...",  # Example request
-        ]
+        result = chain.invoke(f"{question_type} Python lists")
         
-        for question_type in question_types:
-            query = f"{question_type} Python lists"
-            result = chain.invoke(query)
-            
-            assert 'answer' in result
-            assert result['answer'] is not None
+        assert 'answer' in result
+        assert result['answer'] is not None
     
     def test_performance_benchmark(self, mock_system):
         """Performance benchmarking test."""
@@ -118,20 +111,20 @@ class TestIntegration:
         chain = mock_system['chain']
         query = "Test query for performance"
         
-        times = []
+        times_ns = []
+        results = []
         for _ in range(5):
-            start = time.time()
-            result = chain.invoke(query)
-            elapsed = time.time() - start
-            times.append(elapsed)
+            start = time.perf_counter_ns()
+            results.append(chain.invoke(query))
+            times_ns.append(time.perf_counter_ns() - start)
         
-        avg_time = sum(times) / len(times)
+        avg_ns = sum(times_ns) // len(times_ns)
         
         # Verify reasonable performance (mock should be fast)
-        assert avg_time < 5.0  # Should be very fast with mocks
+        assert avg_ns < 5_000_000_000  # Under 5s; should be very fast with mocks
         
         # Verify all queries succeeded
-        assert all('answer' in chain.invoke(query) for _ in range(3))
+        assert all('answer' in result for result in results)
     
     def test_error_recovery(self, mock_system):
         """Test system recovery from errors."""
@@ -0,0 +1,58 @@
+"""
+Tests for the token-bucket rate limiter.
+"""
+
+from unittest.mock import patch
+
+import pytest
+
+from src.rate_limiter import TokenBucket
+
+
+class TestTokenBucket:
+    """Test cases for token bucket rate limiting."""
+    
+    @pytest.fixture
+    def clock(self):
+        """Patch the limiter's clock so sleeping advances time instantly."""
+        now = [0.0]
+        
+        def sleep(seconds):
+            now[0] += seconds
+        
+        with patch('src.rate_limiter.time.monotonic', side_effect=lambda: now[0]), \
+                patch('src.rate_limiter.time.sleep', side_effect=sleep) as mock_sleep:
+            yield mock_sleep
+    
+    def test_burst_up_to_capacity_does_not_wait(self, clock):
+        """Test that a full bucket serves capacity tokens immediately."""
+        bucket = TokenBucket(rate=10, capacity=5)
+        
+        waits = [bucket.acquire() for _ in range(5)]
+        
+        assert waits == [0.0] * 5
+        clock.assert_not_called()
+    
+    def test_sustained_rate_is_enforced(self, clock):
+        """Test that requests beyond the burst are spaced at the refill rate."""
+        bucket = TokenBucket(rate=10, capacity=5)
+        bucket.acquire(5)
+        
+        assert bucket.acquire(2) == pytest.approx(0.2)
+        assert bucket.acquire(1) == pytest.approx(0.1)
+    
+    def test_oversized_request_leaves_debt(self, clock):
+        """Test that a request larger than capacity is paid back by later callers."""
+        bucket = TokenBucket(rate=10, capacity=5)
+        
+        assert bucket.acquire(15) == 0.0
+        assert bucket.acquire(1) == pytest.approx(1.1)
+    
+    def test_invalid_parameters_rejected(self):
+        """Test that non-positive rate or capacity raises."""
+        with pytest.raises(ValueError):
+            TokenBucket(rate=0, capacity=5)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -3,13 +3,16 @@ Tests for the retriever module.
 """
 
 import os
-from unittest.mock import Mock, patch
+from unittest.mock import Mock, create_autospec, patch
 
 import pytest
 
 from src.retriever import Retriever
 from src.vector_store import VectorStore
 
+# Query/candidate embedding shared by tests (immutable, built once)
+DUMMY_EMBEDDING = (0.1,) * 768
+
 
 class TestRetriever:
     """Test cases for retriever functionality."""
@@ -17,7 +20,8 @@ class TestRetriever:
     @pytest.fixture
     def mock_vector_store(self):
         """Create a mock vector store."""
-        store = Mock(spec=VectorStore)
+        # Not spec_set: collection is an instance attribute the class lacks
+        store = create_autospec(VectorStore, instance=True)
         store.collection = Mock()
         return store
     
@@ -40,11 +44,13 @@ class TestRetriever:
         mock_vector_store.search.return_value = mock_results
         
         # Mock embedding generation
-        with patch.object(retriever.embedding_generator, 'generate_embeddings') as mock_embed:
-            mock_embed.return_value = [{'embedding': [0.1] * 768}]
+        with patch.object(retriever.embedding_generator, 'embed_single') as mock_embed:
+            mock_embed.return_value = DUMMY_EMBEDDING
             
             results = retriever.retrieve("test query", top_k=2)
             
+            mock_embed.assert_called_once_with("test query")
+            
             assert len(results) > 0
             assert 'text' in results[0]
             assert 'score' in results[0]
@@ -64,26 +70,23 @@ class TestRetriever:
         # Set high threshold
         retriever.relevance_threshold = 0.7
         
-        with patch.object(retriever.embedding_generator, 'generate_embeddings') as mock_embed:
-            mock_embed.return_value = [{'embedding': [0.1] * 768}]
+        with patch.object(retriever.embedding_generator, 'embed_single') as mock_embed:
+            mock_embed.return_value = DUMMY_EMBEDDING
             
             results = retriever.retrieve("test query")
             
             # Should filter out low relevance results
             assert all(r['score'] >= retriever.relevance_threshold for r in results)
     
-    def test_query_preprocessing(self, retriever):
+    @pytest.mark.parametrize("input_query, expected", [
+        ("  TEST  QUERY  ", "test query"),
+        ("Test\nQuery", "test query"),
+        ("TEST", "test"),
+        ("  ", ""),
+    ])
+    def test_query_preprocessing(self, retriever, input_query, expected):
         """Test query preprocessing."""
-        test_cases = [
-            ("  TEST  QUERY  ", "test query"),
-            ("Test\nQuery", "test query"),
-            ("TEST", "test"),
-            ("  ", ""),
-        ]
-        
-        for input_query, expected in test_cases:
-            processed = retriever.preprocess_query(input_query)
-            assert processed == expected
+        assert retriever.preprocess_query(input_query) == expected
     
     def test_mmr_retrieval(self, retriever, mock_vector_store):
         """Test MMR retrieval."""
@@ -97,18 +100,98 @@ class TestRetriever:
         
         mock_vector_store.search.return_value = mock_results
         
+        retriever.embedding_generator.embed_single.return_value = DUMMY_EMBEDDING
+        with patch.object(retriever.embedding_generator, 'generate_embeddings') as mock_embed:
+            # Document embeddings for MMR
+            mock_embed.side_effect = lambda chunks, **kwargs: [
+                {**chunk, 'embedding': DUMMY_EMBEDDING} for chunk in chunks
+            ]
+            
+            results = retriever.retrieve("test query", top_k=3, use_mmr=True)
+            
+            # Should return diverse results
+            assert len(results) <= 3
+    
+    def test_mmr_embeds_candidates_in_one_batch(self, retriever, mock_vector_store):
+        """Test that MMR embeds all candidates at once and skips near-duplicates."""
+        mock_vector_store.search.return_value = {
+            'ids': [['id1', 'id2', 'id3']],
+            'documents': [['lists', 'lists again', 'dicts']],
+            'metadatas': [[{}, {}, {}]],
+            'distances': [[0.1, 0.15, 0.3]]
+        }
+        vectors = {'lists': [1.0, 0.0], 'lists again': [0.99, 0.05], 'dicts': [0.0, 1.0]}
+        
+        with patch.object(retriever.embedding_generator, 'generate_embeddings') as mock_embed:
+            mock_embed.side_effect = lambda chunks, **kwargs: [
+                {**chunk, 'embedding': vectors[chunk['text']]} for chunk in chunks
+            ]
+            
+            results = retriever.retrieve("test query", top_k=2, use_mmr=True, query_embedding=[1.0, 0.0])
+        
+        assert mock_embed.call_count == 1
+        assert [r['text'] for r in results] == ['lists', 'dicts']
+    
+    def test_mmr_reuses_stored_embeddings(self, retriever, mock_vector_store):
+        """Test that MMR uses vectors returned by the search instead of re-embedding."""
+        mock_vector_store.search.return_value = {
+            'ids': [['id1', 'id2', 'id3']],
+            'documents': [['lists', 'lists again', 'dicts']],
+            'metadatas': [[{}, {}, {}]],
+            'distances': [[0.1, 0.15, 0.3]],
+            'embeddings': [[[1.0, 0.0], [0.99, 0.05], [0.0, 1.0]]]
+        }
+        
         with patch.object(retriever.embedding_generator, 'generate_embeddings') as mock_embed:
-            # Mock query embedding
-            mock_embed.return_value = [{'embedding': [0.1] * 768}]
+            results = retriever.retrieve("test query", top_k=2, use_mmr=True, query_embedding=[1.0, 0.0])
+        
+        mock_embed.assert_not_called()
+        assert mock_vector_store.search.call_args.kwargs['include_embeddings'] is True
+        assert [r['text'] for r in results] == ['lists', 'dicts']
+    
+    def test_precomputed_query_embedding(self, retriever, mock_vector_store):
+        """Test that a precomputed query embedding skips re-embedding."""
+        mock_vector_store.search.return_value = {
+            'ids': [['id1']],
+            'documents': [['doc1']],
+            'metadatas': [[{}]],
+            'distances': [[0.1]]
+        }
+        
+        with patch.object(retriever.embedding_generator, 'embed_single') as mock_embed:
+            results = retriever.retrieve("test query", query_embedding=DUMMY_EMBEDDING)
             
-            # Mock document embeddings for MMR
-            with patch.object(retriever, '_get_embedding_for_text') as mock_doc_embed:
-                mock_doc_embed.return_value = [0.1] * 768
-                
-                results = retriever.retrieve("test query", top_k=3, use_mmr=True)
-                
-                # Should return diverse results
-                assert len(results) <= 3
+            mock_embed.assert_not_called()
+            assert len(results) == 1
+    
+    def test_embed_queries_batches_requests(self, retriever):
+        """Test that several queries are embedded in a single call."""
+        with patch.object(retriever.embedding_generator, 'generate_embeddings') as mock_embed:
+            mock_embed.side_effect = lambda chunks, **kwargs: [
+                {**chunk, 'embedding': [float(i)]} for i, chunk in enumerate(chunks)
+            ]
+            
+            embeddings = retriever.embed_queries(["first query", "   ", "second query"])
+            
+            assert mock_embed.call_count == 1
+            assert embeddings == [[0.0], None, [1.0]]
+    
+    def test_snapshot_search_backend(self, retriever, mock_vector_store):
+        """Test that snapshot search modes route to the in-memory snapshot."""
+        mock_vector_store.search_snapshot.return_value = {
+            'ids': [['id1']],
+            'documents': [['doc1']],
+            'metadatas': [[{}]],
+            'distances': [[0.1]]
+        }
+        retriever.search_mode = "binary"
+        
+        results = retriever.retrieve("test query", query_embedding=DUMMY_EMBEDDING)
+        
+        assert results[0]['text'] == 'doc1'
+        mock_vector_store.search_snapshot.assert_called_once()
+        assert mock_vector_store.search_snapshot.call_args.kwargs['first_pass'] == "binary"
+        mock_vector_store.search.assert_not_called()
     
     def test_empty_query_handling(self, retriever):
         """Test handling of empty queries."""
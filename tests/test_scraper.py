@@ -3,172 +3,343 @@ Tests for the scraper module.
 """
 
 import json
-import os
-import tempfile
-from pathlib import Path
 from unittest.mock import Mock, patch
 
 import pytest
 import requests
 
-from src.scraper import load_scraped_data, scrape_python_docs
+from src.scraper import (
+    RateLimiter,
+    _parse_page,
+    iter_scraped_data,
+    load_scraped_data,
+    save_combined_data,
+    scrape_custom_urls,
+    scrape_python_docs
+)
+
+
+# Pages served by the mocked HTTP sessions
+PAGE_HTML = b'<html><body><div class="body">Content</div></body></html>'
+TITLED_PAGE_HTML = b"""
+<html>
+    <head><title>Test Page</title></head>
+    <body>
+        <div class="body">
+            <h1>Test Title</h1>
+            <p>Test paragraph content.</p>
+        </div>
+    </body>
+</html>
+"""
 
 
 class TestScraper:
     """Test cases for scraper functionality."""
     
-    def test_url_fetching(self):
+    @pytest.fixture
+    def mock_session(self, request):
+        """Patch requests.Session with one whose GETs all return the same page."""
+        content = getattr(request, 'param', PAGE_HTML)
+        with patch('src.scraper.requests.Session') as session_class:
+            response = Mock(headers={}, content=content, raise_for_status=Mock())
+            session = Mock(headers={})
+            session.get.return_value = response
+            session_class.return_value = session
+            yield session
+    
+    @pytest.mark.parametrize(
+        'mock_session',
+        [b'<html><body><div class="body">Test content</div></body></html>'],
+        indirect=True,
+        ids=["body-div"]
+    )
+    def test_url_fetching(self, mock_session, tmp_path):
         """Test that URLs can be fetched."""
         # Mock requests to avoid actual network calls in tests
-        with patch('src.scraper.requests.Session') as mock_session:
-            mock_response = Mock()
-            mock_response.content = b'<html><body><div class="body">Test content</div></body></html>'
-            mock_response.raise_for_status = Mock()
-            
-            mock_session_instance = Mock()
-            mock_session_instance.get.return_value = mock_response
-            mock_session_instance.headers = {}
-            mock_session.return_value = mock_session_instance
-            
-            with tempfile.TemporaryDirectory() as tmpdir:
-                docs = scrape_python_docs(
-                    base_url="https://docs.python.org/3/tutorial/",
-                    max_pages=1,
-                    output_dir=tmpdir
-                )
-                
-                assert len(docs) > 0
-                assert 'url' in docs[0]
-                assert 'content' in docs[0]
-    
-    def test_content_extraction(self):
+        docs = scrape_python_docs(
+            base_url="https://docs.python.org/3/tutorial/",
+            max_pages=1,
+            output_dir=str(tmp_path),
+            delay=0
+        )
+        
+        assert len(docs) > 0
+        assert 'url' in docs[0]
+        assert 'content' in docs[0]
+    
+    @pytest.mark.parametrize('mock_session', [TITLED_PAGE_HTML], indirect=True, ids=["titled-page"])
+    def test_content_extraction(self, mock_session, tmp_path):
         """Test that content is properly extracted."""
-        html_content = """
-        <html>
-            <head><title>Test Page</title></head>
-            <body>
-                <div class="body">
-                    <h1>Test Title</h1>
-                    <p>Test paragraph content.</p>
-                </div>
-            </body>
-        </html>
+        docs = scrape_python_docs(
+            base_url="https://test.com/",
+            max_pages=1,
+            output_dir=str(tmp_path),
+            delay=0
+        )
+        
+        if docs:
+            content = docs[0].get('content', '')
+            assert 'Test paragraph content' in content
+            assert len(content) > 0
+    
+    @pytest.mark.parametrize("lxml_available", [True, False])
+    def test_parse_page_keeps_only_main_content(self, lxml_available):
+        """Test that Sphinx pages keep the body div and non-Sphinx pages fall back."""
+        sphinx_page = b"""
+        <html><head><title>Lists</title><script>var x;</script></head>
+        <body><nav>Navigation</nav>
+            <div class="document"><div class="body" role="main">
+                <p>List content.</p><script>tracking()</script>
+            </div></div>
+        <footer>Footer</footer></body></html>
+        """
+        plain_page = b"<html><head><title>Plain</title></head><body><main><p>Main text.</p></main></body></html>"
+        
+        with patch('src.scraper.LXML_AVAILABLE', lxml_available):
+            sphinx_doc = _parse_page(sphinx_page, "https://docs.python.org/3/lists.html")
+            plain_doc = _parse_page(plain_page, "https://example.com/")
+        
+        assert sphinx_doc['title'] == "Lists"
+        assert sphinx_doc['content'] == "List content."
+        assert plain_doc['title'] == "Plain"
+        assert plain_doc['content'] == "Main text."
+    
+    def test_lxml_and_soup_keep_text_around_removed_tags(self):
+        """Test that both parsers keep text on either side of dropped elements apart."""
+        page = b"""
+        <html><head><title>Mixed</title></head><body><div class="body">
+            <p>para one</p>tail text<script>x()</script>more text<nav>n</nav>after<footer>f</footer>end
+        </div></body></html>
         """
         
+        with patch('src.scraper.LXML_AVAILABLE', True):
+            lxml_doc = _parse_page(page, "https://docs.python.org/3/mixed.html")
+        with patch('src.scraper.LXML_AVAILABLE', False):
+            soup_doc = _parse_page(page, "https://docs.python.org/3/mixed.html")
+        
+        assert lxml_doc['content'] == soup_doc['content'] == "para one\ntail text\nmore text\nafter\nend"
+    
+    def test_metadata_saving(self, mock_session, tmp_path):
+        """Test that metadata is properly saved."""
+        docs = scrape_python_docs(
+            base_url="https://test.com/",
+            max_pages=1,
+            output_dir=str(tmp_path),
+            delay=0
+        )
+        
+        if docs:
+            doc = docs[0]
+            assert 'url' in doc
+            assert 'title' in doc
+            assert 'date_scraped' in doc
+            assert 'content_length' in doc
+    
+    def test_rate_limiting(self, mock_session, tmp_path):
+        """Test that rate limiting works."""
+        with patch('src.scraper.time.sleep') as mock_sleep:
+            scrape_python_docs(
+                base_url="https://test.com/",
+                max_pages=2,
+                output_dir=str(tmp_path),
+                delay=1.0,
+                include_advanced=False
+            )
+        
+        # Should sleep between the two requests
+        assert mock_sleep.call_count >= 1
+        assert mock_session.get.call_count == 2
+    
+    def test_concurrent_scrape_preserves_order(self, tmp_path):
+        """Test that concurrently fetched pages are returned in URL order."""
+        def get(url, timeout):
+            response = Mock()
+            response.status_code = 200
+            response.headers = {}
+            response.content = f'<html><body><div class="body">{url}</div></body></html>'.encode()
+            return response
+        
+        urls = [f"https://test.com/page{i}.html" for i in range(10)]
+        
         with patch('src.scraper.requests.Session') as mock_session:
-            mock_response = Mock()
-            mock_response.content = html_content.encode()
-            mock_response.raise_for_status = Mock()
-            
             mock_session_instance = Mock()
-            mock_session_instance.get.return_value = mock_response
+            mock_session_instance.get.side_effect = get
             mock_session_instance.headers = {}
             mock_session.return_value = mock_session_instance
             
-            with tempfile.TemporaryDirectory() as tmpdir:
-                docs = scrape_python_docs(
-                    base_url="https://test.com/",
-                    max_pages=1,
-                    output_dir=tmpdir
-                )
-                
-                if docs:
-                    content = docs[0].get('content', '')
-                    assert 'Test paragraph content' in content
-                    assert len(content) > 0
-    
-    def test_metadata_saving(self):
-        """Test that metadata is properly saved."""
+            streamed = []
+            docs = scrape_custom_urls(urls, output_dir=str(tmp_path), delay=0, on_page=streamed.append)
+        
+        assert [doc['url'] for doc in docs] == urls
+        # Pages are handed over as they complete, so only membership is fixed
+        assert sorted(doc['url'] for doc in streamed) == sorted(urls)
+    
+    def test_fragment_urls_fetch_page_once(self, tmp_path):
+        """Test that anchors into one page are fetched and returned once."""
+        response = Mock(status_code=200, headers={})
+        response.content = b'<html><body><div class="body">Lists and sets</div></body></html>'
+        urls = [
+            "https://test.com/datastructures.html",
+            "https://test.com/datastructures.html#more-on-lists",
+            "https://test.com/other.html#top",
+            "https://test.com/datastructures.html#sets",
+        ]
+        
+        with patch('src.scraper.requests.Session') as mock_session:
+            mock_session.return_value.get.return_value = response
+            mock_session.return_value.headers = {}
+            docs = scrape_custom_urls(urls, output_dir=str(tmp_path), delay=0)
+        
+        fetched = [call.args[0] for call in mock_session.return_value.get.call_args_list]
+        assert sorted(fetched) == ["https://test.com/datastructures.html", "https://test.com/other.html"]
+        assert [doc['url'] for doc in docs] == ["https://test.com/datastructures.html", "https://test.com/other.html"]
+    
+    def test_parse_workers_match_in_thread_parsing(self, tmp_path):
+        """Test that parsing in worker processes gives the same documents."""
+        def get(url, timeout):
+            response = Mock(status_code=200, headers={})
+            response.content = f'<html><title>T</title><body><div class="body">{url}</div></body></html>'.encode()
+            return response
+        
+        urls = [f"https://test.com/page{i}.html" for i in range(4)]
+        
+        with patch('src.scraper.requests.Session') as mock_session:
+            mock_session.return_value.get.side_effect = get
+            mock_session.return_value.headers = {}
+            in_thread = scrape_custom_urls(urls, output_dir=str(tmp_path / "a"), delay=0)
+            in_processes = scrape_custom_urls(urls, output_dir=str(tmp_path / "b"), delay=0, parse_workers=2)
+        
+        assert [(d['url'], d['title'], d['content']) for d in in_processes] == \
+            [(d['url'], d['title'], d['content']) for d in in_thread]
+    
+    def test_sections_share_one_session(self, tmp_path):
+        """Test that all documentation sections reuse one HTTP session."""
         with patch('src.scraper.requests.Session') as mock_session:
             mock_response = Mock()
-            mock_response.content = b'<html><body><div class="body">Content</div></body></html>'
-            mock_response.raise_for_status = Mock()
-            
-            mock_session_instance = Mock()
-            mock_session_instance.get.return_value = mock_response
-            mock_session_instance.headers = {}
-            mock_session.return_value = mock_session_instance
+            mock_response.headers = {}
+            mock_response.status_code = 200
+            mock_response.content = PAGE_HTML
+            mock_session.return_value.get.return_value = mock_response
+            mock_session.return_value.headers = {}
             
-            with tempfile.TemporaryDirectory() as tmpdir:
-                docs = scrape_python_docs(
-                    base_url="https://test.com/",
-                    max_pages=1,
-                    output_dir=tmpdir
-                )
-                
-                if docs:
-                    doc = docs[0]
-                    assert 'url' in doc
-                    assert 'title' in doc
-                    assert 'date_scraped' in doc
-                    assert 'content_length' in doc
-    
-    def test_rate_limiting(self):
-        """Test that rate limiting works."""
-        import time
+            scrape_python_docs(max_pages=2, output_dir=str(tmp_path), delay=0)
+        
+        assert mock_session.call_count == 1
+        assert mock_session.return_value.get.call_count > 2
+        mock_session.return_value.close.assert_called_once()
+    
+    def test_saved_pages_reused_and_revalidated(self, tmp_path):
+        """Test that fresh pages skip the network and stale ones use conditional requests."""
+        url = "https://test.com/page.html"
+        first = Mock(status_code=200, headers={'ETag': '"v1"'})
+        first.content = b'<html><body><div class="body">Original</div></body></html>'
         
         with patch('src.scraper.requests.Session') as mock_session:
-            mock_response = Mock()
-            mock_response.content = b'<html><body><div class="body">Content</div></body></html>'
-            mock_response.raise_for_status = Mock()
+            mock_session.return_value.headers = {}
+            mock_session.return_value.get.return_value = first
+            scrape_custom_urls([url], output_dir=str(tmp_path), delay=0)
             
-            mock_session_instance = Mock()
-            mock_session_instance.get.return_value = mock_response
-            mock_session_instance.headers = {}
-            mock_session.return_value = mock_session_instance
+            # Fresh copy: no request at all
+            fresh = scrape_custom_urls([url], output_dir=str(tmp_path), delay=0)
+            assert mock_session.return_value.get.call_count == 1
             
-            with patch('src.scraper.time.sleep') as mock_sleep:
-                with tempfile.TemporaryDirectory() as tmpdir:
-                    scrape_python_docs(
-                        base_url="https://test.com/",
-                        max_pages=3,
-                        output_dir=tmpdir,
-                        delay=1.0
-                    )
-                    
-                    # Should sleep between requests
-                    assert mock_sleep.call_count >= 2
-    
-    def test_error_handling(self):
+            # Stale copy: revalidated, and the 304 reuses the saved content
+            mock_session.return_value.get.return_value = Mock(status_code=304, headers={})
+            stale = scrape_custom_urls([url], output_dir=str(tmp_path), delay=0, max_age=0)
+        
+        last_call = mock_session.return_value.get.call_args
+        assert last_call.kwargs['headers'] == {'If-None-Match': '"v1"'}
+        assert fresh[0]['content'] == stale[0]['content'] == "Original"
+    
+    def test_max_age_zero_revalidates_docs(self, mock_session, tmp_path):
+        """Test that scrape_python_docs forwards max_age so saved pages are refetched."""
+        mock_session.get.return_value.status_code = 200
+        scrape_python_docs(max_pages=1, output_dir=str(tmp_path), delay=0, include_advanced=False)
+        scrape_python_docs(max_pages=1, output_dir=str(tmp_path), delay=0, include_advanced=False, max_age=0)
+        
+        assert mock_session.get.call_count == 2
+    
+    def test_sections_fetch_each_page_once(self, mock_session, tmp_path):
+        """Test that a page linked from several sections is fetched only once."""
+        scrape_python_docs(output_dir=str(tmp_path), delay=0)
+        
+        fetched = [c.args[0] for c in mock_session.get.call_args_list]
+        assert "https://docs.python.org/3/tutorial/classes.html" in fetched
+        assert len(fetched) == len(set(fetched))
+        
+    def test_rate_limiter_spaces_requests(self):
+        """Test that the shared limiter spaces request starts by the delay."""
+        limiter = RateLimiter(delay=1.0)
+        
+        with patch('src.scraper.time.monotonic', return_value=100.0), \
+                patch('src.scraper.time.sleep') as mock_sleep:
+            for _ in range(3):
+                limiter.wait()
+        
+        assert [c.args[0] for c in mock_sleep.call_args_list] == [1.0, 2.0]
+    
+    def test_error_handling(self, mock_session, tmp_path):
         """Test error handling for bad URLs."""
-        with patch('src.scraper.requests.Session') as mock_session:
-            mock_session_instance = Mock()
-            mock_session_instance.get.side_effect = requests.RequestException("Connection error")
-            mock_session_instance.headers = {}
-            mock_session.return_value = mock_session_instance
-            
-            with tempfile.TemporaryDirectory() as tmpdir:
-                docs = scrape_python_docs(
-                    base_url="https://invalid-url-12345.com/",
-                    max_pages=1,
-                    output_dir=tmpdir
-                )
-                
-                # Should handle error gracefully
-                assert isinstance(docs, list)
-    
-    def test_load_scraped_data(self):
+        mock_session.get.side_effect = requests.RequestException("Connection error")
+        
+        docs = scrape_python_docs(
+            base_url="https://invalid-url-12345.com/",
+            max_pages=1,
+            output_dir=str(tmp_path),
+            delay=0
+        )
+        
+        # Should handle error gracefully
+        assert isinstance(docs, list)
+    
+    def test_load_scraped_data(self, tmp_path):
         """Test loading previously scraped data."""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            # Create test data file
-            test_data = [
-                {
-                    'url': 'https://test.com/page1',
-                    'title': 'Test Page 1',
-                    'content': 'Test content 1',
-                    'date_scraped': '2024-01-01',
-                    'content_length': 14
-                }
-            ]
-            
-            all_docs_file = Path(tmpdir) / "all_docs.json"
-            with open(all_docs_file, 'w') as f:
-                json.dump(test_data, f)
-            
-            # Load data
-            loaded = load_scraped_data(data_dir=tmpdir)
-            assert len(loaded) == 1
-            assert loaded[0]['title'] == 'Test Page 1'
+        # Create test data file
+        test_data = [
+            {
+                'url': 'https://test.com/page1',
+                'title': 'Test Page 1',
+                'content': 'Test content 1',
+                'date_scraped': '2024-01-01',
+                'content_length': 14
+            }
+        ]
+        
+        all_docs_file = tmp_path / "all_docs.json"
+        with open(all_docs_file, 'w') as f:
+            json.dump(test_data, f)
+        
+        # Load data
+        loaded = load_scraped_data(data_dir=str(tmp_path))
+        assert len(loaded) == 1
+        assert loaded[0]['title'] == 'Test Page 1'
+    
+    def test_combined_data_round_trip(self, tmp_path):
+        """Test that combined data is saved once and streamed back in order."""
+        docs = [
+            {'url': f'https://test.com/{i}', 'title': f'Page {i}', 'content': f'Content {i}'}
+            for i in range(5)
+        ]
+        (tmp_path / "all_docs.json").write_text("[]")
+        
+        path = save_combined_data(docs, str(tmp_path))
+        
+        assert list(iter_scraped_data(str(tmp_path), batch_size=2)) == docs
+        assert load_scraped_data(str(tmp_path)) == docs
+        assert [p.name for p in tmp_path.iterdir()] == [path.name]
+    
+    def test_combined_data_falls_back_to_json_lines(self, tmp_path):
+        """Test that without pyarrow the combined file is streamable JSON Lines."""
+        docs = [{'url': f'https://test.com/{i}', 'content': f'Content {i}'} for i in range(3)]
+        
+        with patch('src.scraper.PYARROW_AVAILABLE', False):
+            path = save_combined_data(docs, str(tmp_path))
+            streamed = list(iter_scraped_data(str(tmp_path)))
+        
+        assert path.name == "all_docs.jsonl"
+        assert len(path.read_bytes().splitlines()) == len(docs)
+        assert streamed == docs
 
 
 if __name__ == "__main__":
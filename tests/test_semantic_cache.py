@@ -0,0 +1,68 @@
+"""
+Tests for the semantic answer cache.
+"""
+
+import pytest
+
+from src.semantic_cache import SemanticCache
+
+
+class TestSemanticCache:
+    """Test cases for semantic cache functionality."""
+    
+    @pytest.fixture
+    def cache(self, tmp_path):
+        """Create a cache persisted to a temporary file."""
+        return SemanticCache(str(tmp_path / "query_cache.json"), similarity_threshold=0.95)
+    
+    def test_similar_query_hits(self, cache):
+        """Test that a nearly identical embedding returns the cached payload."""
+        cache.add([1.0, 0.0, 0.0], {'answer': "Lists are mutable"})
+        
+        assert cache.lookup([0.99, 0.05, 0.0]) == {'answer': "Lists are mutable"}
+    
+    def test_dissimilar_query_misses(self, cache):
+        """Test that unrelated embeddings are cache misses."""
+        cache.add([1.0, 0.0, 0.0], {'answer': "Lists are mutable"})
+        
+        assert cache.lookup([0.0, 1.0, 0.0]) is None
+        assert cache.lookup([1.0, 0.0]) is None
+    
+    def test_tags_must_match(self, cache):
+        """Test that entries only match lookups with the same tag."""
+        cache.add([1.0, 0.0], {'answer': "top 5"}, tag="k=5")
+        
+        assert cache.lookup([1.0, 0.0], tag="k=3") is None
+        assert cache.lookup([1.0, 0.0], tag="k=5") == {'answer': "top 5"}
+    
+    def test_persists_across_instances(self, cache):
+        """Test that cached answers survive reopening the cache file."""
+        cache.add([0.6, 0.8], {'answer': "Persisted"})
+        
+        reopened = SemanticCache(str(cache.path))
+        
+        assert len(reopened) == 1
+        assert reopened.lookup([0.6, 0.8]) == {'answer': "Persisted"}
+    
+    def test_oldest_entries_evicted(self, tmp_path):
+        """Test that the cache keeps at most max_entries entries."""
+        cache = SemanticCache(str(tmp_path / "query_cache.json"), max_entries=2)
+        for i, vector in enumerate([[1.0, 0.0], [0.0, 1.0], [-1.0, 0.0]]):
+            cache.add(vector, {'answer': i})
+        
+        assert len(cache) == 2
+        assert cache.lookup([1.0, 0.0]) is None
+        assert cache.lookup([-1.0, 0.0]) == {'answer': 2}
+    
+    def test_clear_removes_file(self, cache):
+        """Test that clearing empties the cache and deletes its file."""
+        cache.add([1.0, 0.0], {'answer': "Stale"})
+        
+        cache.clear()
+        
+        assert len(cache) == 0
+        assert not cache.path.exists()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,208 @@
+"""
+Tests for the vector store module.
+"""
+
+import hashlib
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from src.vector_math import cosine_similarities, int8_dot, normalize_rows, quantize_int8
+from src.vector_store import VectorStore, content_hash
+
+
+class TestVectorStore:
+    """Test cases for vector store functionality."""
+    
+    @pytest.fixture
+    def store(self, tmp_path):
+        """Create a vector store populated with random embeddings."""
+        rng = np.random.default_rng(0)
+        store = VectorStore(persist_directory=str(tmp_path), collection_name="test_docs")
+        chunks = [
+            {
+                'text': f"Document {i}",
+                'embedding': rng.standard_normal(64).tolist(),
+                'metadata': {'title': f"Doc {i}"}
+            }
+            for i in range(200)
+        ]
+        store.add_documents(chunks)
+        return store
+    
+    def test_binary_search_matches_exact_top_result(self, store):
+        """Test that binary search with FP32 rerank finds the exact match."""
+        sample = store.collection.get(limit=1, include=["embeddings", "documents"])
+        query = sample['embeddings'][0]
+        
+        results = store.search_binary(query, n_results=3)
+        
+        assert results['documents'][0][0] == sample['documents'][0]
+        assert len(results['ids'][0]) == 3
+        assert results['distances'][0][0] == pytest.approx(0.0, abs=1e-2)
+        assert results['distances'][0] == sorted(results['distances'][0])
+    
+    def test_truncated_first_pass_finds_exact_match(self, store):
+        """Test that the truncated-prefix first pass keeps the exact match."""
+        sample = store.collection.get(limit=1, include=["embeddings", "documents"])
+        
+        results = store.search_snapshot(sample['embeddings'][0], n_results=3, first_pass="truncated")
+        
+        assert results['documents'][0][0] == sample['documents'][0]
+        assert len(results['ids'][0]) == 3
+    
+    def test_searches_return_embeddings_on_request(self, store):
+        """Test that both search paths can return hit embeddings."""
+        sample = store.collection.get(limit=1, include=["embeddings"])
+        query = sample['embeddings'][0]
+        
+        hnsw = store.search(query, n_results=2, include_embeddings=True)
+        snapshot = store.search_snapshot(query, n_results=2, include_embeddings=True)
+        
+        assert len(hnsw['embeddings'][0]) == 2
+        np.testing.assert_allclose(snapshot['embeddings'][0][0], query, atol=2e-2)
+        assert 'embeddings' not in store.search_snapshot(query, n_results=2)
+    
+    def test_snapshot_invalidated_on_add(self, store):
+        """Test that newly added documents are visible to binary search."""
+        store.search_binary([1.0] * 64, n_results=1)
+        
+        store.add_documents([
+            {'text': "New document", 'embedding': [1.0] * 64, 'metadata': {'title': "New"}}
+        ])
+        results = store.search_binary([1.0] * 64, n_results=1)
+        
+        assert results['documents'][0][0] == "New document"
+    
+    def test_incremental_adds_keep_unique_ids(self, store):
+        """Test that batched adds neither reuse IDs nor re-add duplicates."""
+        batch = [
+            {'text': f"Batch document {i}", 'embedding': [float(i + 1)] * 64, 'metadata': {'title': "Batch"}}
+            for i in range(3)
+        ]
+        
+        assert store.add_documents(batch[:2]) == 2
+        assert store.add_documents(batch) == 1
+        assert store.collection.count() == 203
+    
+    def test_chunk_ids_use_stable_content_hash(self, store):
+        """Test that chunk IDs are a process-independent digest of the text."""
+        store.add_documents([
+            {'text': "Hashed document", 'embedding': [1.0] * 64, 'metadata': {'title': "Hashed"}}
+        ])
+        
+        stored = store.collection.get(where={'title': "Hashed"})
+        
+        assert stored['ids'] == [f"c_{content_hash('Hashed document')}"]
+        assert content_hash('Hashed document') == hashlib.blake2b(b'Hashed document', digest_size=16).hexdigest()
+    
+    def test_reindexing_is_idempotent(self, store):
+        """Test that a fresh store re-adding indexed chunks upserts in place."""
+        existing = store.collection.get(limit=3, include=["embeddings", "documents", "metadatas"])
+        chunks = [
+            {'text': text, 'embedding': embedding, 'metadata': {'title': "Reindexed"}}
+            for text, embedding in zip(existing['documents'], existing['embeddings'])
+        ]
+        
+        reopened = VectorStore(persist_directory=str(store.persist_directory), collection_name="test_docs")
+        
+        assert reopened.add_documents(chunks + chunks[:1], deduplicate=False) == 3
+        assert reopened.collection.count() == 200
+        assert reopened.collection.get(ids=existing['ids'])['metadatas'] == [{'title': "Reindexed"}] * 3
+    
+    def test_large_add_is_batched(self, store):
+        """Test that adds are split into ADD_BATCH_SIZE collection writes."""
+        chunks = [
+            {'text': f"Batched {i}", 'embedding': [0.5] * 64, 'metadata': {'title': "Batched"}}
+            for i in range(5)
+        ]
+        
+        with patch('src.vector_store.ADD_BATCH_SIZE', 2), \
+                patch.object(store.collection, 'upsert', wraps=store.collection.upsert) as mock_upsert:
+            assert store.add_documents(chunks) == 5
+        
+        assert [len(c.kwargs['ids']) for c in mock_upsert.call_args_list] == [2, 2, 1]
+        assert store.collection.count() == 205
+    
+    def test_prewarm_builds_snapshot(self, store):
+        """Test that prewarming loads every vector into the snapshot."""
+        assert store.prewarm(build_snapshot=True) == 200
+        assert store._snapshot is not None
+    
+    def test_prewarm_skips_snapshot_by_default(self, store):
+        """Test that a plain prewarm leaves no snapshot in memory or on disk."""
+        assert store.prewarm() == 200
+        assert store._snapshot is None
+        assert not store._snapshot_cache_dir.exists()
+    
+    def test_int8_snapshot_reloaded_from_disk(self, store):
+        """Test that a new store memory-maps the saved int8 snapshot."""
+        sample = store.collection.get(limit=1, include=["embeddings", "documents"])
+        expected = store.search_binary(sample['embeddings'][0], n_results=3)
+        
+        reopened = VectorStore(persist_directory=str(store.persist_directory), collection_name="test_docs")
+        with patch.object(reopened, '_fetch_collection', wraps=reopened._fetch_collection) as mock_fetch:
+            results = reopened.search_binary(sample['embeddings'][0], n_results=3)
+        
+        assert mock_fetch.call_args_list[-1].args[0] == ["documents", "metadatas"]
+        assert isinstance(reopened._snapshot['int8_vectors'], np.memmap)
+        assert results['ids'] == expected['ids']
+    
+    def test_add_removes_stale_int8_snapshot(self, store):
+        """Test that writes delete the on-disk snapshot."""
+        store.prewarm(build_snapshot=True)
+        assert store._snapshot_cache_dir.exists()
+        
+        store.add_documents([
+            {'text': "Fresh document", 'embedding': [1.0] * 64, 'metadata': {'title': "Fresh"}}
+        ])
+        
+        assert not store._snapshot_cache_dir.exists()
+    
+    def test_embeddings_normalized_at_ingest(self, store):
+        """Test that stored vectors are unit-length and the collection is flagged."""
+        stored = store.collection.get(limit=10, include=["embeddings"])
+        
+        np.testing.assert_allclose(np.linalg.norm(stored['embeddings'], axis=1), 1.0, atol=1e-5)
+        assert store.embeddings_normalized
+    
+    def test_int8_quantization_preserves_similarity(self):
+        """Test that int8 dot products approximate float32 cosine."""
+        rng = np.random.default_rng(1)
+        vectors = normalize_rows(rng.standard_normal((50, 128)))
+        query = vectors[0]
+        
+        codes, scales = quantize_int8(vectors)
+        query_codes, query_scales = quantize_int8(query[None, :])
+        approx = int8_dot(codes, scales, query_codes[0], query_scales[0])
+        
+        assert codes.dtype == np.int8
+        np.testing.assert_allclose(approx, vectors @ query, atol=2e-2)
+        assert int(np.argmax(approx)) == 0
+    
+    def test_cosine_similarities(self):
+        """Test batched cosine similarity, including zero vectors."""
+        rng = np.random.default_rng(2)
+        vectors = rng.standard_normal((20, 32))
+        vectors[3] = 0.0
+        query = rng.standard_normal(32)
+        
+        similarities = cosine_similarities(query, vectors)
+        expected = normalize_rows(vectors) @ (query / np.linalg.norm(query))
+        
+        np.testing.assert_allclose(similarities, expected, atol=1e-5)
+        assert similarities[3] == 0.0
+    
+    def test_unquantized_snapshot_is_exact(self, store):
+        """Test that disabling quantization keeps float32 precision."""
+        store.quantize_embeddings = False
+        sample = store.collection.get(limit=1, include=["embeddings"])
+        
+        results = store.search_binary(sample['embeddings'][0], n_results=1)
+        
+        assert results['distances'][0][0] == pytest.approx(0.0, abs=1e-5)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])